@@ -0,0 +1,169 @@
+"""
+ASGI entry point for the contribution analyzer.
+
+Serves the same page as index.py, but awaits GitHub on one event loop so a
+slow analysis does not hold a worker thread. Run with:
+
+    pip install -r requirements-asgi.txt
+    uvicorn asgi:app --app-dir api
+
+The result cache, contribution store and watch state are SQLite-backed
+and synchronous, so they are called through asyncio.to_thread to keep
+the event loop free for other requests.
+"""
+import asyncio
+import os
+from urllib.parse import parse_qs
+
+from flask import render_template
+
+from index import app as flask_app, YEARS_BACK, SINGLE_FLIGHT, NO_CACHE_HEADERS, WATCH_STATE, get_analyzer
+from ghcontrib.analyzer import analysis_dataset, analysis_window
+from ghcontrib.calendar import build_calendar_query, calendar_variables, parse_calendars
+from ghcontrib.ratelimit import SCHEDULER
+from ghcontrib.client import get_async_client, close_async_client, timeout_errors
+from ghcontrib.errors import AnalysisTimeout, MissingToken, NotFound
+from ghcontrib.tokens import has_token
+from ghcontrib.tracing import TRACER
+
+from asgiref.wsgi import WsgiToAsgi
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'static')
+
+# Routes without an async handler (e.g. /cache/stats, /metrics, /api/contributions) fall through to Flask
+wsgi_fallback = WsgiToAsgi(flask_app)
+
+
+async def get_contributions(username, years=YEARS_BACK):
+    """Async counterpart of index.get_contributions, running the analyzer's calendar strategy."""
+    if not username:
+        return NotFound("Username must be provided"), None
+
+    if not has_token():
+        return MissingToken("GitHub token not found in environment variables"), None
+
+    try:
+        calendar = get_analyzer().strategies['calendar']
+        start, end = analysis_window(years)
+
+        with SCHEDULER.track(username), TRACER.span('analysis', entry=calendar.name, window=str(years)):
+            ranges = await asyncio.to_thread(calendar.plan, username, start, end)
+            response, data = await get_async_client().execute(
+                build_calendar_query(len(ranges)), calendar_variables(username, ranges),
+                headers=NO_CACHE_HEADERS, timeout=5, name='calendar'
+            )
+            with TRACER.span('parse'):
+                calendars = parse_calendars(username, response, data, len(ranges))
+            with TRACER.span('aggregate'):
+                days = await asyncio.to_thread(calendar.build, username, calendars, ranges, start, end)
+            with TRACER.span('dataset'):
+                return None, analysis_dataset(username, days, start, end, calendar.name)
+    except timeout_errors():
+        return AnalysisTimeout("GitHub API request timed out. Please try again."), None
+    except Exception as e:
+        return e, None
+
+
+async def get_cached_commit_days(username, years=YEARS_BACK):
+    analyzer = get_analyzer()
+    if WATCH_STATE is not None:
+        await asyncio.to_thread(WATCH_STATE.record_request, username)
+    # A stale hit is refreshed on the refresher's threads with the sync client
+    data, _ = await asyncio.to_thread(analyzer.lookup, username, years, strategy='calendar')
+    if data is None:
+        key = analyzer.key(username, years, strategy='calendar')
+        error, data = await SINGLE_FLIGHT.do_async(key, get_contributions, username, years)
+        if not data:
+            return error, None
+        await asyncio.to_thread(analyzer.cache.set, key, data)
+    return None, (data['total_days'], data['monthly'])
+
+
+def render(**context):
+    with TRACER.span('render'), flask_app.app_context():
+        return render_template('index.html', **context)
+
+
+async def read_body(receive):
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return body
+
+
+async def respond(send, status, body=b'', content_type='text/html; charset=utf-8', headers=()):
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', content_type.encode()),
+                    (b'content-length', str(len(body)).encode())] + list(headers)
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def index(scope, receive, send):
+    error = None
+    username = None
+    # The form posts back to the same URL, so ?years carries over
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    try:
+        years = int(query.get('years', [YEARS_BACK])[0])
+    except ValueError:
+        years = YEARS_BACK
+
+    if scope['method'] == 'POST':
+        form = parse_qs((await read_body(receive)).decode('utf-8'), keep_blank_values=True)
+        if 'clear' in form:
+            # If clear button was clicked, redirect to GET request
+            return await respond(send, 302, headers=[(b'location', b'/')])
+
+        username = form.get('username', [''])[0].strip()
+        if not 1 <= years <= 10:
+            error = "years must be between 1 and 10"
+        elif username:
+            error, result = await get_cached_commit_days(username, years)
+            if result:
+                total_days, monthly_data = result
+                return await respond(send, 200, render(username=username,
+                                                       total_days=total_days,
+                                                       monthly_data=monthly_data,
+                                                       years=years,
+                                                       error=error,
+                                                       submitted=True))
+        else:
+            error = "Username must be provided"
+
+    await respond(send, 200, render(username=username,
+                                    total_days=0,
+                                    monthly_data={},
+                                    years=years,
+                                    error=error,
+                                    submitted=False))
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await close_async_client()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+
+    path = scope['path']
+    if path == '/':
+        return await index(scope, receive, send)
+    if path == '/favicon.ico':
+        with open(os.path.join(STATIC_DIR, 'favicon.ico'), 'rb') as f:
+            return await respond(send, 200, f.read(), content_type='image/vnd.microsoft.icon')
+    await wsgi_fallback(scope, receive, send)
@@ -1,116 +1,234 @@
-from flask import Flask, render_template, request, send_from_directory, redirect, url_for
-from dotenv import load_dotenv
+import time
+
+# Every cold start is measured from here; see /startup
+STARTED = time.perf_counter()
+
+from flask import Flask, render_template, request, send_from_directory, redirect, url_for, jsonify, Response
 import os
-import requests
-from datetime import datetime, timedelta
-from collections import defaultdict
+import sys
+import threading
+import logging
 
-app = Flask(__name__, template_folder='../templates')
-load_dotenv()
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+from ghcontrib.cache import cache_from_env
+from ghcontrib.store import store_from_env
+from ghcontrib.singleflight import single_flight_from_env
+from ghcontrib.refresh import refresher_from_env
+from ghcontrib.prewarm import watch_state_from_env
+from ghcontrib.ratelimit import SCHEDULER
+from ghcontrib.client import timeout_errors, warm_client
+from ghcontrib.errors import AnalysisError, AnalysisTimeout, MissingToken, NotFound
+from ghcontrib.tokens import has_token
+from ghcontrib.tracing import TRACER
+from ghcontrib.responses import json_body, strong_etag, encoded_etag, choose_encoding, compress, etag_matches
+from ghcontrib.startup import StartupReport
+from ghcontrib.templates import compile_templates, precompiled_loader
 
-def get_contributions_for_year(username, start_date, end_date, headers):
-    if not username:
-        raise ValueError("Username must be provided")
-
-    query = '''
-    query($username: String!, $from: DateTime!, $to: DateTime!) {
-        user(login: $username) {
-            contributionsCollection(from: $from, to: $to) {
-                contributionCalendar {
-                    totalContributions
-                    weeks {
-                        contributionDays {
-                            contributionCount
-                            date
-                        }
-                    }
-                }
-            }
-        }
-    }
-    '''
-    
-    response = requests.post('https://api.github.com/graphql', 
-                           json={
-                               'query': query,
-                               'variables': {
-                                   'username': username,
-                                   'from': start_date.strftime('%Y-%m-%dT00:00:00Z'),
-                                   'to': end_date.strftime('%Y-%m-%dT23:59:59Z')
-                               }
-                           }, 
-                           headers=headers,
-                           timeout=5)
-    
-    if response.status_code != 200:
-        raise Exception(f"GitHub API Error: {response.status_code}")
-        
-    data = response.json()
-    if 'errors' in data:
-        raise Exception(f"GitHub API Error: {data['errors'][0]['message']}")
-        
-    if not data.get('data', {}).get('user'):
-        raise Exception(f"User '{username}' not found")
-        
-    return data['data']['user']['contributionsCollection']['contributionCalendar']
-
-def get_commit_days(username):
+STARTUP = StartupReport(STARTED)
+STARTUP.mark('imports')
+
+TEMPLATE_DIR = os.path.join(ROOT, 'templates')
+
+# Output of `python api/index.py --compile-templates`
+COMPILED_TEMPLATE_DIR = os.path.join(ROOT, 'templates_compiled')
+
+# Opt-in serverless mode: precompiled templates, and the GitHub client
+# connects while the instance waits for its first request. Off by default,
+# since bench/coldstart.py measures it slower unless templates_compiled/ is deployed
+FAST_START = os.getenv('FAST_START', '0') != '0'
+
+app = Flask(__name__, template_folder=TEMPLATE_DIR)
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Number of yearly calendars to look back over
+YEARS_BACK = int(os.getenv('YEARS_BACK', '3'))
+
+# Analyses keyed by (username, lookback window, strategy); see ghcontrib.analyzer.analysis_key
+RESULT_CACHE = cache_from_env()
+
+# Concurrent analyses of the same user share one set of GitHub queries
+SINGLE_FLIGHT = single_flight_from_env()
+
+# Recomputes analyses served stale from the cache's grace window
+REFRESHER = refresher_from_env()
+
+# Request counts that let prewarm.py favour popular watched users
+WATCH_STATE = watch_state_from_env()
+
+# Day-level store for incremental syncs, enabled by CONTRIBUTION_STORE_PATH
+CONTRIBUTION_STORE = store_from_env()
+
+# Days before the sync watermark that are re-fetched to pick up late contributions
+SYNC_OVERLAP_DAYS = int(os.getenv('SYNC_OVERLAP_DAYS', '2'))
+
+# Cache-Control for /api/contributions: clients and CDNs reuse a response for
+# API_MAX_AGE seconds, then may serve it stale while they revalidate
+API_MAX_AGE = int(os.getenv('API_MAX_AGE', '300'))
+API_STALE_WHILE_REVALIDATE = int(os.getenv('API_STALE_WHILE_REVALIDATE', '3600'))
+
+NO_CACHE_HEADERS = {
+    'Cache-Control': 'no-cache, no-store, must-revalidate',
+    'Pragma': 'no-cache',
+    'Expires': '0'
+}
+STARTUP.mark('config')
+
+if FAST_START:
+    loader = precompiled_loader(TEMPLATE_DIR, COMPILED_TEMPLATE_DIR, app.jinja_env.loader)
+    if loader is not None:
+        app.jinja_env.loader = loader
+    # Load the page template now rather than on the first request
+    app.jinja_env.get_template('index.html')
+    STARTUP.mark('templates')
+
+# Every analysis, the calendar included, goes through one ContributionAnalyzer,
+# built on first use so cold starts do not import the crawlers behind it
+_analyzer = None
+_analyzer_lock = threading.Lock()
+
+def get_analyzer():
+    """Return the shared ContributionAnalyzer, creating it on first use."""
+    global _analyzer
+    if _analyzer is None:
+        with _analyzer_lock:
+            if _analyzer is None:
+                from ghcontrib.analyzer import CalendarStrategy, ContributionAnalyzer, ContributionsStrategy, \
+                    HistoryStrategy
+                strategies = [CalendarStrategy(store=CONTRIBUTION_STORE, overlap_days=SYNC_OVERLAP_DAYS,
+                                               headers=NO_CACHE_HEADERS, timeout=5),
+                              ContributionsStrategy(), HistoryStrategy()]
+                _analyzer = ContributionAnalyzer(strategies, cache=RESULT_CACHE, single_flight=SINGLE_FLIGHT,
+                                                 refresher=REFRESHER)
+    return _analyzer
+
+def run_analysis(method, username, years, **options):
+    """Call an analyzer method and return (error, dataset); the error is an exception, see error_status."""
     if not username:
-        return "Username must be provided", None
+        return NotFound("Username must be provided"), None
+
+    if not has_token():
+        return MissingToken("GitHub token not found in environment variables"), None
 
-    token = os.getenv('GITHUB_TOKEN')
-    
-    if not token:
-        return "GitHub token not found in environment variables", None
-    
-    headers = {
-        'Authorization': f'Bearer {token}',
-        'Content-Type': 'application/json',
-        'Cache-Control': 'no-cache, no-store, must-revalidate',
-        'Pragma': 'no-cache',
-        'Expires': '0'
-    }
-    
     try:
-        # Calculate date ranges for the last 3 years
-        end_date = datetime.now()
-        total_days = 0
-        monthly_commits = defaultdict(int)
-        
-        # Query each year separately
-        for year in range(3):
-            year_end = end_date - timedelta(days=365 * year)
-            year_start = year_end - timedelta(days=365)
-            
-            contributions = get_contributions_for_year(username, year_start, year_end, headers)
-            
-            for week in contributions['weeks']:
-                for day in week['contributionDays']:
-                    if day['contributionCount'] > 0:
-                        total_days += 1
-                        date = datetime.strptime(day['date'], '%Y-%m-%d')
-                        month = date.strftime('%Y-%m')
-                        monthly_commits[month] += day['contributionCount']
-        
-        # Sort monthly commits by date
-        sorted_monthly = dict(sorted(monthly_commits.items()))
-        
-        return None, (total_days, sorted_monthly)
-    except requests.Timeout:
-        return "GitHub API request timed out. Please try again.", None
+        return None, getattr(get_analyzer(), method)(username, years, **options)
+    except timeout_errors():
+        return AnalysisTimeout("GitHub API request timed out. Please try again."), None
     except Exception as e:
-        return str(e), None
+        return e, None
+
+def get_contributions(username, years=YEARS_BACK):
+    """Run a calendar analysis, bypassing the result cache, and return (error, dataset)."""
+    return run_analysis('run', username, years, strategy='calendar')
+
+def get_commit_days(username, years=YEARS_BACK):
+    """Return (error, (total days, monthly counts)) for the page."""
+    error, data = get_contributions(username, years)
+    return error, (data['total_days'], data['monthly']) if data else None
+
+def refresh_contributions(username, years):
+    """Recompute a cached calendar dataset, e.g. from prewarm.py."""
+    error, data = run_analysis('refresh', username, years)
+    if not data:
+        raise error
+
+def get_cached_contributions(username, years=YEARS_BACK, precision='contributions'):
+    """
+    Serve a dataset from the result cache, computing it on a miss.
+
+    A stale dataset is answered right away and recomputed off the request path.
+    """
+    if WATCH_STATE is not None:
+        WATCH_STATE.record_request(username)
+    return run_analysis('analyze', username, years, precision=precision)
+
+def get_cached_commit_days(username, years=YEARS_BACK):
+    """Page view of get_cached_contributions; the page and the API share cache entries."""
+    error, data = get_cached_contributions(username, years)
+    return error, (data['total_days'], data['monthly']) if data else None
+
+def error_status(error):
+    """Map an analysis error onto an HTTP status; untyped failures are GitHub's (502)."""
+    return error.status if isinstance(error, AnalysisError) else 502
+
+def conditional_json(data):
+    """
+    JSON response with a strong ETag, Cache-Control and content negotiation.
+
+    A matching If-None-Match gets a bodyless 304; otherwise the body is
+    compressed with brotli (when installed) or gzip if the client accepts it.
+    """
+    body = json_body(data)
+    etag = strong_etag(body)
+    encoding = choose_encoding(request.headers.get('Accept-Encoding'), len(body))
+    headers = {
+        'ETag': encoded_etag(etag, encoding),
+        'Cache-Control': f'public, max-age={API_MAX_AGE}, stale-while-revalidate={API_STALE_WHILE_REVALIDATE}',
+        'Vary': 'Accept-Encoding'
+    }
+    if etag_matches(request.headers.get('If-None-Match'), etag):
+        return Response(status=304, headers=headers)
+
+    if encoding is not None:
+        headers['Content-Encoding'] = encoding
+    return Response(compress(body, encoding), mimetype='application/json', headers=headers)
+
+@app.after_request
+def report_first_response(response):
+    STARTUP.responded()
+    return response
+
+@app.route('/startup')
+def startup():
+    """How long this instance took to start and to send its first response."""
+    return jsonify(STARTUP.as_dict())
 
 @app.route('/favicon.ico')
 def favicon():
     return send_from_directory('../static', 'favicon.ico')
 
+@app.route('/cache/stats')
+def cache_stats():
+    return jsonify(dict(RESULT_CACHE.stats(), single_flight=SINGLE_FLIGHT.stats(), refresh=REFRESHER.stats(),
+                        rate_limit=SCHEDULER.stats()))
+
+@app.route('/metrics')
+def metrics():
+    return Response(TRACER.prometheus(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/traces')
+def traces():
+    """Recently finished spans as OpenTelemetry OTLP/JSON."""
+    return jsonify(TRACER.otel_json())
+
+@app.route('/api/contributions/<username>')
+def api_contributions(username):
+    """Totals plus monthly and daily series for a user, as compact JSON."""
+    years = request.args.get('years', YEARS_BACK, type=int)
+    if not 1 <= years <= 10:
+        return jsonify({'error': 'years must be between 1 and 10'}), 400
+    precision = request.args.get('precision', 'contributions')
+    from ghcontrib.analyzer import PRECISIONS
+    if precision not in PRECISIONS:
+        return jsonify({'error': f"precision must be one of {', '.join(PRECISIONS)}"}), 400
+
+    error, data = get_cached_contributions(username, years, precision)
+    if data is None:
+        return jsonify({'error': str(error)}), error_status(error)
+    return conditional_json(data)
+
+def render(**context):
+    with TRACER.span('render'):
+        return render_template('index.html', **context)
+
 @app.route('/', methods=['GET', 'POST'])
 def index():
     error = None
     total_days = 0
     monthly_data = {}
     username = None
+    # The form posts back to the same URL, so ?years carries over
+    years = request.args.get('years', YEARS_BACK, type=int)
     
     if request.method == 'POST':
         if 'clear' in request.form:
@@ -118,26 +236,35 @@ def index():
             return redirect(url_for('index'))
             
         username = request.form.get('username', '').strip()
-        if username:
-            error, result = get_commit_days(username)
+        if not 1 <= years <= 10:
+            error = "years must be between 1 and 10"
+        elif username:
+            error, result = get_cached_commit_days(username, years)
             if result:
                 total_days, monthly_data = result
                 # Redirect after successful form submission to prevent resubmission
-                return render_template('index.html', 
-                                    username=username,
-                                    total_days=total_days, 
-                                    monthly_data=monthly_data,
-                                    error=error,
-                                    submitted=True)
+                return render(username=username,
+                              total_days=total_days,
+                              monthly_data=monthly_data,
+                              years=years,
+                              error=error,
+                              submitted=True)
         else:
             error = "Username must be provided"
     
-    return render_template('index.html', 
-                         username=username,
-                         total_days=total_days, 
-                         monthly_data=monthly_data,
-                         error=error,
-                         submitted=False)
+    return render(username=username,
+                  total_days=total_days,
+                  monthly_data=monthly_data,
+                  years=years,
+                  error=error,
+                  submitted=False)
+
+STARTUP.ready()
+if FAST_START:
+    warm_client()
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    if '--compile-templates' in sys.argv:
+        compile_templates(app.jinja_env, TEMPLATE_DIR, COMPILED_TEMPLATE_DIR)
+    else:
+        app.run(debug=True)
@@ -1,147 +1,233 @@
-from flask import Flask, render_template
+from flask import Flask, render_template, jsonify, request, Response, url_for
 from dotenv import load_dotenv
 import os
-import requests
-from datetime import datetime
+import json
 from collections import defaultdict
+from datetime import date
+from ghcontrib.analyzer import ContributionAnalyzer, ContributionsStrategy, HistoryStrategy
+from ghcontrib.cache import cache_from_env, make_key
+from ghcontrib.singleflight import single_flight_from_env
+from ghcontrib.jobs import jobs_from_env
+from ghcontrib.refresh import refresher_from_env
+from ghcontrib.mirror import MIRROR_DIR, MirrorStrategy
+from ghcontrib.ratelimit import SCHEDULER
+from ghcontrib.team import analyze_team
+from ghcontrib.tracing import TRACER
+from ghcontrib.days import dataset_days
+from ghcontrib.verify import verification_result
 
 app = Flask(__name__)
 load_dotenv()
 
-def get_commit_days():
-    token = os.getenv('GITHUB_TOKEN')
-    username = os.getenv('GITHUB_USERNAME', 'lebraat')
-    
-    headers = {
-        'Authorization': f'Bearer {token}',
-        'Content-Type': 'application/json',
-    }
-    
-    # GraphQL query to get user's repositories
-    query = '''
-    query($username: String!) {
-        user(login: $username) {
-            repositories(first: 100, orderBy: {field: UPDATED_AT, direction: DESC}) {
-                nodes {
-                    name
-                    owner {
-                        login
-                    }
-                }
-            }
-        }
-    }
-    '''
-    
-    response = requests.post('https://api.github.com/graphql', 
-                           json={'query': query, 'variables': {'username': username}}, 
-                           headers=headers)
-    
-    if response.status_code != 200:
-        return f"Error: {response.status_code}", []
-    
-    repos = response.json()['data']['user']['repositories']['nodes']
-    print(f"Found {len(repos)} repositories.")
-    
-    commit_dates = set()
-    monthly_commits = defaultdict(set)
-    commit_details = defaultdict(list)  # For debugging: store all commits per day
-    
-    for repo in repos:
-        owner = repo['owner']['login']
-        name = repo['name']
-        
-        # Query to get commit history
-        commit_query = '''
-        query($owner: String!, $name: String!, $cursor: String) {
-            repository(owner: $owner, name: $name) {
-                defaultBranchRef {
-                    target {
-                        ... on Commit {
-                            history(first: 100, after: $cursor, since: "2022-01-07T00:00:00Z") {
-                                pageInfo {
-                                    endCursor
-                                    hasNextPage
-                                }
-                                edges {
-                                    node {
-                                        committedDate
-                                        author {
-                                            user {
-                                                login
-                                            }
-                                        }
-                                        message
-                                    }
-                                }
-                            }
-                        }
-                    }
-                }
-            }
-        }
-        '''
-        
-        print(f"Fetching commits for {owner}/{name}...")
-        has_next_page = True
-        cursor = None
-        
-        while has_next_page:
-            variables = {
-                'owner': owner,
-                'name': name,
-                'cursor': cursor
-            }
-            
-            commit_response = requests.post('https://api.github.com/graphql',
-                                         json={'query': commit_query, 'variables': variables},
-                                         headers=headers)
-            
-            if commit_response.status_code != 200:
-                print(f"Error fetching commits for {owner}/{name}")
-                break
-                
-            result = commit_response.json()
-            
-            try:
-                commit_history = result['data']['repository']['defaultBranchRef']['target']['history']
-                for edge in commit_history['edges']:
-                    commit = edge['node']
-                    if commit['author']['user'] and commit['author']['user']['login'] == username:
-                        date = commit['committedDate'].split('T')[0]
-                        message = commit['message']
-                        commit_dates.add(date)
-                        month = date[:7]  # YYYY-MM format
-                        monthly_commits[month].add(date)
-                        commit_details[date].append(f"{message[:50]}... in {owner}/{name}")
-                
-                page_info = commit_history['pageInfo']
-                has_next_page = page_info['hasNextPage']
-                cursor = page_info['endCursor']
-            except (KeyError, TypeError) as e:
-                print(f"Error processing commits for {owner}/{name}: {str(e)}")
-                break
+# Only commits after this date are counted
+HISTORY_SINCE = "2022-01-07T00:00:00Z"
+
+# Set DEBUG_COMMITS to print the most recent DEBUG_COMMIT_BUFFER matching commits
+DEBUG_COMMITS = os.getenv('DEBUG_COMMITS', '') not in ('', '0')
+DEBUG_COMMIT_BUFFER = int(os.getenv('DEBUG_COMMIT_BUFFER', '200'))
+
+# 'graphql' pages every repository's history through the API; 'mirror' counts local git mirrors in MIRROR_DIR
+HISTORY_BACKEND = os.getenv('HISTORY_BACKEND', 'graphql')
+
+# With the mirror backend, count whatever is already mirrored without touching the network
+MIRROR_OFFLINE = os.getenv('MIRROR_OFFLINE', '') not in ('', '0')
+
+RESULT_CACHE = cache_from_env()
+SINGLE_FLIGHT = single_flight_from_env()
+
+# Crawls and verifications run here so requests return before they finish
+JOBS = jobs_from_env()
+REFRESHER = refresher_from_env()
+
+def get_commit_days(username=None, progress=None):
+    """Return (total commit days, unique commit days per month) since HISTORY_SINCE, or (error, [])."""
+    username = username or os.getenv('GITHUB_USERNAME', 'lebraat')
+    try:
+        data = ANALYZER.run(username, precision='history', since=HISTORY_SINCE, progress=job_progress(progress))
+    except Exception as e:
+        return str(e), []
+    return page_counts(data)
+
+def page_counts(data):
+    """(total days, unique days per month) of a dataset, as the page shows them."""
+    return data['total_days'], dataset_days(data).monthly_days()
+
+def page_years(data):
+    """Whole years the dataset's window spans, for the page's "in the last N years"."""
+    days = (date.fromisoformat(data['to']) - date.fromisoformat(data['from'])).days
+    return max(1, round(days / 365))
+
+def job_progress(progress):
+    """Adapt a job's progress callback to the analyzer's (days so far, **counters)."""
+    if progress is None:
+        return None
+    return lambda days, **counters: progress(partial=days.monthly_days(), days=days.total_days(), **counters)
+
+def print_commit_log(commit_log, commit_days):
+    """Print the buffered commits grouped by day, formatting them only now."""
+    commit_details = defaultdict(list)
+    for date, message, repo in commit_log:
+        commit_details[date].append(f"{message[:50]}... in {repo}")
     
-    # Debug output
     print("\nDetailed commit information:")
     for date, commits in sorted(commit_details.items()):
         print(f"\n{date} ({len(commits)} commits):")
         for commit in commits:
             print(f"  - {commit}")
     
-    print("\nMonthly unique commit days:")
-    for month, days in sorted(monthly_commits.items()):
-        print(f"{month}: {len(days)} days, dates: {sorted(days)}")
-    
-    # Sort monthly commits by date and convert sets to counts
-    sorted_monthly = {month: len(days) for month, days in sorted(monthly_commits.items())}
+    monthly_dates = defaultdict(list)
+    for date in commit_days.iter_dates():
+        monthly_dates[date[:7]].append(date)
     
-    return len(commit_dates), sorted_monthly
+    print("\nMonthly unique commit days:")
+    for month, days in monthly_dates.items():
+        print(f"{month}: {len(days)} days, dates: {days}")
+
+# Commit-level analyses; the history crawl goes through local mirrors with HISTORY_BACKEND=mirror
+if HISTORY_BACKEND == 'mirror':
+    HISTORY_STRATEGY = MirrorStrategy(MIRROR_DIR, offline=MIRROR_OFFLINE)
+else:
+    HISTORY_STRATEGY = HistoryStrategy(log_size=DEBUG_COMMIT_BUFFER if DEBUG_COMMITS else 0,
+                                       report_log=print_commit_log)
+ANALYZER = ContributionAnalyzer([ContributionsStrategy(), HISTORY_STRATEGY], cache=RESULT_CACHE,
+                                single_flight=SINGLE_FLIGHT, refresher=REFRESHER)
+
+def crawl_key(username):
+    return ANALYZER.key(username, precision='history', since=HISTORY_SINCE)
+
+def crawl_job(progress, username):
+    """Job: crawl every repository's history, reporting after each one."""
+    # Workers that are already crawling this user hand over their result
+    data = ANALYZER.refresh(username, precision='history', since=HISTORY_SINCE, progress=job_progress(progress))
+    total_days, monthly_data = page_counts(data)
+    return {'total_days': total_days, 'monthly_data': monthly_data}
+
+def verify_job(progress, username, threshold=120, years_back=3):
+    """Job: Passport-style verification, reporting after each round of pages."""
+    with SCHEDULER.track(username) as usage:
+        data = ANALYZER.run(username, years_back, strategy='contributions', progress=job_progress(progress))
+    commit_days = dataset_days(data)
+    return dict(verification_result(commit_days, threshold, years_back, data['account_start']),
+                monthly_data=commit_days.monthly_days(), query_usage=usage.as_dict())
+
+def team_key(usernames=None, org=None):
+    return make_key(f'org:{org}' if org else ','.join(sorted(login.lower() for login in usernames)),
+                    HISTORY_SINCE, 'team')
+
+def team_job(progress, usernames=None, org=None):
+    """Job: crawl the union of a team's repositories once, crediting commits to each member."""
+    key = team_key(usernames, org)
+    with SCHEDULER.track(key[0]) as usage, TRACER.span('analysis', entry='team'):
+        result = analyze_team(HISTORY_SINCE, usernames, org, progress=progress)
+        TRACER.annotate(**{f'graphql.{name}': value for name, value in usage.as_dict().items()})
+    result['query_usage'] = usage.as_dict()
+    RESULT_CACHE.set(key, result)
+    return result
+
+def submit_job(kind, username, **options):
+    if kind == 'verify':
+        # Verifications with a different threshold or window are different results
+        key = (kind, username.lower(), options.get('threshold', 120), options.get('years_back', 3))
+        return JOBS.submit(kind, username, verify_job, username, key=key, **options)
+    if kind == 'team':
+        key = team_key(**options)
+        # A team crawled within the cache TTL is answered without queuing another crawl
+        result = RESULT_CACHE.get(key)
+        if result is not None:
+            return JOBS.complete(kind, key[0], result)
+        return JOBS.submit(kind, key[0], team_job, key=key, **options)
+    return JOBS.submit(kind, username, crawl_job, username, key=crawl_key(username))
+
+def render(**context):
+    with TRACER.span('render'):
+        return render_template('index.html', **context)
 
 @app.route('/')
 def index():
-    total_days, monthly_data = get_commit_days()
-    return render_template('index.html', total_days=total_days, monthly_data=monthly_data)
+    username = os.getenv('GITHUB_USERNAME', 'lebraat')
+    # A stale crawl is shown now and reruns in the background without progress reporting
+    data, _ = ANALYZER.lookup(username, precision='history', since=HISTORY_SINCE)
+    if data is None:
+        # The page follows the crawl over /jobs/<id>/events and draws months as they arrive
+        job = submit_job('crawl', username)
+        return render(username=username, job_id=job.id)
+    total_days, monthly_data = page_counts(data)
+    return render(username=username, submitted=True, years=page_years(data), total_days=total_days,
+                  monthly_data=monthly_data)
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """Start a 'crawl' (default), 'verify' or 'team' job and return its id right away."""
+    params = request.get_json(silent=True) or request.form
+    username = params.get('username') or os.getenv('GITHUB_USERNAME', 'lebraat')
+    kind = params.get('kind', 'crawl')
+    if kind not in ('crawl', 'verify', 'team'):
+        return jsonify({'error': f"Unknown job kind '{kind}'"}), 400
+
+    options = {}
+    if kind == 'verify':
+        try:
+            options = {'threshold': int(params.get('threshold', 120)),
+                       'years_back': int(params.get('years_back', 3))}
+        except (TypeError, ValueError):
+            return jsonify({'error': "'threshold' and 'years_back' must be whole numbers"}), 400
+        if options['threshold'] < 0 or not 1 <= options['years_back'] <= 10:
+            return jsonify({'error': "'threshold' must not be negative and 'years_back' must be between 1 and 10"}), 400
+    elif kind == 'team':
+        usernames = params.get('usernames') or []
+        if isinstance(usernames, str):
+            usernames = [login.strip() for login in usernames.split(',') if login.strip()]
+        if not usernames and not params.get('org'):
+            return jsonify({'error': "A team job needs 'usernames' or 'org'"}), 400
+        options = {'usernames': usernames, 'org': params.get('org')}
+    job = submit_job(kind, username, **options)
+    return jsonify({'id': job.id, 'status': job.status,
+                    'status_url': url_for('job_status', job_id=job.id),
+                    'events_url': url_for('job_events', job_id=job.id)}), 202
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = JOBS.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(job)
+
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    """Server-Sent Events stream of job snapshots until the job finishes."""
+    if JOBS.get(job_id) is None:
+        return jsonify({'error': 'Unknown job'}), 404
+
+    def stream():
+        version = -1
+        while True:
+            job = JOBS.wait(job_id, version)
+            if job is None:
+                return
+            if job['version'] == version:
+                # Comment line keeps proxies from closing an idle stream
+                yield ': keep-alive\n\n'
+                continue
+            version = job['version']
+            yield f"data: {json.dumps(job)}\n\n"
+            if job['status'] in ('done', 'failed'):
+                return
+
+    return Response(stream(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+@app.route('/cache/stats')
+def cache_stats():
+    return jsonify(dict(RESULT_CACHE.stats(), single_flight=SINGLE_FLIGHT.stats(), jobs=JOBS.stats(),
+                        refresh=REFRESHER.stats(), rate_limit=SCHEDULER.stats()))
+
+@app.route('/metrics')
+def metrics():
+    return Response(TRACER.prometheus(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/traces')
+def traces():
+    """Recently finished spans as OpenTelemetry OTLP/JSON."""
+    return jsonify(TRACER.otel_json())
 
 if __name__ == '__main__':
     app.run(debug=True, port=5001)
@@ -0,0 +1,118 @@
+"""
+Measure cold starts of the Vercel entry point (api/index.py) against the offline GraphQL stand-in.
+
+    python bench/coldstart.py --output cold.json
+    python bench/coldstart.py --compare cold.json   # exit 1 on regressions
+
+Every run is a fresh interpreter, like a new serverless instance. From
+the start of the import of api/index.py it records when the import
+finished, when the first page (GET /) was rendered and when the first
+analysis (GET /api/contributions/<user>) came back, plus the wall time of
+the whole process as seen from outside.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from run import ROOT, compare, percentile, start_standin, warm_accounts  # noqa: E402
+
+# Runs inside each fresh interpreter and prints its timings as one JSON line
+PROBE = '''
+import json, os, sys, time
+start = time.perf_counter()
+sys.path.insert(0, os.path.join(os.environ['BENCH_ROOT'], 'api'))
+import index
+imported = time.perf_counter()
+client = index.app.test_client()
+assert client.get('/').status_code == 200
+page = time.perf_counter()
+assert client.get('/api/contributions/' + os.environ['BENCH_USER']).status_code == 200
+analysis = time.perf_counter()
+print(json.dumps({'import': imported - start, 'first_page': page - start, 'first_analysis': analysis - start}))
+'''
+
+PHASES = ('import', 'first_page', 'first_analysis', 'process')
+
+
+def cold_start(url, username, env):
+    """Time one fresh interpreter running PROBE."""
+    env = dict(os.environ, **env, BENCH_ROOT=ROOT, BENCH_USER=username, GITHUB_GRAPHQL_URL=url)
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, '-c', PROBE], env=env, check=True, capture_output=True, text=True)
+    timings = json.loads(output.stdout.strip().splitlines()[-1])
+    timings['process'] = time.perf_counter() - start
+    return timings
+
+
+def measure(url, runs, env):
+    users = [f'small-cold{i}' for i in range(runs)]
+    warm_accounts(url, users)
+    # One untimed start fills the OS page cache and writes the .pyc files
+    cold_start(url, users[0], env)
+
+    samples = [cold_start(url, username, env) for username in users]
+    result = {'entry': 'coldstart', 'profile': 'small'}
+    for phase in PHASES:
+        values = [sample[phase] for sample in samples]
+        result[f'{phase}_ms'] = {
+            'mean': round(sum(values) / len(values) * 1000, 1),
+            'p50': round(percentile(values, 0.5) * 1000, 1),
+            'max': round(max(values) * 1000, 1)
+        }
+    return result
+
+
+# (metric, direction): 1 if larger is worse
+COMPARED = tuple(((f'{phase}_ms', 'p50'), 1) for phase in PHASES)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark cold starts of api/index.py against the GraphQL stand-in.")
+    parser.add_argument('--runs', type=int, default=10, help="Fresh interpreters to time")
+    parser.add_argument('--latency', type=float, default=20, help="Stand-in latency per request in ms")
+    parser.add_argument('--jitter', type=float, default=5, help="Stand-in random extra latency in ms")
+    parser.add_argument('--fast-start', action='store_true', help="Start the instances with FAST_START=1")
+    parser.add_argument('--output', help="Write results as JSON to this file")
+    parser.add_argument('--compare', metavar='BASELINE', help="Compare with an earlier --output file")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed relative regression (default 0.2)")
+    args = parser.parse_args()
+    # start_standin takes the run.py options
+    args.error_rate, args.scale, args.fixtures = 0, 1.0, None
+    return args
+
+
+def main():
+    args = parse_args()
+    env = {
+        'GITHUB_TOKEN': 'bench',
+        'RESULT_CACHE_PATH': '',
+        'CONTRIBUTION_STORE_PATH': '',
+        'SINGLE_FLIGHT_LOCK_DIR': '',
+        'WATCH_STATE_PATH': '',
+        'FAST_START': '1' if args.fast_start else '0'
+    }
+    process, url = start_standin(args)
+    try:
+        result = measure(url, args.runs, env)
+    finally:
+        process.terminate()
+    print(json.dumps(result), flush=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump([result], f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare([result], json.load(f), args.tolerance, COMPARED)
+        if regressions:
+            print(f"Regressions beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
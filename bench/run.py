@@ -0,0 +1,243 @@
+"""
+Benchmark the three entry points against the offline GraphQL stand-in.
+
+    python bench/run.py --output bench.json
+    python bench/run.py --compare bench.json      # exit 1 on regressions
+
+For every entry point (calendar: api/index.py, history: app.py, verify:
+pp-github-trouble.py) and account size it measures end-to-end latency,
+GraphQL queries, points and response bytes per analysis, peak Python
+memory of one analysis, and throughput under concurrent load.
+"""
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import logging
+import os
+import socket
+import subprocess
+import sys
+import time
+import tracemalloc
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+ENTRIES = ('calendar', 'history', 'verify')
+PROFILES = ('small', 'typical', 'huge')
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_standin(args):
+    """Run the stand-in in its own process so its allocations do not count toward ours."""
+    port = free_port()
+    process = subprocess.Popen([
+        sys.executable, os.path.join(ROOT, 'bench', 'standin.py'), '--port', str(port),
+        '--latency', str(args.latency), '--jitter', str(args.jitter), '--rate-limit', '1000000',
+        '--error-rate', str(args.error_rate), '--scale', str(args.scale)
+    ] + (['--fixtures', args.fixtures] if args.fixtures else []), stdout=subprocess.DEVNULL)
+    url = f'http://127.0.0.1:{port}/graphql'
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(url, timeout=1).read()
+            return process, url
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError("GraphQL stand-in did not start")
+
+
+def load_entry_points(url):
+    """Import the entry points against the stand-in, with every cache and store disabled."""
+    os.environ.update({
+        'GITHUB_GRAPHQL_URL': url,
+        'GITHUB_TOKEN': 'bench',
+        'RESULT_CACHE_PATH': '',
+        'CONTRIBUTION_STORE_PATH': '',
+        'SINGLE_FLIGHT_LOCK_DIR': '',
+        'WATCH_STATE_PATH': ''
+    })
+    sys.path.insert(0, ROOT)
+    sys.path.insert(0, os.path.join(ROOT, 'api'))
+    import index
+    import app
+
+    spec = importlib.util.spec_from_file_location('pp_github_trouble', os.path.join(ROOT, 'pp-github-trouble.py'))
+    pp = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(pp)
+
+    def calendar(username):
+        error, data = index.get_contributions(username)
+        if error:
+            raise Exception(error)
+
+    def history(username):
+        result = app.get_commit_days(username)
+        if not isinstance(result[0], int):
+            raise Exception(result[0])
+
+    def verify(username):
+        result = pp.verify_github_contributions(username)
+        if 'error' in result:
+            raise Exception(result['error'])
+
+    # Per-analysis usage lines and pool warnings would drown the results
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger('urllib3').setLevel(logging.ERROR)
+    return {'calendar': calendar, 'history': history, 'verify': verify}
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+
+def warm_accounts(url, users):
+    """Have the stand-in build each synthetic account now, outside the timings."""
+    for username in users:
+        body = json.dumps({'query': 'query($username: String!) { user(login: $username) { createdAt } }',
+                           'variables': {'username': username}}).encode('utf-8')
+        request = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+        urllib.request.urlopen(request).read()
+
+
+def response_bytes():
+    from ghcontrib.tracing import TRACER
+    return sum(counters['bytes'] for counters in TRACER.graphql_stats().values())
+
+
+def measure(analyze, url, profile, runs, concurrency):
+    from ghcontrib.ratelimit import SCHEDULER
+
+    users = [f'{profile}-bench{i}' for i in range(max(runs, concurrency * 2))]
+    warm_accounts(url, users)
+    # One untimed analysis warms connections and import-time caches
+    analyze(users[0])
+
+    latencies, requests, cost = [], 0, 0
+    received = response_bytes()
+    for username in users[:runs]:
+        with SCHEDULER.track(username) as usage:
+            start = time.perf_counter()
+            analyze(username)
+            latencies.append(time.perf_counter() - start)
+        requests += usage.requests
+        cost += usage.cost
+    received = response_bytes() - received
+
+    tracemalloc.start()
+    analyze(users[0])
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(analyze, users))
+    elapsed = time.perf_counter() - start
+
+    return {
+        'latency_ms': {
+            'mean': round(sum(latencies) / len(latencies) * 1000, 1),
+            'p50': round(percentile(latencies, 0.5) * 1000, 1),
+            'p95': round(percentile(latencies, 0.95) * 1000, 1),
+            'max': round(max(latencies) * 1000, 1)
+        },
+        'queries_per_analysis': round(requests / runs, 2),
+        'cost_per_analysis': round(cost / runs, 2),
+        'kb_received_per_analysis': round(received / runs / 1024, 1),
+        'peak_memory_kb': round(peak / 1024, 1),
+        'throughput_per_s': round(len(users) / elapsed, 2),
+        'concurrency': concurrency
+    }
+
+
+# (metric, direction): 1 if larger is worse, -1 if smaller is worse
+COMPARED = (
+    (('latency_ms', 'p50'), 1),
+    (('queries_per_analysis',), 1),
+    (('kb_received_per_analysis',), 1),
+    (('peak_memory_kb',), 1),
+    (('throughput_per_s',), -1),
+)
+
+
+def compare(results, baseline, tolerance, compared=COMPARED):
+    """Print the change of each tracked metric and return the regressions beyond tolerance."""
+    previous = {(r['entry'], r['profile']): r for r in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get((result['entry'], result['profile']))
+        if before is None:
+            continue
+        for path, direction in compared:
+            old, new = before, result
+            for part in path:
+                old, new = old.get(part), new[part]
+                if old is None:
+                    break
+            if old is None:
+                # Metric added after the baseline was recorded
+                continue
+            change = (new - old) / old if old else 0.0
+            name = f"{result['entry']}/{result['profile']} {'.'.join(path)}"
+            print(f"{name:45} {old:>10} -> {new:<10} {change:+.1%}")
+            if change * direction > tolerance:
+                regressions.append(name)
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the analyzers against an offline GraphQL stand-in.")
+    parser.add_argument('--entries', default=','.join(ENTRIES), help="Comma-separated subset of " + ', '.join(ENTRIES))
+    parser.add_argument('--profiles', default=','.join(PROFILES), help="Comma-separated subset of " + ', '.join(PROFILES))
+    parser.add_argument('--runs', type=int, default=3, help="Timed sequential analyses per scenario")
+    parser.add_argument('--concurrency', type=int, default=4, help="Analyses in flight for the throughput run")
+    parser.add_argument('--latency', type=float, default=20, help="Stand-in latency per request in ms")
+    parser.add_argument('--jitter', type=float, default=5, help="Stand-in random extra latency in ms")
+    parser.add_argument('--error-rate', type=float, default=0, help="Share of stand-in responses that are 502s")
+    parser.add_argument('--scale', type=float, default=1.0, help="Commits per repository multiplier")
+    parser.add_argument('--fixtures', help="Recorded responses for the stand-in to replay")
+    parser.add_argument('--output', help="Write results as JSON to this file")
+    parser.add_argument('--compare', metavar='BASELINE', help="Compare with an earlier --output file")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed relative regression (default 0.2)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    process, url = start_standin(args)
+    try:
+        entry_points = load_entry_points(url)
+        results = []
+        for entry in args.entries.split(','):
+            for profile in args.profiles.split(','):
+                # Keep any output of the entry points out of the result lines
+                with contextlib.redirect_stdout(io.StringIO()):
+                    result = dict(entry=entry, profile=profile,
+                                  **measure(entry_points[entry], url, profile, args.runs, args.concurrency))
+                print(json.dumps(result), flush=True)
+                results.append(result)
+    finally:
+        process.terminate()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"Regressions beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
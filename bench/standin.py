@@ -0,0 +1,454 @@
+"""
+Offline stand-in for the GitHub GraphQL API.
+
+Answers every query shape the analyzers send (contribution calendars,
+repository lists and commit history, commit contributions by repository)
+from synthetic accounts, or replays recorded responses. Latency, rate
+limits and errors can be injected. With --record, requests are proxied to
+the real API and saved as fixtures for later --fixtures runs. Point an
+entry point at it with GITHUB_GRAPHQL_URL:
+
+    python bench/standin.py --port 8765 --latency 40
+    GITHUB_GRAPHQL_URL=http://127.0.0.1:8765/graphql GITHUB_TOKEN=x python app.py
+
+Account size is chosen by username prefix: 'small-', 'typical-' or
+'huge-' (anything else is typical); 'ghost-' users do not exist. Logins
+ending in '-org<suffix>' are organizations whose repositories are shared
+by their members '<org>-m0' to '<org>-m4'; each member also lists the
+organization's repositories as their own.
+"""
+import argparse
+import base64
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# repositories, commits per repository, share of commits authored by the user
+PROFILES = {
+    'small': (5, 40, 0.9),
+    'typical': (30, 250, 0.8),
+    'huge': (100, 800, 0.7),
+}
+
+# Synthetic history covers this many days before today
+HISTORY_DAYS = 4 * 365
+
+PAGE_SIZE = 100
+
+ORG_MEMBERS = 5
+
+ORGANIZATION = re.compile(r'.+-org\w*$', re.IGNORECASE)
+
+
+def contribution_cursor(repository, offset):
+    """An opaque cursor, like GitHub's; it only pages the repository it was issued for."""
+    return base64.b64encode(f'cursor:{repository}:{offset}'.encode()).decode()
+
+
+def parse_contribution_cursor(after):
+    """(repository, offset) of a contribution_cursor, or (None, 0) without one."""
+    if not after:
+        return None, 0
+    _, repository, offset = base64.b64decode(after).decode().rsplit(':', 2)
+    return repository, int(offset)
+
+
+def user_id(login):
+    """An opaque node id for a user, like GitHub's."""
+    return base64.b64encode(f'user:{login}'.encode()).decode()
+
+
+def login_of(node_id):
+    return base64.b64decode(node_id).decode().split(':', 1)[1]
+
+
+def not_found(kind, login):
+    """A GraphQL error like GitHub's for a login that does not resolve."""
+    return {'type': 'NOT_FOUND', 'message': f"Could not resolve to {kind} with the login of '{login}'."}
+
+
+def organization_of(login):
+    """The synthetic organization a member belongs to, e.g. 'small-org1' for 'small-org1-m2'."""
+    org = login.rsplit('-', 1)[0]
+    return org if ORGANIZATION.match(org) and org != login else None
+
+
+def organization_members(org):
+    return [f'{org}-m{i}' for i in range(ORG_MEMBERS)]
+
+
+def profile_for(username):
+    prefix = username.split('-', 1)[0].lower()
+    return PROFILES.get(prefix, PROFILES['typical'])
+
+
+class Account:
+    """Deterministic synthetic account: repositories and their commit timestamps, newest first."""
+
+    def __init__(self, username, scale=1.0, organization=None):
+        self.login = username
+        # An organization's commits are spread over its members
+        authors = organization_members(username) if ORGANIZATION.match(username) else [username]
+        repo_count, commits, own_share = profile_for(username)
+        rng = random.Random(username.lower())
+        now = datetime.now(timezone.utc).replace(microsecond=0)
+        self.created_at = '2012-01-01T00:00:00Z'
+        self.repos = []
+        for i in range(repo_count):
+            created = now - timedelta(days=HISTORY_DAYS + rng.randrange(365))
+            count = max(1, int(commits * scale * rng.uniform(0.5, 1.5)))
+            stamps = sorted((now - timedelta(seconds=rng.randrange(HISTORY_DAYS * 86400)) for _ in range(count)),
+                            reverse=True)
+            commits_by = [(stamp.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                           rng.choice(authors) if rng.random() < own_share else 'someone-else') for stamp in stamps]
+            self.repos.append({
+                'name': f'repo{i}',
+                'owner': username,
+                'created_at': created.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                'commits': commits_by
+            })
+        if organization is not None:
+            self.repos.extend(organization.repos)
+        self.daily = Counter(stamp[:10] for repo in self.repos for stamp, author in repo['commits']
+                             if author == username)
+
+    def repo(self, name):
+        for repo in self.repos:
+            if repo['name'] == name and repo['owner'] == self.login:
+                return repo
+        return None
+
+
+class StandIn:
+    """Builds GraphQL responses and applies the configured latency, rate limit and errors."""
+
+    def __init__(self, latency=0.0, jitter=0.0, rate_limit=5000, error_rate=0.0, secondary_rate=0.0,
+                 scale=1.0, fixtures=None, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.error_rate = error_rate
+        self.secondary_rate = secondary_rate
+        self.scale = scale
+        self.fixtures = fixtures
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.reset()
+        self.account = lru_cache(maxsize=256)(self._account)
+
+    def _account(self, username):
+        org = organization_of(username)
+        return Account(username, self.scale, self.account(org) if org else None)
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.errors = 0
+            self.remaining = self.rate_limit
+            self.reset_at = int(time.time()) + 3600
+
+    def stats(self):
+        with self._lock:
+            return {'requests': self.requests, 'errors': self.errors, 'remaining': self.remaining}
+
+    def handle(self, body):
+        """Return (status, headers, payload) for one POST body."""
+        with self._lock:
+            self.requests += 1
+            roll = self._rng.random()
+            delay = self.latency + self._rng.uniform(0, self.jitter)
+            if self.remaining > 0:
+                self.remaining -= 1
+            remaining = self.remaining
+        if delay:
+            time.sleep(delay)
+
+        headers = {
+            'X-RateLimit-Limit': str(self.rate_limit),
+            'X-RateLimit-Remaining': str(remaining),
+            'X-RateLimit-Reset': str(self.reset_at)
+        }
+        if remaining <= 0:
+            return self._error(403, headers, 'API rate limit exceeded')
+        if roll < self.error_rate:
+            return self._error(502, headers, 'Server Error')
+        if roll < self.error_rate + self.secondary_rate:
+            headers['Retry-After'] = '1'
+            return self._error(403, headers, 'You have exceeded a secondary rate limit')
+
+        request = json.loads(body)
+        if self.fixtures:
+            recorded = load_fixture(self.fixtures, request)
+            if recorded is not None:
+                return 200, headers, recorded
+
+        data = self.respond(request['query'], request.get('variables') or {})
+        data.setdefault('data', {})['rateLimit'] = {'cost': 1, 'remaining': remaining}
+        return 200, headers, data
+
+    def _error(self, status, headers, message):
+        with self._lock:
+            self.errors += 1
+        return status, headers, {'message': message}
+
+    def respond(self, query, variables):
+        if 'history(' in query:
+            # Verification follow-ups page several repositories at once, one r{i} alias each
+            aliases = re.findall(r'(r(\d+)): repository\(', query)
+            if aliases:
+                return {'data': {alias: self.history(variables, query, index) for alias, index in aliases}}
+            return {'data': {'repository': self.history(variables, query)}}
+
+        if 'organization(' in query:
+            organization = self.organization(variables, query)
+            if organization is None:
+                return {'data': {'organization': None},
+                        'errors': [not_found('an Organization', variables['org'])]}
+            return {'data': {'organization': organization}}
+
+        batch = re.findall(r'(u\d+): user\(login: \$(login\d+)\)', query)
+        if batch:
+            fields = query[query.index('fragment'):]
+            data, errors = {}, []
+            for alias, variable in batch:
+                data[alias] = self.user(variables[variable], fields, variables)
+                if data[alias] is None:
+                    errors.append(dict(not_found('a User', variables[variable]), path=[alias]))
+            return dict({'data': data}, **({'errors': errors} if errors else {}))
+
+        user = self.user(variables['username'], query, variables)
+        if user is None:
+            return {'data': {'user': None}, 'errors': [not_found('a User', variables['username'])]}
+        return {'data': {'user': user}}
+
+    def organization(self, variables, query):
+        org = variables['org']
+        if not ORGANIZATION.match(org):
+            return None
+        organization = {}
+        if 'membersWithRole' in query:
+            members = organization_members(org)
+            offset = int(variables.get('cursor') or 0)
+            page = members[offset:offset + PAGE_SIZE]
+            organization['membersWithRole'] = {
+                'pageInfo': {'endCursor': str(offset + len(page)),
+                             'hasNextPage': offset + len(page) < len(members)},
+                'nodes': [{'login': login} for login in page]
+            }
+        if 'repositories(first: 100' in query:
+            organization['repositories'] = {'nodes': [{'name': repo['name'], 'owner': {'login': org}}
+                                                      for repo in self.account(org).repos[:100]]}
+        return organization
+
+    def user(self, login, query, variables):
+        """Build the user object with the fields the query selects."""
+        if login.lower().startswith('ghost'):
+            return None
+        account = self.account(login)
+        user = {'id': user_id(login), 'login': login, 'createdAt': account.created_at}
+
+        if 'repositories(first: 1,' in query:
+            oldest = min(repo['created_at'] for repo in account.repos)
+            user['repositories'] = {'nodes': [{'createdAt': oldest}]}
+        elif 'repositories(first: 100' in query:
+            user['repositories'] = {'nodes': [{'name': repo['name'], 'owner': {'login': repo['owner']}}
+                                              for repo in account.repos[:100]]}
+
+        for alias, index in re.findall(r'(y(\d+)): contributionsCollection', query):
+            user[alias] = {'contributionCalendar': self.calendar(account, variables[f'from{index}'],
+                                                                 variables[f'to{index}'], query)}
+        for alias, index in re.findall(r'(w(\d+)): contributionsCollection', query):
+            user[alias] = {'commitContributionsByRepository': self.by_repository(
+                account, variables[f'from{index}'], variables[f'to{index}'], None)}
+        if 'contributionsCollection(from: $from,' in query:
+            user['contributionsCollection'] = {'commitContributionsByRepository': self.by_repository(
+                account, variables['from'], variables['to'], variables.get('after'), 'createdAt' in query)}
+        return user
+
+    def calendar(self, account, start, end, query):
+        # Only the optional fields the query selects are returned, as GitHub does
+        with_date = re.search(r'\bdate\b', query) is not None
+        day = date.fromisoformat(start[:10])
+        last = date.fromisoformat(end[:10])
+        dates, days = [], []
+        while day <= last:
+            dates.append(day.isoformat())
+            days.append({'contributionCount': account.daily.get(day.isoformat(), 0)})
+            if with_date:
+                days[-1]['date'] = day.isoformat()
+            day += timedelta(days=1)
+        weeks = []
+        for i in range(0, len(days), 7):
+            weeks.append({'contributionDays': days[i:i + 7]})
+            if 'firstDay' in query:
+                weeks[-1]['firstDay'] = dates[i]
+        calendar = {'weeks': weeks}
+        if 'totalContributions' in query:
+            calendar['totalContributions'] = sum(d['contributionCount'] for d in days)
+        return calendar
+
+    def by_repository(self, account, start, end, after, with_created=True):
+        cursor_repository, cursor_offset = parse_contribution_cursor(after)
+        entries = []
+        for repo in account.repos[:100]:
+            nodes = [stamp for stamp, author in repo['commits']
+                     if author == account.login and start <= stamp <= end]
+            if not nodes:
+                continue
+            name = f"{repo['owner']}/{repo['name']}"
+            # Other repositories in the list are not moved by this cursor
+            offset = cursor_offset if name == cursor_repository else 0
+            page = nodes[offset:offset + PAGE_SIZE]
+            repository = {'nameWithOwner': name}
+            if with_created:
+                repository['createdAt'] = repo['created_at']
+            entries.append({
+                'repository': repository,
+                'contributions': {
+                    'pageInfo': {'endCursor': contribution_cursor(name, offset + len(page)),
+                                 'hasNextPage': offset + len(page) < len(nodes)},
+                    'nodes': [{'occurredAt': stamp} for stamp in page]
+                }
+            })
+        return entries
+
+    def history(self, variables, query, index=''):
+        account = self.account(variables[f'owner{index}'])
+        repo = account.repo(variables[f'name{index}'])
+        if repo is None:
+            return None
+        since = variables.get(f'since{index}') or ''
+        until = variables.get(f'until{index}')
+        login = login_of(variables['author']) if variables.get('author') else None
+        commits = [commit for commit in repo['commits'] if commit[0] >= since and
+                   (until is None or commit[0] <= until) and (login is None or commit[1] == login)]
+        offset = int(variables.get(f'cursor{index}') or 0)
+        page = commits[offset:offset + PAGE_SIZE]
+        nodes = []
+        for i, (stamp, author) in enumerate(page):
+            nodes.append({'committedDate': stamp, 'author': {'user': {'login': author}}})
+            # The stand-in's commits are authored and committed at the same time
+            if 'authoredDate' in query:
+                nodes[-1]['authoredDate'] = stamp
+            if 'message' in query:
+                nodes[-1]['message'] = f'Commit {offset + i} to {repo["name"]}'
+        history = {'pageInfo': {'endCursor': str(offset + len(page)),
+                                'hasNextPage': offset + len(page) < len(commits)}}
+        if 'edges' in query:
+            history['edges'] = [{'node': node} for node in nodes]
+        else:
+            history['nodes'] = nodes
+        return {'defaultBranchRef': {'target': {'history': history}}}
+
+
+def fixture_name(request):
+    key = json.dumps({'query': ' '.join(request['query'].split()), 'variables': request.get('variables') or {}},
+                     sort_keys=True)
+    return hashlib.sha1(key.encode('utf-8')).hexdigest() + '.json'
+
+
+def load_fixture(directory, request):
+    path = os.path.join(directory, fixture_name(request))
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def record_fixture(directory, body, upstream, authorization):
+    """Forward one request to the real API and save a successful response as a fixture."""
+    import requests
+
+    response = requests.post(upstream, data=body, timeout=30, headers={
+        'Content-Type': 'application/json',
+        'Authorization': authorization or f"Bearer {os.getenv('GITHUB_TOKEN', '')}"
+    })
+    payload = response.json()
+    if response.status_code == 200 and 'errors' not in payload:
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, fixture_name(json.loads(body))), 'w') as f:
+            json.dump(payload, f)
+    return response.status_code, payload
+
+
+def make_handler(standin, record=None, upstream=None):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            if record:
+                status, payload = record_fixture(record, body, upstream, self.headers.get('Authorization'))
+                headers = {}
+            else:
+                status, headers, payload = standin.handle(body)
+            data = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            # Counters for benchmark runs
+            data = json.dumps(standin.stats()).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(standin, host='127.0.0.1', port=0):
+    """Start the stand-in on a background thread and return (server, url)."""
+    server = ThreadingHTTPServer((host, port), make_handler(standin))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://{host}:{server.server_address[1]}/graphql'
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Offline stand-in for the GitHub GraphQL API.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0, help="Milliseconds added to every response")
+    parser.add_argument('--jitter', type=float, default=0, help="Extra random milliseconds, up to this value")
+    parser.add_argument('--rate-limit', type=int, default=5000, help="Requests allowed per hour")
+    parser.add_argument('--error-rate', type=float, default=0, help="Share of requests answered with a 502")
+    parser.add_argument('--secondary-rate', type=float, default=0,
+                        help="Share of requests answered with a secondary rate limit 403")
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help="Multiplier for commits per repository, i.e. pagination depth")
+    parser.add_argument('--fixtures', help="Directory of recorded responses, replayed before synthesizing")
+    parser.add_argument('--record', metavar='DIR', help="Proxy to --upstream and save responses into DIR")
+    parser.add_argument('--upstream', default='https://api.github.com/graphql')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    standin = StandIn(latency=args.latency / 1000, jitter=args.jitter / 1000, rate_limit=args.rate_limit,
+                      error_rate=args.error_rate, secondary_rate=args.secondary_rate, scale=args.scale,
+                      fixtures=args.fixtures)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(standin, args.record, args.upstream))
+    print(f"GraphQL stand-in listening on http://{args.host}:{args.port}/graphql")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
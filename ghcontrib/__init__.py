@@ -0,0 +1,18 @@
+"""Shared building blocks for the GitHub contribution analyzers."""
+import os
+
+# Modules read their settings from the environment at import time. Vercel
+# injects the project's variables itself, so the .env lookup is skipped there.
+if not os.getenv('VERCEL'):
+    from dotenv import load_dotenv
+    load_dotenv()
+
+__all__ = ['ContributionAnalyzer', 'PRECISIONS']
+
+
+def __getattr__(name):
+    # The analyzer pulls in every crawler; load it only when it is asked for
+    if name in __all__:
+        from . import analyzer
+        return getattr(analyzer, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
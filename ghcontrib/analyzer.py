@@ -0,0 +1,281 @@
+import functools
+import math
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+
+from .cache import make_key
+from .calendar import calendar_days, calendar_window, fetch_calendars, sync_ranges
+from .days import ContributionDays, contribution_dataset
+from .history import crawl_repositories, fetch_repositories
+from .ratelimit import SCHEDULER
+from .tracing import TRACER
+from .verify import count_commit_days, fetch_commit_contributions
+
+# What a day has to contain to count, from coarsest to finest:
+#   contributions: any contribution on the profile calendar (commits, PRs, issues, reviews)
+#   commits:       commits GitHub credits to the user, after account and repository creation
+#   history:       commits authored by the user on the default branch of their own repositories
+PRECISIONS = ('contributions', 'commits', 'history')
+
+
+def analysis_window(years=3, since=None, end=None):
+    """(start, end) of an analysis: from since ('YYYY-MM-DDTHH:MM:SSZ') or years of 365 days back, to end (now, UTC)."""
+    end = end or datetime.utcnow()
+    start = datetime.strptime(since, '%Y-%m-%dT%H:%M:%SZ') if since else end - timedelta(days=365 * years)
+    return start, end
+
+
+def analysis_key(username, years, strategy, since=None):
+    """Result cache key of one analysis; every entry point caches its datasets under this scheme."""
+    return make_key(username, since or f'{years}y', strategy)
+
+
+def analysis_dataset(username, days, start, end, strategy, **details):
+    """contribution_dataset of the days from start to end, naming the strategy plus any details it reported."""
+    window = days.slice(start.date(), end.date())
+    return dict(contribution_dataset(username, window), strategy=strategy, **details)
+
+
+def to_contribution_days(day_counts, start, end):
+    """Load (date, count) pairs into a ContributionDays window; later pairs win."""
+    days = ContributionDays(start, end)
+    for day, count in day_counts:
+        days.set(day, count)
+    return days
+
+
+class CalendarStrategy:
+    """
+    Contribution calendar: every yearly window in one request.
+
+    With a ContributionStore, calendars are merged into it, and a user that
+    was synced before only has the days since their watermark (minus
+    overlap_days) fetched again.
+    """
+
+    name = 'calendar'
+    precision = 'contributions'
+
+    def __init__(self, store=None, overlap_days=2, headers=None, timeout=None):
+        self.store = store
+        self.overlap_days = overlap_days
+        self.headers = headers
+        self.timeout = timeout
+
+    def estimate(self, username, years):
+        return 1
+
+    def plan(self, username, start, end):
+        """The (start, end) ranges to fetch, at most a year each."""
+        state = self.store.sync_state(username) if self.store is not None else None
+        if state is not None and state[0] <= start.date():
+            sync_start = datetime.combine(state[1], datetime.min.time()) - timedelta(days=self.overlap_days)
+            return sync_ranges(max(sync_start, start), end)
+        return sync_ranges(start, end)
+
+    def build(self, username, calendars, ranges, start, end):
+        """Turn the fetched calendars into a ContributionDays from start to end."""
+        if self.store is None:
+            return calendar_window(calendars, start.date(), end.date())
+        self.store.merge(username, calendar_days(calendars), ranges[-1][0].date(), end.date())
+        return to_contribution_days(self.store.days(username, start.date(), end.date()), start.date(), end.date())
+
+    def analyze(self, client, username, start, end, progress=None):
+        ranges = self.plan(username, start, end)
+        calendars = fetch_calendars(username, ranges, client, headers=self.headers, timeout=self.timeout)
+        with TRACER.span('aggregate'):
+            return self.build(username, calendars, ranges, start, end), {}
+
+
+class ContributionsStrategy:
+    """commitContributionsByRepository: one request plus follow-ups for repositories with deep history."""
+
+    name = 'contributions'
+    precision = 'commits'
+
+    def estimate(self, username, years):
+        # Most users fit in the first request; deep repositories cost a follow-up round each
+        return 2
+
+    def analyze(self, client, username, start, end, progress=None):
+        report = None
+        if progress is not None:
+            report = lambda user_created, contributions: progress(
+                count_commit_days(contributions.entries(), user_created),
+                repos=len(contributions.nodes), pages=contributions.pages)
+        years = max(1, math.ceil((end - start).days / 365))
+        user_created, contributions = fetch_commit_contributions(username, years, client, report, end_date=end)
+        # The account start is what a verification reports alongside the days
+        return count_commit_days(contributions.entries(), user_created), {'account_start': user_created}
+
+
+class HistoryStrategy:
+    """
+    Default-branch history of the user's repositories, page by page.
+
+    :param log_size: Most recent matching commits kept for debugging (0 disables)
+    :param report_log: callable(deque of (date, message, repository), ContributionDays) run with them
+    """
+
+    name = 'history'
+    precision = 'history'
+
+    def __init__(self, log_size=0, report_log=None):
+        self.log_size = log_size
+        self.report_log = report_log
+
+    def estimate(self, username, years):
+        # The repository list plus at least one history page for each of a typical account's repositories
+        return 1 + 30
+
+    def analyze(self, client, username, start, end, progress=None):
+        repos = fetch_repositories(username, client)
+        TRACER.annotate(repositories=len(repos))
+        since = start.strftime('%Y-%m-%dT%H:%M:%SZ')
+        days = ContributionDays()
+        log = deque(maxlen=self.log_size) if self.log_size else None
+        pages = 0
+        # Histories are streamed concurrently but merged back in repository order
+        for done, state in enumerate(crawl_repositories(repos, username, since, client=client,
+                                                        log_size=self.log_size), 1):
+            days.update(state.days)
+            if log is not None:
+                log.extend((date, message, state.full_name) for date, message in state.log)
+            pages += state.pages
+            if progress is not None:
+                progress(days, repos_done=done, repos_total=len(repos), pages=pages)
+        if log is not None and self.report_log is not None:
+            self.report_log(log, days)
+        return days, {'repositories': len(repos), 'pages': pages}
+
+
+def default_strategies():
+    return [CalendarStrategy(), ContributionsStrategy(), HistoryStrategy()]
+
+
+class ContributionAnalyzer:
+    """
+    Counts a user's active days with whichever strategy is cheapest for the precision asked for.
+
+    A strategy can serve any precision up to its own (see PRECISIONS).
+    Estimates are in GraphQL points: each strategy's prior until a user has
+    been analyzed with it, then what that analysis actually cost. Results
+    go through the optional ResultCache and SingleFlight, and with a
+    BackgroundRefresher a stale cached dataset is served while it is
+    recomputed.
+
+    Every method takes the window as years of 365 days back from now, or
+    as since, a fixed 'YYYY-MM-DDTHH:MM:SSZ' start.
+    """
+
+    def __init__(self, strategies=None, client=None, cache=None, single_flight=None, refresher=None,
+                 scheduler=SCHEDULER, history_size=4096):
+        self.strategies = {strategy.name: strategy for strategy in (strategies or default_strategies())}
+        self.client = client
+        self.cache = cache
+        self.single_flight = single_flight
+        self.refresher = refresher
+        self.scheduler = scheduler
+        self.history_size = history_size
+        self._lock = threading.Lock()
+        self._costs = OrderedDict()
+
+    def estimate(self, username, years=3, strategy=None):
+        """Estimated points of one strategy, or {name: points} for all of them."""
+        if strategy is None:
+            return {name: self.estimate(username, years, name) for name in self.strategies}
+        with self._lock:
+            observed = self._costs.get((strategy, username.lower(), years))
+        return observed if observed is not None else self.strategies[strategy].estimate(username, years)
+
+    def choose(self, username, years=3, precision='contributions'):
+        """The cheapest strategy at or above precision; ties go to the coarser one."""
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision '{precision}', expected one of {', '.join(PRECISIONS)}")
+        candidates = [strategy for strategy in self.strategies.values()
+                      if PRECISIONS.index(strategy.precision) >= PRECISIONS.index(precision)]
+        if not candidates:
+            raise ValueError(f"No strategy provides '{precision}' precision")
+        return min(candidates, key=lambda strategy: (self.estimate(username, years, strategy.name),
+                                                     PRECISIONS.index(strategy.precision)))
+
+    def _strategy(self, username, years, precision, strategy):
+        return self.strategies[strategy] if strategy else self.choose(username, years, precision)
+
+    def key(self, username, years=3, precision='contributions', strategy=None, since=None):
+        """Result cache key the analysis would be stored under."""
+        return analysis_key(username, years, self._strategy(username, years, precision, strategy).name, since)
+
+    def lookup(self, username, years=3, precision='contributions', strategy=None, since=None):
+        """
+        Return (cached dataset or None, stale) without analyzing.
+
+        A stale dataset is only returned with a refresher, which recomputes
+        it in the background.
+        """
+        if self.cache is None:
+            return None, False
+        chosen = self._strategy(username, years, precision, strategy)
+        key = analysis_key(username, years, chosen.name, since)
+        data, stale = self.cache.lookup(key)
+        if stale:
+            if self.refresher is None:
+                return None, False
+            self.refresher.refresh(key, functools.partial(self.refresh, username, years, strategy=chosen.name,
+                                                          since=since))
+        return data, stale
+
+    def analyze(self, username, years=3, precision='contributions', strategy=None, progress=None, since=None):
+        """
+        Return the dataset of an analysis from the cache, or analyze on a miss.
+
+        :param strategy: Name of a strategy to use instead of choosing one by precision
+        :param progress: Optional callable(ContributionDays so far, **counters) for strategies that page
+        :return: contribution_dataset plus the 'strategy' used and the details it reported
+        """
+        if not username:
+            raise ValueError("Username must be provided")
+        chosen = self._strategy(username, years, precision, strategy)
+        data, _ = self.lookup(username, years, strategy=chosen.name, since=since)
+        if data is not None:
+            return data
+        return self.refresh(username, years, strategy=chosen.name, progress=progress, since=since)
+
+    def refresh(self, username, years=3, precision='contributions', strategy=None, progress=None, since=None):
+        """Analyze, sharing the work with concurrent callers of the same key, and cache the dataset."""
+        chosen = self._strategy(username, years, precision, strategy)
+        key = analysis_key(username, years, chosen.name, since)
+        if self.single_flight is not None:
+            data = self.single_flight.do(key, self.run, username, years, strategy=chosen.name, progress=progress,
+                                         since=since)
+        else:
+            data = self.run(username, years, strategy=chosen.name, progress=progress, since=since)
+        if self.cache is not None:
+            self.cache.set(key, data)
+        return data
+
+    def run(self, username, years=3, precision='contributions', strategy=None, progress=None, since=None):
+        """One analysis, bypassing the cache."""
+        if not username:
+            raise ValueError("Username must be provided")
+        chosen = self._strategy(username, years, precision, strategy)
+        start, end = analysis_window(years, since)
+        window = since or years
+        with self.scheduler.track(username) as usage, \
+                TRACER.span('analysis', entry=chosen.name, window=str(window)):
+            days, details = chosen.analyze(self.client, username, start, end, progress)
+            with TRACER.span('dataset'):
+                data = analysis_dataset(username, days, start, end, chosen.name, **details)
+            TRACER.annotate(**{f'graphql.{name}': value for name, value in usage.as_dict().items()})
+        # Responses without a rateLimit field still cost at least a point per request
+        self._remember(chosen.name, username, window, usage.cost or usage.requests)
+        return data
+
+    def _remember(self, strategy, username, window, cost):
+        with self._lock:
+            key = (strategy, username.lower(), window)
+            self._costs[key] = cost
+            self._costs.move_to_end(key)
+            while len(self._costs) > self.history_size:
+                self._costs.popitem(last=False)
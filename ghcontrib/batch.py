@@ -0,0 +1,180 @@
+import contextvars
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from .client import get_client, transport_errors
+from .ratelimit import SCHEDULER, RateLimitExceeded
+from .verify import (RepositoryContributions, account_start_date, contribution_windows, count_commit_days,
+                     fetch_remaining_pages, verification_fields, verification_result, window_params,
+                     window_variables)
+
+logger = logging.getLogger(__name__)
+
+# Users packed into one GraphQL request
+BATCH_SIZE = int(os.getenv('BATCH_SIZE', '10'))
+
+# Batches in flight at the same time
+BATCH_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', '4'))
+
+
+def build_batch_query(count, window_count):
+    """Build a query with one aliased user(login:) field per username."""
+    params = ', '.join(f'$login{i}: String!' for i in range(count))
+    users = '\n'.join(f'        u{i}: user(login: $login{i}) {{ ...VerificationFields }}' for i in range(count))
+    return f'''
+    query({window_params(window_count)}, {params}) {{
+{users}
+        rateLimit {{
+            cost
+            remaining
+        }}
+    }}
+
+    fragment VerificationFields on User {{{verification_fields(window_count)}}}
+    '''
+
+
+def verify_batch(usernames, threshold=120, years_back=3, client=None, include_days=False):
+    """
+    Verify several users with a single GraphQL request.
+
+    :param include_days: Also return each user's ContributionDays under 'days'
+    :return: One result dict per username, in order; failures carry an 'error' key
+    """
+    client = client or get_client()
+    windows = contribution_windows(years_back)
+    variables = window_variables(windows)
+    for i, username in enumerate(usernames):
+        variables[f'login{i}'] = username
+
+    try:
+        response, data = client.execute(build_batch_query(len(usernames), len(windows)), variables,
+                                        name='verification_batch')
+    except (RateLimitExceeded, *transport_errors()) as e:
+        # Only this batch fails; the others in flight carry on
+        error = str(e) or type(e).__name__
+        return [{'username': username, 'valid': False, 'error': error} for username in usernames]
+
+    if response.status_code != 200:
+        error = f"GitHub API error: {response.status_code}"
+        return [{'username': username, 'valid': False, 'error': error} for username in usernames]
+
+    # Errors carry the alias of the user they belong to in their path
+    alias_errors = {}
+    for error in data.get('errors', []):
+        alias = (error.get('path') or [None])[0]
+        alias_errors[alias] = error['message']
+
+    results = []
+    users = data.get('data') or {}
+    for i, username in enumerate(usernames):
+        user = users.get(f'u{i}')
+        if user is None:
+            error = alias_errors.get(f'u{i}') or alias_errors.get(None) or f"User '{username}' not found"
+            results.append({'username': username, 'valid': False, 'error': error})
+            continue
+
+        # Only users with more than one page in some repository cost extra requests
+        contributions = RepositoryContributions()
+        contributions.add_user(user, len(windows))
+        try:
+            fetch_remaining_pages(windows, contributions, client)
+        except Exception as e:
+            results.append({'username': username, 'valid': False, 'error': str(e)})
+            continue
+
+        user_created = account_start_date(user)
+        commit_days = count_commit_days(contributions.entries(), user_created)
+        result = dict(username=username, **verification_result(commit_days, threshold, years_back, user_created))
+        if include_days:
+            result['days'] = commit_days
+        results.append(result)
+    return results
+
+
+def iter_batches(usernames, size):
+    batch = []
+    for username in usernames:
+        batch.append(username)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def verify_many(usernames, threshold=120, years_back=3, batch_size=BATCH_SIZE,
+                concurrency=BATCH_CONCURRENCY, client=None):
+    """
+    Verify a stream of usernames, yielding results as their batches complete.
+
+    Only a bounded number of batches is in flight, so the username stream can
+    be arbitrarily long. Rate limits are handled by the shared scheduler.
+    """
+    client = client or get_client()
+    batches = iter_batches(usernames, batch_size)
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        pending = set()
+        for batch in batches:
+            pending.add(pool.submit(contextvars.copy_context().run,
+                                    verify_batch, batch, threshold, years_back, client))
+            if len(pending) >= concurrency * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from future.result()
+        for future in pending:
+            yield from future.result()
+
+
+def read_usernames(stream, skip=()):
+    """Yield usernames from a text stream, one per line, ignoring blanks, comments and skip."""
+    for line in stream:
+        username = line.strip()
+        if username and not username.startswith('#') and username.lower() not in skip:
+            yield username
+
+
+def load_checkpoint(path):
+    """Return the lowercased usernames already recorded in a checkpoint file."""
+    if not path or not os.path.exists(path):
+        return set()
+    with open(path) as checkpoint:
+        return {line.strip().lower() for line in checkpoint if line.strip()}
+
+
+def run_batch(input_stream, output_stream, checkpoint_path=None, threshold=120, years_back=3,
+              batch_size=BATCH_SIZE, concurrency=BATCH_CONCURRENCY):
+    """
+    Verify usernames from input_stream and write one JSON result per line to output_stream.
+
+    Successfully verified usernames are appended to checkpoint_path, so a
+    restarted run skips them; failed users are retried on the next run.
+    """
+    done = load_checkpoint(checkpoint_path)
+    if done:
+        logger.info(f"Resuming batch, skipping {len(done)} checkpointed users")
+
+    checkpoint = open(checkpoint_path, 'a') if checkpoint_path else None
+    verified = failed = 0
+    try:
+        with SCHEDULER.track('batch') as usage:
+            usernames = read_usernames(input_stream, done)
+            for result in verify_many(usernames, threshold, years_back, batch_size, concurrency):
+                output_stream.write(json.dumps(result) + '\n')
+                output_stream.flush()
+                if 'error' in result:
+                    failed += 1
+                    continue
+                verified += 1
+                if checkpoint:
+                    checkpoint.write(result['username'] + '\n')
+                    checkpoint.flush()
+    finally:
+        if checkpoint:
+            checkpoint.close()
+
+    logger.info(f"Batch finished: {verified} verified, {failed} failed, {usage.cost} points")
+    return {'verified': verified, 'failed': failed, 'query_usage': usage.as_dict()}
@@ -0,0 +1,173 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def make_key(username, window, granularity='day'):
+    """Build the cache key for one analysis of a user."""
+    return (username.lower(), str(window), granularity)
+
+
+class SQLiteCache:
+    """On-disk cache tier so warm results survive worker restarts."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        ''')
+        self._conn.commit()
+
+    def get(self, key):
+        """Return (value, expires_at) for a key, or None if absent."""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value, expires_at FROM results WHERE key = ?', ('|'.join(key),)
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def set(self, key, value, expires_at):
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO results (key, value, expires_at) VALUES (?, ?, ?)',
+                ('|'.join(key), json.dumps(value), expires_at)
+            )
+            self._conn.commit()
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute('DELETE FROM results WHERE key = ?', ('|'.join(key),))
+            self._conn.commit()
+
+
+class ResultCache:
+    """
+    LRU cache with a TTL in front of an optional disk tier.
+
+    Entries past their TTL stay servable as stale for another grace seconds,
+    so callers of lookup() can answer at once and refresh in the background.
+    """
+
+    def __init__(self, ttl=600, max_entries=1024, disk=None, grace=0):
+        self.ttl = ttl
+        self.grace = grace
+        self.max_entries = max_entries
+        self.disk = disk
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """Return the fresh cached value for a key, or None on a miss."""
+        return self._lookup(key, allow_stale=False)[0]
+
+    def lookup(self, key):
+        """
+        Return (value, stale) for a key; value is None on a miss.
+
+        stale is True for a value past its TTL but still within the grace
+        window, which the caller should serve and refresh.
+        """
+        return self._lookup(key, allow_stale=True)
+
+    def _lookup(self, key, allow_stale):
+        now = time.time()
+        # Oldest expiry that may still be served
+        cutoff = now - self.grace if allow_stale else now
+        stale = None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value, False
+                if expires_at > cutoff:
+                    self._entries.move_to_end(key)
+                    stale = value
+                elif expires_at + self.grace <= now:
+                    del self._entries[key]
+                    self.expirations += 1
+
+        # Another process (e.g. the prewarmer) may have written a fresher value to disk
+        if self.disk is not None:
+            entry = self.disk.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > cutoff:
+                    with self._lock:
+                        self._store(key, value, expires_at)
+                        self.disk_hits += 1
+                    return value, expires_at <= now
+                if expires_at + self.grace <= now:
+                    self.disk.delete(key)
+
+        with self._lock:
+            if stale is not None:
+                self.stale_hits += 1
+                return stale, True
+            self.misses += 1
+        return None, False
+
+    def set(self, key, value):
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._store(key, value, expires_at)
+        if self.disk is not None:
+            self.disk.set(key, value, expires_at)
+
+    def _store(self, key, value, expires_at):
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return hit/miss/eviction counters for monitoring."""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'grace': self.grace,
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'disk': self.disk.path if self.disk is not None else None
+            }
+
+
+def cache_from_env():
+    """Build a ResultCache configured through RESULT_CACHE_* variables."""
+    path = os.getenv('RESULT_CACHE_PATH')
+    return ResultCache(
+        ttl=int(os.getenv('RESULT_CACHE_TTL', '600')),
+        max_entries=int(os.getenv('RESULT_CACHE_MAX_ENTRIES', '1024')),
+        disk=SQLiteCache(path) if path else None,
+        grace=int(os.getenv('RESULT_CACHE_GRACE', '0'))
+    )
@@ -0,0 +1,117 @@
+from datetime import date, timedelta
+
+from .client import get_client
+from .days import ContributionDays, parse_ordinal
+from .errors import NotFound, graphql_error
+from .tracing import TRACER
+
+
+def build_calendar_query(count):
+    """
+    Build a query with one aliased contributionsCollection per date range.
+
+    Days are consecutive, so only each week's first date is selected and a
+    day is just its count, which cuts the response by about a third.
+    """
+    params = ', '.join(f'$from{i}: DateTime!, $to{i}: DateTime!' for i in range(count))
+    fields = '\n'.join(f'''
+            y{i}: contributionsCollection(from: $from{i}, to: $to{i}) {{
+                contributionCalendar {{
+                    weeks {{
+                        firstDay
+                        contributionDays {{
+                            contributionCount
+                        }}
+                    }}
+                }}
+            }}''' for i in range(count))
+    return f'''
+    query($username: String!, {params}) {{
+        user(login: $username) {{{fields}
+        }}
+        rateLimit {{
+            cost
+            remaining
+        }}
+    }}
+    '''
+
+
+def yearly_ranges(end_date, years):
+    """Split the lookback window into (start, end) ranges of one year each."""
+    ranges = []
+    for year in range(years):
+        year_end = end_date - timedelta(days=365 * year)
+        ranges.append((year_end - timedelta(days=365), year_end))
+    return ranges
+
+
+def sync_ranges(start_date, end_date):
+    """Split [start_date, end_date] into ranges GitHub accepts (at most a year each)."""
+    ranges = []
+    while end_date - start_date > timedelta(days=365):
+        ranges.append((end_date - timedelta(days=365), end_date))
+        end_date -= timedelta(days=366)
+    ranges.append((start_date, end_date))
+    return ranges
+
+
+def calendar_variables(username, ranges):
+    """Variables for build_calendar_query over the (start, end) ranges."""
+    if not username:
+        raise ValueError("Username must be provided")
+
+    variables = {'username': username}
+    for i, (start_date, end_date) in enumerate(ranges):
+        variables[f'from{i}'] = start_date.strftime('%Y-%m-%dT00:00:00Z')
+        variables[f'to{i}'] = end_date.strftime('%Y-%m-%dT23:59:59Z')
+    return variables
+
+
+def parse_calendars(username, response, data, count):
+    """Check a calendar response and return its contributionCalendar objects in range order."""
+    if response.status_code != 200:
+        raise Exception(f"GitHub API Error: {response.status_code}")
+
+    if 'errors' in data:
+        raise graphql_error(data['errors'], f"GitHub API Error: {data['errors'][0]['message']}")
+
+    user = data.get('data', {}).get('user')
+    if not user:
+        raise NotFound(f"User '{username}' not found")
+
+    return [user[f'y{i}']['contributionCalendar'] for i in range(count)]
+
+
+def fetch_calendars(username, ranges, client=None, headers=None, timeout=None):
+    """Fetch the calendars for every (start, end) range in a single round trip."""
+    client = client or get_client()
+    response, data = client.execute(build_calendar_query(len(ranges)), calendar_variables(username, ranges),
+                                    headers=headers, timeout=timeout, name='calendar')
+    with TRACER.span('parse'):
+        return parse_calendars(username, response, data, len(ranges))
+
+
+def calendar_days(calendars):
+    """Flatten calendars into (date, contributionCount) pairs."""
+    for first_date, counts in calendar_runs(calendars):
+        first = parse_ordinal(first_date)
+        for offset, count in enumerate(counts):
+            yield date.fromordinal(first + offset).isoformat(), count
+
+
+def calendar_runs(calendars):
+    """Yield (first date, [contributionCount, ...]) for each calendar's consecutive days."""
+    for contributions in calendars:
+        weeks = contributions['weeks']
+        if weeks:
+            yield weeks[0]['firstDay'], [day['contributionCount'] for week in weeks
+                                         for day in week['contributionDays']]
+
+
+def calendar_window(calendars, start, end):
+    """Load calendars into a ContributionDays from start to end; later calendars win on overlap."""
+    days = ContributionDays(start, end)
+    for first_date, counts in calendar_runs(calendars):
+        days.set_run(first_date, counts)
+    return days
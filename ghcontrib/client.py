@@ -0,0 +1,249 @@
+import functools
+import logging
+import os
+import re
+import threading
+import time
+
+from .ratelimit import SCHEDULER
+from .tracing import TRACER
+
+logger = logging.getLogger(__name__)
+
+GRAPHQL_URL = os.getenv('GITHUB_GRAPHQL_URL', 'https://api.github.com/graphql')
+
+
+@functools.lru_cache(maxsize=None)
+def load_httpx():
+    """
+    Return (httpx module or None, whether it can speak HTTP/2).
+
+    The transports are imported on first use rather than with the package,
+    which keeps them off the cold-start path of pages that never reach GitHub.
+    """
+    try:
+        import httpx
+    except ImportError:
+        return None, False
+    try:
+        import h2  # noqa: F401  (httpx only speaks HTTP/2 when h2 is installed)
+        return httpx, True
+    except ImportError:
+        return httpx, False
+
+
+@functools.lru_cache(maxsize=None)
+def timeout_errors():
+    """
+    Exceptions raised by either transport when a request times out.
+
+    Call it in the except clause (`except timeout_errors():`); the clause is
+    only evaluated once an exception is raised, by which time the transport
+    has been imported anyway.
+    """
+    import requests
+    httpx, _ = load_httpx()
+    return (requests.Timeout,) + ((httpx.TimeoutException,) if httpx else ())
+
+
+@functools.lru_cache(maxsize=None)
+def transport_errors():
+    """Exceptions raised by either transport when a request gets no response: timeouts and connection failures."""
+    import requests
+    httpx, _ = load_httpx()
+    return (requests.ConnectionError, requests.Timeout) + ((httpx.TransportError,) if httpx else ())
+
+OPERATION_NAME = re.compile(r'^\s*query\s+(\w+)')
+
+
+def query_name(query):
+    """Name a query for traces: its operation name, or 'anonymous'."""
+    match = OPERATION_NAME.match(query)
+    return match.group(1) if match else 'anonymous'
+
+
+def graphql_span(query, variables, name):
+    """Open the span for one GraphQL request; variable values are left out, only their names."""
+    return TRACER.span('graphql', **{
+        'graphql.query': name or query_name(query),
+        'graphql.variables': ','.join(sorted(variables or {})),
+        'graphql.request_bytes': len(query)
+    })
+
+
+def finish_graphql_span(span, response):
+    span.set('http.status_code', response.status_code)
+    span.set('graphql.response_bytes', len(response.content))
+
+
+class GitHubClient:
+    """
+    GitHub GraphQL client with a keep-alive connection pool.
+
+    Uses httpx over HTTP/2 when httpx and h2 are installed and falls back to
+    a pooled requests.Session otherwise. Every request goes through the
+    shared rate limit scheduler and its latency is recorded.
+    """
+
+    def __init__(self, token=None, pool_size=16, http2=True, timeout=30, url=GRAPHQL_URL, scheduler=SCHEDULER):
+        self.url = url
+        self.timeout = timeout
+        self.scheduler = scheduler
+        self.headers = {
+            'Content-Type': 'application/json',
+            'Accept-Encoding': 'gzip'
+        }
+        if token:
+            self.headers['Authorization'] = f'Bearer {token}'
+
+        self._http = self._make_transport(pool_size, http2)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def _make_transport(self, pool_size, http2):
+        httpx, http2_available = load_httpx()
+        if http2 and http2_available:
+            self.transport = 'httpx/h2'
+            return httpx.Client(
+                http2=True,
+                limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+            )
+
+        import requests
+        self.transport = 'requests'
+        session = requests.Session()
+        # Retries are handled by the scheduler, not the transport
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def execute(self, query, variables=None, headers=None, timeout=None, name=None):
+        """
+        POST a GraphQL query and return (response, payload).
+
+        payload is the decoded JSON body for a 200 response and None otherwise.
+        name labels the request in traces and metrics.
+        """
+        request_headers = dict(self.headers, **(headers or {}))
+        start_time = time.perf_counter()
+        with graphql_span(query, variables, name) as span:
+            response, payload = self.scheduler.execute(
+                self._http.post,
+                self.url,
+                json={'query': query, 'variables': variables or {}},
+                headers=request_headers,
+                timeout=timeout if timeout is not None else self.timeout
+            )
+            finish_graphql_span(span, response)
+        self._record_timing(time.perf_counter() - start_time, response)
+        return response, payload
+
+    def warm(self):
+        """Open a pooled connection to the GraphQL host ahead of the first query; costs no points."""
+        try:
+            self._http.head(self.url, timeout=self.timeout)
+        except Exception as e:
+            logger.debug(f"Could not warm the GitHub connection: {e}")
+
+    def _record_timing(self, elapsed, response):
+        with self._lock:
+            self.requests += 1
+            self.total_seconds += elapsed
+            self.max_seconds = max(self.max_seconds, elapsed)
+        logger.debug(f"GraphQL request took {elapsed * 1000:.1f} ms ({response.status_code})")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'transport': self.transport,
+                'requests': self.requests,
+                'total_seconds': round(self.total_seconds, 3),
+                'mean_ms': round(self.total_seconds / self.requests * 1000, 1) if self.requests else None,
+                'max_ms': round(self.max_seconds * 1000, 1)
+            }
+
+
+class AsyncGitHubClient(GitHubClient):
+    """GitHubClient for asyncio code, backed by httpx.AsyncClient."""
+
+    def _make_transport(self, pool_size, http2):
+        httpx, http2_available = load_httpx()
+        if httpx is None:
+            raise ImportError("The async GitHub client needs httpx: pip install 'httpx[http2]'")
+        self.transport = 'httpx-async/h2' if http2 and http2_available else 'httpx-async'
+        return httpx.AsyncClient(
+            http2=http2 and http2_available,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        )
+
+    async def execute(self, query, variables=None, headers=None, timeout=None, name=None):
+        """Async execute(); many requests can be awaited concurrently on one event loop."""
+        request_headers = dict(self.headers, **(headers or {}))
+        start_time = time.perf_counter()
+        with graphql_span(query, variables, name) as span:
+            response, payload = await self.scheduler.execute_async(
+                self._http.post,
+                self.url,
+                json={'query': query, 'variables': variables or {}},
+                headers=request_headers,
+                timeout=timeout if timeout is not None else self.timeout
+            )
+            finish_graphql_span(span, response)
+        self._record_timing(time.perf_counter() - start_time, response)
+        return response, payload
+
+    async def aclose(self):
+        await self._http.aclose()
+
+
+_client = None
+_async_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the process-wide client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = GitHubClient(
+                    token=os.getenv('GITHUB_TOKEN'),
+                    pool_size=int(os.getenv('GITHUB_POOL_SIZE', '16')),
+                    http2=os.getenv('GITHUB_HTTP2', '1') != '0',
+                    timeout=float(os.getenv('GITHUB_TIMEOUT', '30'))
+                )
+    return _client
+
+
+def warm_client():
+    """Create the shared client and connect it in the background, off the first request's path."""
+    thread = threading.Thread(target=lambda: get_client().warm(), name='warm-client', daemon=True)
+    thread.start()
+    return thread
+
+
+def get_async_client():
+    """Return the process-wide async client, creating it on first use."""
+    global _async_client
+    if _async_client is None:
+        with _client_lock:
+            if _async_client is None:
+                _async_client = AsyncGitHubClient(
+                    token=os.getenv('GITHUB_TOKEN'),
+                    pool_size=int(os.getenv('GITHUB_ASYNC_POOL_SIZE', '100')),
+                    http2=os.getenv('GITHUB_HTTP2', '1') != '0',
+                    timeout=float(os.getenv('GITHUB_TIMEOUT', '30'))
+                )
+    return _async_client
+
+
+async def close_async_client():
+    """Close the async client's connections, e.g. on ASGI shutdown."""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
@@ -0,0 +1,189 @@
+from array import array
+from datetime import date
+from functools import lru_cache
+
+
+@lru_cache(maxsize=1024)
+def _month_ordinal(year, month):
+    return date(year, month, 1).toordinal()
+
+
+def parse_ordinal(iso):
+    """Return the day ordinal of an ISO 'YYYY-MM-DD...' string without strptime."""
+    return _month_ordinal(int(iso[0:4]), int(iso[5:7])) + int(iso[8:10]) - 1
+
+
+class ContributionDays:
+    """
+    Contribution counts per day, stored as a day-ordinal bitmap plus a count array.
+
+    Index i covers the day start_ordinal + i. The window grows as days
+    outside it are added, and month rollups work on array slices rather
+    than per-day date objects.
+    """
+
+    def __init__(self, start=None, end=None):
+        self.start_ordinal = start.toordinal() if start else None
+        length = end.toordinal() - self.start_ordinal + 1 if start and end else 0
+        self.counts = array('I', [0]) * length
+        self.bits = bytearray((length + 7) // 8)
+
+    def __len__(self):
+        return len(self.counts)
+
+    def __contains__(self, iso):
+        index = self._index(parse_ordinal(iso))
+        return 0 <= index < len(self.counts) and self.counts[index] > 0
+
+    def _index(self, ordinal):
+        return ordinal - self.start_ordinal if self.start_ordinal is not None else -1
+
+    def _ensure(self, ordinal):
+        """Grow the window so it covers ordinal and return its index."""
+        if self.start_ordinal is None:
+            self.start_ordinal = ordinal
+        index = ordinal - self.start_ordinal
+        if index < 0:
+            self.counts = array('I', [0]) * -index + self.counts
+            shifted = int.from_bytes(self.bits, 'little') << -index
+            self.bits = bytearray(shifted.to_bytes((len(self.counts) + 7) // 8, 'little'))
+            self.start_ordinal = ordinal
+            index = 0
+        elif index >= len(self.counts):
+            self.counts.extend(array('I', [0]) * (index + 1 - len(self.counts)))
+            self.bits.extend(bytes((len(self.counts) + 7) // 8 - len(self.bits)))
+        return index
+
+    def add(self, iso, count=1):
+        """Add count contributions on the day of an ISO date or timestamp."""
+        self.add_ordinal(parse_ordinal(iso), count)
+
+    def add_ordinal(self, ordinal, count=1):
+        index = self._ensure(ordinal)
+        self.counts[index] += count
+        if self.counts[index]:
+            self.bits[index >> 3] |= 1 << (index & 7)
+
+    def set(self, iso, count):
+        """Overwrite the count for a day, e.g. when calendars overlap."""
+        index = self._ensure(parse_ordinal(iso))
+        self.counts[index] = count
+        if count:
+            self.bits[index >> 3] |= 1 << (index & 7)
+        else:
+            self.bits[index >> 3] &= ~(1 << (index & 7)) & 0xFF
+
+    def set_run(self, iso, counts):
+        """Overwrite consecutive days starting at an ISO date, e.g. one contribution calendar."""
+        if not counts:
+            return
+        start = parse_ordinal(iso)
+        self._ensure(start + len(counts) - 1)
+        index = self._ensure(start)
+        self.counts[index:index + len(counts)] = array('I', counts)
+        run = int(''.join('1' if count else '0' for count in reversed(counts)), 2)
+        mask = ((1 << len(counts)) - 1) << index
+        merged = (int.from_bytes(self.bits, 'little') & ~mask) | (run << index)
+        self.bits = bytearray(merged.to_bytes(len(self.bits), 'little'))
+
+    def update(self, other):
+        """Merge another ContributionDays into this one, summing counts."""
+        if other.start_ordinal is None or not len(other):
+            return
+        self._ensure(other.start_ordinal + len(other) - 1)
+        offset = self._ensure(other.start_ordinal)
+        for index, count in enumerate(other.counts):
+            if count:
+                self.counts[offset + index] += count
+        merged = int.from_bytes(self.bits, 'little') | (int.from_bytes(other.bits, 'little') << offset)
+        self.bits = bytearray(merged.to_bytes(len(self.bits), 'little'))
+
+    def total_days(self):
+        """Number of days with at least one contribution."""
+        return bin(int.from_bytes(self.bits, 'little')).count('1')
+
+    def total_contributions(self):
+        return sum(self.counts)
+
+    def meets(self, threshold):
+        return self.total_days() >= threshold
+
+    def slice(self, start, end):
+        """Return a copy restricted to the days between start and end inclusive."""
+        window = ContributionDays(start, end)
+        if self.start_ordinal is None:
+            return window
+        lo = max(start.toordinal(), self.start_ordinal)
+        hi = min(end.toordinal(), self.start_ordinal + len(self.counts) - 1)
+        if lo > hi:
+            return window
+        source = lo - self.start_ordinal
+        target = lo - window.start_ordinal
+        width = hi - lo + 1
+        window.counts[target:target + width] = self.counts[source:source + width]
+        bits = (int.from_bytes(self.bits, 'little') >> source) & ((1 << width) - 1)
+        window.bits = bytearray((bits << target).to_bytes(len(window.bits), 'little'))
+        return window
+
+    def _months(self):
+        """Yield ('YYYY-MM', lo, hi) index ranges for each month in the window."""
+        if self.start_ordinal is None or not len(self.counts):
+            return
+        day = date.fromordinal(self.start_ordinal)
+        year, month = day.year, day.month
+        end = self.start_ordinal + len(self.counts)
+        lo = 0
+        while self.start_ordinal + lo < end:
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+            hi = min(_month_ordinal(year, month), end) - self.start_ordinal
+            yield f"{day.year:04d}-{day.month:02d}", lo, hi
+            day = date(year, month, 1)
+            lo = hi
+
+    def monthly_days(self):
+        """Unique contribution days per 'YYYY-MM', for months that have any."""
+        result = {}
+        for month, lo, hi in self._months():
+            days = (hi - lo) - self.counts[lo:hi].count(0)
+            if days:
+                result[month] = days
+        return result
+
+    def monthly_counts(self):
+        """Total contributions per 'YYYY-MM', for months that have any."""
+        result = {}
+        for month, lo, hi in self._months():
+            total = sum(self.counts[lo:hi])
+            if total:
+                result[month] = total
+        return result
+
+    def iter_dates(self):
+        """Yield the ISO dates that have contributions, oldest first."""
+        if self.start_ordinal is None:
+            return
+        for index, count in enumerate(self.counts):
+            if count:
+                yield date.fromordinal(self.start_ordinal + index).isoformat()
+
+
+def contribution_dataset(username, days):
+    """Summarize an analysis as JSON-ready totals plus monthly and daily series."""
+    return {
+        'username': username,
+        'from': date.fromordinal(days.start_ordinal).isoformat(),
+        'to': date.fromordinal(days.start_ordinal + len(days) - 1).isoformat(),
+        'total_days': days.total_days(),
+        'total_contributions': days.total_contributions(),
+        # Months come out of the day array in order
+        'monthly': days.monthly_counts(),
+        # Contribution count of each day from 'from' through 'to'
+        'daily': days.counts.tolist()
+    }
+
+
+def dataset_days(data):
+    """Rebuild the ContributionDays of a contribution_dataset from its daily series."""
+    days = ContributionDays(date.fromisoformat(data['from']), date.fromisoformat(data['to']))
+    days.set_run(data['from'], data['daily'])
+    return days
@@ -0,0 +1,28 @@
+"""Typed failures of an analysis, so entry points can answer with the right HTTP status."""
+
+
+class AnalysisError(Exception):
+    """An analysis that could not produce a dataset; status is the HTTP status it maps onto."""
+    status = 502
+
+
+class NotFound(AnalysisError):
+    """The user or organization does not exist, or no login was given."""
+    status = 404
+
+
+class MissingToken(AnalysisError):
+    """No GitHub token is configured."""
+    status = 500
+
+
+class AnalysisTimeout(AnalysisError):
+    """GitHub did not answer in time."""
+    status = 504
+
+
+def graphql_error(errors, message):
+    """The exception for a GraphQL errors list: NotFound when GitHub could not resolve a login."""
+    if any(error.get('type') == 'NOT_FOUND' for error in errors):
+        return NotFound(message)
+    return Exception(message)
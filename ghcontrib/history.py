@@ -0,0 +1,210 @@
+import contextvars
+import logging
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .client import get_client
+from .days import ContributionDays, parse_ordinal
+from .errors import NotFound
+from .tracing import TRACER
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of repositories whose history is paged at the same time
+CRAWL_CONCURRENCY = int(os.getenv('CRAWL_CONCURRENCY', '8'))
+
+# The user's 100 most recently updated repositories, whose histories are crawled
+REPOSITORIES_QUERY = '''
+query($username: String!) {
+    user(login: $username) {
+        repositories(first: 100, orderBy: {field: UPDATED_AT, direction: DESC}) {
+            nodes {
+                name
+                owner {
+                    login
+                }
+            }
+        }
+    }
+    rateLimit {
+        cost
+        remaining
+    }
+}
+'''
+
+# {message} is replaced by the message field only when commit messages are kept for debugging
+HISTORY_QUERY_TEMPLATE = '''
+query($owner: String!, $name: String!, $cursor: String, $since: GitTimestamp) {
+    repository(owner: $owner, name: $name) {
+        defaultBranchRef {
+            target {
+                ... on Commit {
+                    history(first: 100, after: $cursor, since: $since) {
+                        pageInfo {
+                            endCursor
+                            hasNextPage
+                        }
+                        nodes {
+                            committedDate
+                            author {
+                                user {
+                                    login
+                                }
+                            }{message}
+                        }
+                    }
+                }
+            }
+        }
+    }
+    rateLimit {
+        cost
+        remaining
+    }
+}
+'''
+
+HISTORY_QUERY = HISTORY_QUERY_TEMPLATE.replace('{message}', '')
+HISTORY_QUERY_WITH_MESSAGES = HISTORY_QUERY_TEMPLATE.replace('{message}', '''
+                            message''')
+
+
+def fetch_repositories(username, client=None):
+    """Return the repository nodes ('name', 'owner' {'login'}) whose histories count for username."""
+    client = client or get_client()
+    response, data = client.execute(REPOSITORIES_QUERY, {'username': username}, name='repositories')
+
+    if response.status_code != 200:
+        raise Exception(f"Error: {response.status_code}")
+
+    user = (data.get('data') or {}).get('user')
+    if not user:
+        raise NotFound(f"User '{username}' not found")
+    return user['repositories']['nodes']
+
+
+class RepoCursor:
+    """Pagination state and commit days for one repository's default-branch history."""
+
+    def __init__(self, owner, name, log_size=0):
+        self.owner = owner
+        self.name = name
+        self.cursor = None
+        self.has_next_page = True
+        self.pages = 0
+        self.days = ContributionDays()
+        # Opt-in ring buffer of (date, message) for debugging
+        self.log = deque(maxlen=log_size) if log_size else None
+
+    @property
+    def full_name(self):
+        return f"{self.owner}/{self.name}"
+
+
+def iter_history_pages(client, state, since):
+    """
+    Yield each page of a repository's history, advancing its cursor as it goes.
+
+    A failed page raises, so an analysis is never built (or cached) from a
+    partial crawl. A repository that no longer resolves is skipped, and one
+    without a default branch has no history.
+    """
+    while state.has_next_page:
+        variables = {
+            'owner': state.owner,
+            'name': state.name,
+            'cursor': state.cursor,
+            'since': since
+        }
+
+        # Messages are only worth their bytes when the debug log keeps them
+        query = HISTORY_QUERY_WITH_MESSAGES if state.log is not None else HISTORY_QUERY
+        response, result = client.execute(query, variables, name='history')
+
+        if response.status_code != 200:
+            raise Exception(f"Error fetching commits for {state.full_name}: {response.status_code}")
+
+        errors = result.get('errors') or []
+        if any(error.get('type') != 'NOT_FOUND' for error in errors):
+            raise Exception(f"Error fetching commits for {state.full_name}: {errors}")
+        repository = (result.get('data') or {}).get('repository')
+        if repository is None:
+            logger.warning(f"Skipping {state.full_name}: repository not found")
+            return
+        if repository['defaultBranchRef'] is None:
+            return
+
+        try:
+            commit_history = repository['defaultBranchRef']['target']['history']
+            page_info = commit_history['pageInfo']
+        except (KeyError, TypeError) as e:
+            raise Exception(f"Error processing commits for {state.full_name}: {e}")
+
+        state.has_next_page = page_info['hasNextPage']
+        state.cursor = page_info['endCursor']
+        state.pages += 1
+        yield commit_history
+
+
+def iter_commits(pages):
+    """Yield every commit node from a stream of history pages."""
+    for page in pages:
+        yield from page['nodes']
+
+
+def commit_author(commit):
+    """Lowercased login of the commit's GitHub author, or None; GitHub logins are case-insensitive."""
+    user = commit['author']['user']
+    return user['login'].lower() if user else None
+
+
+def iter_commit_events(commits, username, repo):
+    """Yield (date, repo, commit) for each commit authored by username."""
+    login = username.lower()
+    for commit in commits:
+        if commit_author(commit) == login:
+            yield commit['committedDate'].split('T')[0], repo, commit
+
+
+def crawl_repository(client, state, username, since):
+    """Stream one repository's history into its set of commit days."""
+    with TRACER.span('crawl', repository=state.full_name) as span:
+        pages = iter_history_pages(client, state, since)
+        for date, repo, commit in iter_commit_events(iter_commits(pages), username, state.full_name):
+            state.days.add_ordinal(parse_ordinal(date))
+            if state.log is not None:
+                state.log.append((date, commit['message']))
+        span.set('pages', state.pages)
+
+    return state
+
+
+def crawl_repositories(repos, username, since, concurrency=CRAWL_CONCURRENCY, client=None, log_size=0):
+    """
+    Crawl the history of many repositories concurrently.
+
+    :param repos: Repository nodes with 'name' and 'owner' {'login'}
+    :param concurrency: Maximum number of repositories crawled at once
+    :param log_size: Commits kept per repository for debugging (0 disables)
+    :return: Generator of RepoCursor, one per repository, in the same order as repos
+    """
+    states = [RepoCursor(repo['owner']['login'], repo['name'], log_size) for repo in repos]
+    yield from crawl_concurrently(states, crawl_repository, username, since, concurrency=concurrency, client=client)
+
+
+def crawl_concurrently(states, crawl, *args, concurrency=CRAWL_CONCURRENCY, client=None):
+    """Run crawl(client, state, *args) for every state on a thread pool, yielding the states in order."""
+    client = client or get_client()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        # Each task runs in a copy of the caller's context so query usage is still tracked
+        futures = [pool.submit(contextvars.copy_context().run, crawl, client, state, *args) for state in states]
+        try:
+            # Yielded in submission order, so merging stays deterministic
+            for future in futures:
+                yield future.result()
+        finally:
+            # After a failure (or an abandoned crawl) the repositories not started yet are dropped
+            for future in futures:
+                future.cancel()
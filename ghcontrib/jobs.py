@@ -0,0 +1,155 @@
+import contextvars
+import functools
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Job:
+    """One background analysis and the latest progress it reported."""
+
+    def __init__(self, kind, username, key=None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.username = username
+        self.key = key
+        self.status = 'queued'
+        self.progress = {}
+        # Monthly data counted so far, so pages can draw before the job finishes
+        self.partial = None
+        self.result = None
+        self.error = None
+        self.version = 0
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+
+    @property
+    def finished(self):
+        return self.status in ('done', 'failed')
+
+    def snapshot(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'username': self.username,
+            'status': self.status,
+            'progress': dict(self.progress),
+            'partial': self.partial,
+            'result': self.result,
+            'error': self.error,
+            'version': self.version,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at
+        }
+
+
+class JobQueue:
+    """
+    Runs long analyses in the background and lets clients follow them.
+
+    Jobs run on executor, any concurrent.futures-style object with
+    submit(fn, *args); the default is a local thread pool. The job function
+    is called as fn(progress, *args, **kwargs) and reports with
+    progress(partial=None, **counters). Its return value becomes the result.
+    """
+
+    def __init__(self, executor=None, max_workers=4, history=256):
+        self.executor = executor or ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self.history = history
+        self._jobs = OrderedDict()
+        self._active = {}
+        self._changed = threading.Condition()
+
+    def submit(self, kind, username, fn, *args, key=None, **kwargs):
+        """Queue a job, or return the unfinished job already running for key."""
+        with self._changed:
+            if key is not None and key in self._active:
+                return self._active[key]
+            job = Job(kind, username, key)
+            self._jobs[job.id] = job
+            if key is not None:
+                self._active[key] = job
+            self._trim()
+
+        self.executor.submit(contextvars.copy_context().run, self._run, job, fn, args, kwargs)
+        return job
+
+    def complete(self, kind, username, result):
+        """Record a job whose result is already known, e.g. from a cache, without running anything."""
+        with self._changed:
+            job = Job(kind, username)
+            job.status, job.result = 'done', result
+            self._jobs[job.id] = job
+            self._trim()
+        return job
+
+    def _run(self, job, fn, args, kwargs):
+        self._update(job, status='running')
+        try:
+            result = fn(functools.partial(self.report, job), *args, **kwargs)
+        except Exception as e:
+            self._update(job, status='failed', error=str(e))
+        else:
+            self._update(job, status='done', result=result)
+
+    def report(self, job, partial=None, **progress):
+        """Record progress counters and, optionally, partial monthly data."""
+        with self._changed:
+            job.progress.update(progress)
+            if partial is not None:
+                job.partial = partial
+            self._touch(job)
+
+    def _update(self, job, **fields):
+        with self._changed:
+            for name, value in fields.items():
+                setattr(job, name, value)
+            if job.finished and self._active.get(job.key) is job:
+                del self._active[job.key]
+            self._touch(job)
+
+    def _touch(self, job):
+        job.version += 1
+        job.updated_at = time.time()
+        self._changed.notify_all()
+
+    def _trim(self):
+        """Forget the oldest finished jobs beyond the history limit."""
+        for job_id in list(self._jobs):
+            if len(self._jobs) <= self.history:
+                break
+            if self._jobs[job_id].finished:
+                del self._jobs[job_id]
+
+    def get(self, job_id):
+        """Return a snapshot of a job, or None if it is unknown or was forgotten."""
+        with self._changed:
+            job = self._jobs.get(job_id)
+            return job.snapshot() if job is not None else None
+
+    def wait(self, job_id, version, timeout=15):
+        """Block until the job moves past version (or timeout) and return its snapshot."""
+        with self._changed:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            self._changed.wait_for(lambda: job.version > version or job.finished, timeout)
+            return job.snapshot()
+
+    def stats(self):
+        with self._changed:
+            statuses = {}
+            for job in self._jobs.values():
+                statuses[job.status] = statuses.get(job.status, 0) + 1
+            return {'jobs': len(self._jobs), 'active': len(self._active), 'statuses': statuses}
+
+
+def jobs_from_env():
+    """Build a JobQueue on a local thread pool sized by JOB_WORKERS."""
+    return JobQueue(
+        max_workers=int(os.getenv('JOB_WORKERS', '4')),
+        history=int(os.getenv('JOB_HISTORY', '256'))
+    )
@@ -0,0 +1,301 @@
+import json
+import logging
+import os
+import re
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .client import get_client
+from .days import ContributionDays, parse_ordinal
+from .history import CRAWL_CONCURRENCY, fetch_repositories
+from .tracing import TRACER
+
+logger = logging.getLogger(__name__)
+
+# Directory of bare mirrors laid out as <owner>/<name>.git
+MIRROR_DIR = os.getenv('MIRROR_DIR', '')
+
+# Where mirrors are cloned from; {owner} and {name} are filled in
+MIRROR_REMOTE = os.getenv('MIRROR_REMOTE', 'https://github.com/{owner}/{name}.git')
+
+# Threads streaming `git log`, one repository at a time each; git itself runs in its own process
+MIRROR_WORKERS = int(os.getenv('MIRROR_WORKERS', str(os.cpu_count() or 1)))
+
+# Commit author emails GitHub hides behind, e.g. 1234+octocat@users.noreply.github.com
+NOREPLY_EMAIL = re.compile(r'^(?:\d+\+)?([A-Za-z0-9-]+)@users\.noreply\.github\.com$', re.IGNORECASE)
+
+# Email -> login map kept next to the mirrors; null marks an email without a GitHub account
+AUTHORS_FILE = 'authors.json'
+
+# Commits looked up per GraphQL request when resolving author emails
+RESOLVE_BATCH = 50
+
+
+def mirror_path(root, owner, name):
+    return os.path.join(root, owner, f'{name}.git')
+
+
+def sync_mirror(root, owner, name, remote=MIRROR_REMOTE):
+    """
+    Create or update the bare mirror of one repository and return its path.
+
+    Only the default branch is cloned, treeless (--filter=tree:0): counting
+    commits only reads commit objects, so pull request refs, other branches,
+    trees and file contents are never downloaded. Later syncs fetch the
+    remote's HEAD into that branch, which only transfers its new commits.
+    """
+    path = mirror_path(root, owner, name)
+    with TRACER.span('sync', repository=f'{owner}/{name}'):
+        if os.path.isdir(path):
+            branch = subprocess.run(['git', '-C', path, 'symbolic-ref', '--short', 'HEAD'],
+                                    capture_output=True, text=True).stdout.strip()
+            action, command = 'fetch', ['git', '-C', path, 'fetch', '--quiet', 'origin',
+                                        f'+HEAD:refs/heads/{branch}']
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            action, command = 'clone', ['git', 'clone', '--bare', '--single-branch', '--filter=tree:0', '--quiet',
+                                        remote.format(owner=owner, name=name), path]
+        result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise Exception(f"git {action} failed for {owner}/{name}: {result.stderr.strip()}")
+    return path
+
+
+def list_mirrors(root):
+    """(owner, name) of every mirror under root, for offline runs."""
+    mirrors = []
+    if not root or not os.path.isdir(root):
+        return mirrors
+    for owner in sorted(os.listdir(root)):
+        if not os.path.isdir(os.path.join(root, owner)):
+            continue
+        for entry in sorted(os.listdir(os.path.join(root, owner))):
+            if entry.endswith('.git'):
+                mirrors.append((owner, entry[:-len('.git')]))
+    return mirrors
+
+
+def scan_mirror(path, since=None):
+    """
+    Stream the default-branch log of a mirror and group its commit days by author email.
+
+    Runs on a worker thread. Dates are committer dates in UTC, matching
+    the committedDate the GraphQL history crawl counts. since is applied
+    here rather than with `git log --since`, which stops walking at the
+    first older commit and so misses newer commits behind it.
+
+    :param since: UTC timestamp like '2022-01-07T00:00:00Z'
+    :return: {lowercased email: (a commit sha by that email, [(day ordinal, commits)])}
+    """
+    command = ['git', '-C', path, 'log', 'HEAD', '--date=format-local:%Y-%m-%dT%H:%M:%SZ',
+               '--format=%cd%x09%ae%x09%H']
+    authors = {}
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+                               env=dict(os.environ, TZ='UTC'))
+    # Parsed line by line, so a large history is never held in memory as text
+    for line in process.stdout:
+        committed, email, sha = line.rstrip('\n').split('\t')
+        if since and committed < since:
+            continue
+        email = email.lower()
+        entry = authors.get(email)
+        if entry is None:
+            entry = authors[email] = (sha, {})
+        ordinal = parse_ordinal(committed)
+        entry[1][ordinal] = entry[1].get(ordinal, 0) + 1
+    # A corrupt or unreadable mirror must not pass for one without commits
+    if process.wait() != 0:
+        raise Exception(f"git log failed in {path}: {process.stderr.read().strip()}")
+    return {email: (sha, sorted(days.items())) for email, (sha, days) in authors.items()}
+
+
+class AuthorMap:
+    """
+    Maps commit author emails to GitHub logins.
+
+    GitHub noreply addresses carry the login. Other emails are looked up
+    once, through GraphQL, on a commit they authored, and the answer is
+    saved to authors.json so later runs (and offline ones) reuse it.
+    Entries can also be added to that file by hand.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.logins = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.logins = {email.lower(): login for email, login in json.load(f).items()}
+
+    def login(self, email):
+        if email in self.logins:
+            return self.logins[email]
+        match = NOREPLY_EMAIL.match(email)
+        return match.group(1) if match else None
+
+    def known(self, email):
+        """Whether login(email) is final, as opposed to not looked up yet."""
+        return email in self.logins or NOREPLY_EMAIL.match(email) is not None
+
+    def resolve(self, samples, client=None):
+        """
+        Look up the GitHub account behind each email from one commit it authored.
+
+        :param samples: {email: (owner, name, sha)}
+        """
+        client = client or get_client()
+        by_repository = {}
+        for email, (owner, name, sha) in samples.items():
+            by_repository.setdefault((owner, name), []).append((email, sha))
+
+        for (owner, name), commits in by_repository.items():
+            for start in range(0, len(commits), RESOLVE_BATCH):
+                batch = commits[start:start + RESOLVE_BATCH]
+                response, data = client.execute(build_author_query(len(batch)),
+                                                author_variables(owner, name, batch), name='commit_authors')
+                repository = ((data or {}).get('data') or {}).get('repository') if response.status_code == 200 else None
+                if repository is None:
+                    logger.warning(f"Could not resolve commit authors in {owner}/{name}")
+                    continue
+                with self._lock:
+                    for i, (email, _) in enumerate(batch):
+                        user = ((repository.get(f'c{i}') or {}).get('author') or {}).get('user')
+                        self.logins[email] = user['login'] if user else None
+        self.save()
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            with open(self.path, 'w') as f:
+                json.dump(self.logins, f, indent=2, sort_keys=True)
+
+
+def build_author_query(count):
+    params = ', '.join(f'$oid{i}: GitObjectID!' for i in range(count))
+    fields = '\n'.join(f'''
+        c{i}: object(oid: $oid{i}) {{
+            ... on Commit {{
+                author {{
+                    user {{
+                        login
+                    }}
+                }}
+            }}
+        }}''' for i in range(count))
+    return f'''
+    query($owner: String!, $name: String!, {params}) {{
+        repository(owner: $owner, name: $name) {{{fields}
+        }}
+        rateLimit {{
+            cost
+            remaining
+        }}
+    }}
+    '''
+
+
+def author_variables(owner, name, commits):
+    variables = {'owner': owner, 'name': name}
+    for i, (_, sha) in enumerate(commits):
+        variables[f'oid{i}'] = sha
+    return variables
+
+
+def mirror_commit_days(username, repos, since, root=MIRROR_DIR, sync=True, resolve=True, workers=MIRROR_WORKERS,
+                       client=None, progress=None):
+    """
+    Count username's commit days from local mirrors instead of the GraphQL history crawl.
+
+    :param repos: (owner, name) pairs, e.g. from fetch_repositories or list_mirrors
+    :param sync: Clone missing mirrors and `git fetch` existing ones first (needs the network)
+    :param resolve: Look up unknown author emails through GraphQL; offline runs rely on
+                    noreply addresses and authors.json
+    :param progress: Optional callable(ContributionDays so far, repositories done)
+    :return: ContributionDays of the commits credited to username
+    """
+    if not root:
+        raise ValueError("MIRROR_DIR must be set to use local mirrors")
+
+    if sync:
+        with ThreadPoolExecutor(max_workers=max(1, CRAWL_CONCURRENCY)) as pool:
+            futures = [pool.submit(sync_mirror, root, owner, name) for owner, name in repos]
+        for (owner, name), future in zip(repos, futures):
+            try:
+                future.result()
+            except Exception as e:
+                logger.warning(str(e))
+    repos = [(owner, name) for owner, name in repos if os.path.isdir(mirror_path(root, owner, name))]
+
+    authors = AuthorMap(os.path.join(root, AUTHORS_FILE))
+    username = username.lower()
+    days = ContributionDays()
+
+    def credit(email, counts):
+        login = authors.login(email)
+        if login is not None and login.lower() == username:
+            for ordinal, commits in counts:
+                days.add_ordinal(ordinal, commits)
+
+    # Commits by emails that still have to be looked up: (email, owner, name, sha, counts)
+    pending = []
+    # git does the heavy lifting in its own processes, so threads are enough, and
+    # unlike a process pool they are safe to start from a job's worker thread
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool, TRACER.span('scan', repositories=len(repos)):
+        futures = [pool.submit(scan_mirror, mirror_path(root, owner, name), since) for owner, name in repos]
+        for done, ((owner, name), future) in enumerate(zip(repos, futures), 1):
+            try:
+                by_email = future.result()
+            except Exception as e:
+                logger.warning(str(e))
+                by_email = {}
+            for email, (sha, counts) in by_email.items():
+                if authors.known(email):
+                    credit(email, counts)
+                else:
+                    pending.append((email, owner, name, sha, counts))
+            if progress is not None:
+                progress(days, done)
+
+    if pending and resolve:
+        samples = {}
+        for email, owner, name, sha, _ in pending:
+            samples.setdefault(email, (owner, name, sha))
+        authors.resolve(samples, client)
+        for email, _, _, _, counts in pending:
+            credit(email, counts)
+    return days
+
+
+class MirrorStrategy:
+    """
+    ContributionAnalyzer strategy counting default-branch history from local mirrors.
+
+    Only the repository list costs a GraphQL request, and an offline
+    strategy counts whatever is already mirrored without any.
+    """
+
+    name = 'mirror'
+    precision = 'history'
+
+    def __init__(self, root=MIRROR_DIR, offline=False):
+        self.root = root
+        self.offline = offline
+
+    def estimate(self, username, years):
+        return 0 if self.offline else 1
+
+    def analyze(self, client, username, start, end, progress=None):
+        if self.offline:
+            repos = list_mirrors(self.root)
+        else:
+            repos = [(repo['owner']['login'], repo['name']) for repo in fetch_repositories(username, client)]
+        TRACER.annotate(repositories=len(repos), backend='mirror')
+
+        report = None
+        if progress is not None:
+            report = lambda days, done: progress(days, repos_done=done, repos_total=len(repos))
+        days = mirror_commit_days(username, repos, start.strftime('%Y-%m-%dT%H:%M:%SZ'), root=self.root,
+                                  sync=not self.offline, resolve=not self.offline, client=client, progress=report)
+        return days, {'repositories': len(repos)}
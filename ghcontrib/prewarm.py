@@ -0,0 +1,178 @@
+import atexit
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from .ratelimit import SCHEDULER
+
+logger = logging.getLogger(__name__)
+
+
+class WatchState:
+    """
+    When each watched user was last refreshed and how often they are requested.
+
+    Lives in SQLite so the prewarmer and the web workers share it. Request
+    counts are buffered in memory and written at most every flush_interval
+    seconds, and only for users already on the watch-list. A timer and an
+    exit hook write what is left once requests stop coming.
+    """
+
+    def __init__(self, path, flush_interval=5):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._flushed_at = time.time()
+        self._timer = None
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS watch (
+                username TEXT PRIMARY KEY,
+                refreshed_at REAL NOT NULL DEFAULT 0,
+                requests INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        self._conn.commit()
+        atexit.register(self.flush)
+
+    def watch(self, usernames):
+        with self._lock:
+            self._conn.executemany('INSERT OR IGNORE INTO watch (username) VALUES (?)',
+                                   [(username.lower(),) for username in usernames])
+            self._conn.commit()
+
+    def record_request(self, username):
+        """Count a user-facing request; cheap enough to call on every request."""
+        with self._lock:
+            username = username.lower()
+            self._pending[username] = self._pending.get(username, 0) + 1
+            if time.time() - self._flushed_at >= self.flush_interval:
+                self._flush()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """Write the buffered request counts now."""
+        with self._lock:
+            self._timer = None
+            if self._pending:
+                self._flush()
+
+    def _flush(self):
+        self._conn.executemany('UPDATE watch SET requests = requests + ? WHERE username = ?',
+                               [(count, username) for username, count in self._pending.items()])
+        self._conn.commit()
+        self._pending.clear()
+        self._flushed_at = time.time()
+
+    def mark_refreshed(self, usernames, when=None):
+        with self._lock:
+            self._conn.executemany('UPDATE watch SET refreshed_at = ? WHERE username = ?',
+                                   [(when or time.time(), username.lower()) for username in usernames])
+            self._conn.commit()
+
+    def rows(self, usernames):
+        """Return {username: (refreshed_at, requests)} for the given watched users."""
+        wanted = {username.lower() for username in usernames}
+        with self._lock:
+            if self._pending:
+                self._flush()
+            rows = self._conn.execute('SELECT username, refreshed_at, requests FROM watch').fetchall()
+        return {username: (refreshed_at, requests) for username, refreshed_at, requests in rows
+                if username in wanted}
+
+
+class Prewarmer:
+    """
+    Keeps a watch-list of users fresh within a GraphQL point budget.
+
+    Each pass refreshes the users whose data is older than min_age, most
+    urgent first: urgency grows with the age of the data and with how often
+    the user is requested. A pass stops before it would spend more than its
+    share of points_per_hour, or when the shared budget falls to
+    min_remaining, so user-facing requests keep their headroom.
+    """
+
+    def __init__(self, refresh, state, points_per_hour=1000, min_remaining=1000, min_age=1800,
+                 interval=300, batch_size=1, scheduler=SCHEDULER):
+        # refresh(usernames) recomputes and stores the given users
+        self.refresh = refresh
+        self.state = state
+        self.points_per_hour = points_per_hour
+        self.min_remaining = min_remaining
+        self.min_age = min_age
+        self.interval = interval
+        self.batch_size = batch_size
+        self.scheduler = scheduler
+        self.refreshed = 0
+        self.failed = 0
+        self.cost = 0
+
+    def due(self, usernames, now=None):
+        """Watched users whose data is older than min_age, most urgent first."""
+        now = now or time.time()
+        rows = self.state.rows(usernames)
+        due = []
+        for username in dict.fromkeys(username.lower() for username in usernames):
+            refreshed_at, requests = rows.get(username, (0, 0))
+            age = now - refreshed_at
+            if age >= self.min_age:
+                due.append((age * (1 + requests), username))
+        due.sort(reverse=True)
+        return [username for _, username in due]
+
+    def run_once(self, usernames):
+        """Run one pass over the watch-list and return how many users were refreshed."""
+        self.state.watch(usernames)
+        budget = self.points_per_hour * self.interval / 3600
+        due = self.due(usernames)
+        spent = refreshed = batches = 0
+
+        with self.scheduler.track('prewarm') as usage:
+            for start in range(0, len(due), self.batch_size):
+                batch = due[start:start + self.batch_size]
+                # Stop before the next batch is likely to overrun this pass's share
+                if batches and spent + spent / batches > budget:
+                    break
+                remaining = self.scheduler.remaining
+                if remaining is not None and remaining <= self.min_remaining:
+                    logger.info(f"Prewarm paused, {remaining} points left in the shared budget")
+                    break
+
+                before = usage.cost
+                batches += 1
+                try:
+                    self.refresh(batch)
+                except Exception as e:
+                    self.failed += len(batch)
+                    logger.warning(f"Prewarm of {', '.join(batch)} failed: {e}")
+                else:
+                    self.state.mark_refreshed(batch)
+                    refreshed += len(batch)
+                spent += usage.cost - before
+
+        self.refreshed += refreshed
+        self.cost += spent
+        logger.info(f"Prewarm pass refreshed {refreshed} of {len(due)} due users for {spent} points")
+        return refreshed
+
+    def run_forever(self, load_usernames):
+        """Run a pass every interval seconds, re-reading the watch-list each time."""
+        while True:
+            started = time.time()
+            self.run_once(load_usernames())
+            time.sleep(max(0, self.interval - (time.time() - started)))
+
+    def stats(self):
+        return {'refreshed': self.refreshed, 'failed': self.failed, 'cost': self.cost}
+
+
+def watch_state_from_env():
+    """Build the WatchState from WATCH_STATE_PATH, or None when unset."""
+    path = os.getenv('WATCH_STATE_PATH')
+    return WatchState(path) if path else None
@@ -0,0 +1,301 @@
+import contextvars
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from .responses import json_loads
+from .tokens import TokenPool, tokens_from_env
+from .tracing import TRACER
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = (500, 502, 503, 504)
+
+_current_usage = contextvars.ContextVar('current_usage', default=None)
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a request is shed because the point budget is exhausted."""
+
+
+class QueryUsage:
+    """Requests, retries and GraphQL points spent by one analysis, also counted toward its parent."""
+
+    def __init__(self, label=None, parent=None):
+        self.label = label
+        self.parent = parent
+        self.requests = 0
+        self.retries = 0
+        self.cost = 0
+        self._lock = threading.Lock()
+
+    def add(self, requests=0, retries=0, cost=0):
+        with self._lock:
+            self.requests += requests
+            self.retries += retries
+            self.cost += cost
+        if self.parent is not None:
+            self.parent.add(requests, retries, cost)
+
+    def as_dict(self):
+        return {'requests': self.requests, 'retries': self.retries, 'cost': self.cost}
+
+
+class RateLimitScheduler:
+    """
+    Shared gate in front of every GitHub GraphQL request.
+
+    Tracks the remaining point budget of each token from X-RateLimit-*
+    headers and the rateLimit field, and sends each request with the token
+    that has the most headroom. It waits for a reset (or sheds the
+    request) once every token is down to the reserve, and retries 5xx and
+    secondary rate limit responses with jittered exponential backoff. A
+    token that is rejected or rate limited is set aside and the retry goes
+    out at once on another token.
+    """
+
+    def __init__(self, reserve=50, max_wait=30, max_retries=4, base_delay=1.0, max_delay=30.0, tokens=(),
+                 quarantine=300):
+        self.reserve = reserve
+        self.max_wait = max_wait
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.tokens = TokenPool(tokens, quarantine)
+        self.requests = 0
+        self.retries = 0
+        self.shed = 0
+        self.cost = 0
+        self._lock = threading.Lock()
+
+    @property
+    def remaining(self):
+        return self.tokens.remaining
+
+    @property
+    def limit(self):
+        return self.tokens.limit
+
+    @property
+    def reset_at(self):
+        return self.tokens.reset_at
+
+    def execute(self, post, url, **kwargs):
+        """
+        Send a GraphQL POST through the scheduler.
+
+        :param post: Callable performing the request (requests.post or Session.post)
+        :return: (response, payload) where payload is the decoded JSON body of a 200 response
+        """
+        usage = _current_usage.get()
+        attempt = 0
+        while True:
+            budget, wait = self._reserve()
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                response = post(url, **self._authorize(budget, kwargs))
+            finally:
+                self.tokens.release(budget)
+
+            delay = self._record(response, attempt, budget, usage)
+            if delay is None:
+                return response, self._payload(response, budget, usage)
+            attempt += 1
+            time.sleep(delay)
+
+    async def execute_async(self, post, url, **kwargs):
+        """Async variant of execute() for coroutine transports such as httpx.AsyncClient.post."""
+        # Imported here so the sync entry points do not pay for asyncio at startup
+        import asyncio
+        usage = _current_usage.get()
+        attempt = 0
+        while True:
+            budget, wait = self._reserve()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            try:
+                response = await post(url, **self._authorize(budget, kwargs))
+            finally:
+                self.tokens.release(budget)
+
+            delay = self._record(response, attempt, budget, usage)
+            if delay is None:
+                return response, self._payload(response, budget, usage)
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def _authorize(self, budget, kwargs):
+        """Request arguments with the chosen token's Authorization header."""
+        if budget.token is None:
+            return kwargs
+        return dict(kwargs, headers=dict(kwargs.get('headers') or {}, Authorization=f'Bearer {budget.token}'))
+
+    def _reserve(self):
+        """
+        Pick a token and return (budget, seconds to wait for its reset).
+
+        The request is shed instead when even the best token resets too far away.
+        """
+        budget = self.tokens.acquire()
+        if budget.remaining is None or budget.remaining > self.reserve or budget.reset_at is None:
+            return budget, 0
+        wait = budget.reset_at - time.time()
+        if wait <= 0:
+            # The budget has refilled; the next response reports the new one
+            self.tokens.forget_reset(budget)
+            return budget, 0
+        if wait > self.max_wait:
+            self.tokens.release(budget)
+            with self._lock:
+                self.shed += 1
+            raise RateLimitExceeded(
+                f"GitHub rate limit budget exhausted, resets in {int(wait)} seconds"
+            )
+
+        logger.warning(f"GitHub rate limit budget low, waiting {wait:.1f} seconds for reset")
+        return budget, wait
+
+    def _record(self, response, attempt, budget, usage):
+        """Account for one response and return the delay before a retry, or None if it is final."""
+        self._observe_headers(budget, response.headers)
+        with self._lock:
+            self.requests += 1
+        if usage is not None:
+            usage.add(requests=1)
+
+        delay = self._retry_delay(response, attempt, budget)
+        if delay is None or attempt >= self.max_retries:
+            return None
+
+        with self._lock:
+            self.retries += 1
+        if usage is not None:
+            usage.add(retries=1)
+        span = TRACER.current()
+        if span is not None:
+            span.add('graphql.retries')
+        logger.warning(f"GitHub API returned {response.status_code}, retrying in {delay:.1f} seconds")
+        return delay
+
+    def _payload(self, response, budget, usage):
+        if response.status_code != 200:
+            return None
+
+        with TRACER.span('decode'):
+            payload = json_loads(response.content)
+        # Queries select rateLimit { cost remaining } so each one reports its cost
+        rate_limit = (payload.get('data') or {}).get('rateLimit')
+        if rate_limit:
+            span = TRACER.current()
+            if span is not None:
+                span.set('graphql.cost', rate_limit['cost'])
+            self.tokens.spend(budget, rate_limit['cost'], rate_limit['remaining'])
+            with self._lock:
+                self.cost += rate_limit['cost']
+            if usage is not None:
+                usage.add(cost=rate_limit['cost'])
+        return payload
+
+    def _observe_headers(self, budget, headers):
+        try:
+            remaining = headers.get('X-RateLimit-Remaining')
+            limit = headers.get('X-RateLimit-Limit')
+            reset = headers.get('X-RateLimit-Reset')
+            self.tokens.observe(
+                budget,
+                remaining=int(remaining) if remaining is not None else None,
+                limit=int(limit) if limit is not None else None,
+                reset_at=float(reset) if reset is not None else None
+            )
+        except ValueError:
+            pass
+
+    def _set_aside(self, budget, response, seconds=None):
+        """Quarantine a token; return True if another token can take the retry."""
+        if len(self.tokens) == 1:
+            return False
+        self.tokens.quarantine(budget, seconds)
+        logger.warning(f"GitHub token {budget.name} set aside after a {response.status_code} response")
+        return self.tokens.available() > 0
+
+    def _retry_delay(self, response, attempt, budget):
+        """Return seconds to wait before retrying, or None if the response is final."""
+        status = response.status_code
+        if status in RETRY_STATUSES:
+            return self._backoff(attempt)
+
+        if status == 401:
+            # A revoked or mistyped token; the others may still work
+            return 0 if self._set_aside(budget, response) else None
+
+        if status in (403, 429):
+            retry_after = response.headers.get('Retry-After')
+            if retry_after is not None:
+                try:
+                    delay = min(float(retry_after), self.max_delay)
+                except ValueError:
+                    delay = self._backoff(attempt)
+                return 0 if self._set_aside(budget, response, delay) else delay
+            if 'secondary rate limit' in response.text.lower():
+                delay = self._backoff(attempt)
+                return 0 if self._set_aside(budget, response, delay) else delay
+            if response.headers.get('X-RateLimit-Remaining') == '0':
+                if self.tokens.spare(budget, self.reserve):
+                    # Routing already prefers the token with the most headroom
+                    return 0
+                wait = (budget.reset_at or time.time()) - time.time()
+                if wait > self.max_wait:
+                    with self._lock:
+                        self.shed += 1
+                    raise RateLimitExceeded(
+                        f"GitHub rate limit budget exhausted, resets in {int(wait)} seconds"
+                    )
+                return max(wait, 0)
+            # Forbidden for this token only, e.g. SSO not authorized
+            return 0 if self._set_aside(budget, response) else None
+
+        return None
+
+    def _backoff(self, attempt):
+        """Full-jitter exponential backoff."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    @contextmanager
+    def track(self, label=None):
+        """Collect the requests and points spent inside the block into a QueryUsage."""
+        # Nested blocks (e.g. one analysis inside a prewarm pass) also count toward the outer one
+        usage = QueryUsage(label, parent=_current_usage.get())
+        token = _current_usage.set(usage)
+        try:
+            yield usage
+        finally:
+            _current_usage.reset(token)
+            logger.info(
+                f"Analysis {label or ''} used {usage.requests} requests "
+                f"({usage.retries} retries), cost {usage.cost} points"
+            )
+
+    def stats(self):
+        with self._lock:
+            totals = {'requests': self.requests, 'retries': self.retries, 'shed': self.shed, 'cost': self.cost}
+        return dict(totals, limit=self.limit, remaining=self.remaining, reset_at=self.reset_at,
+                    tokens=self.tokens.stats())
+
+
+def scheduler_from_env():
+    """Build a RateLimitScheduler configured through RATE_LIMIT_* variables and the token pool."""
+    return RateLimitScheduler(
+        reserve=int(os.getenv('RATE_LIMIT_RESERVE', '50')),
+        max_wait=float(os.getenv('RATE_LIMIT_MAX_WAIT', '30')),
+        max_retries=int(os.getenv('RATE_LIMIT_MAX_RETRIES', '4')),
+        tokens=tokens_from_env(),
+        quarantine=float(os.getenv('TOKEN_QUARANTINE', '300'))
+    )
+
+
+# Process-wide scheduler shared by every entry point
+SCHEDULER = scheduler_from_env()
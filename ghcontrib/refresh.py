@@ -0,0 +1,72 @@
+import contextvars
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundRefresher:
+    """
+    Recomputes stale cache entries off the request path.
+
+    At most one refresh per key runs at a time, and a key is not refreshed
+    again within min_interval seconds of the last attempt, so a failing
+    user cannot turn every stale hit into a GitHub request.
+    """
+
+    def __init__(self, max_workers=2, min_interval=60):
+        self.min_interval = min_interval
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='refresh')
+        self._lock = threading.Lock()
+        self._running = set()
+        self._last_started = {}
+        self.scheduled = 0
+        self.skipped = 0
+        self.failed = 0
+
+    def refresh(self, key, fn, *args):
+        """Run fn(*args) in the background unless key is already being, or was just, refreshed."""
+        now = time.time()
+        with self._lock:
+            if key in self._running or now - self._last_started.get(key, 0) < self.min_interval:
+                self.skipped += 1
+                return False
+            self._running.add(key)
+            # Entries past min_interval no longer hold anything back
+            self._last_started = {other: started for other, started in self._last_started.items()
+                                  if now - started < self.min_interval}
+            self._last_started[key] = now
+            self.scheduled += 1
+        self._pool.submit(contextvars.copy_context().run, self._run, key, fn, args)
+        return True
+
+    def _run(self, key, fn, args):
+        try:
+            fn(*args)
+        except Exception as e:
+            with self._lock:
+                self.failed += 1
+            logger.warning(f"Background refresh of {key[0]} failed: {e}")
+        finally:
+            with self._lock:
+                self._running.discard(key)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'scheduled': self.scheduled,
+                'skipped': self.skipped,
+                'failed': self.failed,
+                'running': len(self._running)
+            }
+
+
+def refresher_from_env():
+    """Build a BackgroundRefresher configured through REFRESH_* variables."""
+    return BackgroundRefresher(
+        max_workers=int(os.getenv('REFRESH_WORKERS', '2')),
+        min_interval=float(os.getenv('REFRESH_MIN_INTERVAL', '60'))
+    )
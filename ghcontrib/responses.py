@@ -0,0 +1,78 @@
+import gzip
+import hashlib
+import json
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Bodies smaller than this are sent uncompressed
+COMPRESS_MIN_BYTES = 512
+
+
+def json_body(data):
+    """Serialize data as compact JSON with a stable key order, so equal data gives equal bytes."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_SORT_KEYS)
+    return json.dumps(data, separators=(',', ':'), sort_keys=True).encode('utf-8')
+
+
+def json_loads(body):
+    """Decode a JSON body (bytes or str), with orjson when it is installed."""
+    return orjson.loads(body) if orjson is not None else json.loads(body)
+
+
+def strong_etag(body):
+    return '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+
+
+def encoded_etag(etag, encoding):
+    """Strong ETags name one representation, so compressed bodies get their own tag."""
+    return etag if encoding is None else f'{etag[:-1]}-{encoding}"'
+
+
+def choose_encoding(accept_encoding, size):
+    """Pick 'br', 'gzip' or None for an Accept-Encoding header."""
+    if size < COMPRESS_MIN_BYTES or not accept_encoding:
+        return None
+    accepted = set()
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        if params.replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        accepted.add(name.strip().lower())
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted or '*' in accepted:
+        return 'gzip'
+    return None
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body)
+    if encoding == 'gzip':
+        # mtime=0 keeps the gzip bytes identical for identical bodies
+        return gzip.compress(body, mtime=0)
+    return body
+
+
+def etag_matches(if_none_match, etag):
+    """
+    Whether an If-None-Match header names any representation of etag.
+
+    If-None-Match uses weak comparison (RFC 7232, section 3.2), so a tag a
+    CDN weakened to W/"..." after compressing the body still matches.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    variants = {encoded_etag(etag, encoding) for encoding in (None, 'gzip', 'br')}
+    return any(tag.strip().removeprefix('W/') in variants for tag in if_none_match.split(','))
@@ -0,0 +1,173 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class SingleFlight:
+    """
+    Collapse concurrent analyses of the same key into one execution.
+
+    Callers that arrive while a key is in flight wait for the leader's
+    result instead of querying GitHub again. With a lock directory, workers
+    in other processes also serialize on a lock file, and a worker that
+    waited for the lock reuses the result file the holder wrote meanwhile.
+    """
+
+    def __init__(self, lock_dir=None, lock_timeout=60):
+        self.lock_dir = lock_dir if fcntl is not None else None
+        self.lock_timeout = lock_timeout
+        self._calls = {}
+        self._tasks = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+        self.shared = 0
+        if self.lock_dir:
+            os.makedirs(self.lock_dir, exist_ok=True)
+
+    def do(self, key, fn, *args, **kwargs):
+        """Return fn(*args, **kwargs), sharing one call among concurrent callers of key."""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+
+        try:
+            result = self._run(key, fn, args, kwargs)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    async def do_async(self, key, fn, *args, **kwargs):
+        """Coroutine variant of do() for async fn; callers share one task per key."""
+        # Only the ASGI server awaits analyses; the WSGI apps never import asyncio
+        import asyncio
+        with self._lock:
+            task = self._tasks.get(key)
+            if task is None:
+                task = self._tasks[key] = asyncio.ensure_future(self._run_async(key, fn, args, kwargs))
+                task.add_done_callback(lambda _: self._tasks.pop(key, None))
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+        # A cancelled caller must not cancel the analysis other callers wait on
+        return await asyncio.shield(task)
+
+    def _run(self, key, fn, args, kwargs):
+        if not self.lock_dir:
+            return fn(*args, **kwargs)
+
+        path, started = self._path(key), time.time()
+        lock_file = self._acquire(path)
+        try:
+            result = self._shared_result(path, started)
+            if result is None:
+                result = fn(*args, **kwargs)
+                self._publish(path, result)
+            return result
+        finally:
+            self._release(lock_file)
+
+    async def _run_async(self, key, fn, args, kwargs):
+        import asyncio
+        if not self.lock_dir:
+            return await fn(*args, **kwargs)
+
+        path, started = self._path(key), time.time()
+        # File locks and result files are blocking I/O, kept off the event loop
+        lock_file = await asyncio.to_thread(self._acquire, path)
+        try:
+            result = await asyncio.to_thread(self._shared_result, path, started)
+            if result is None:
+                result = await fn(*args, **kwargs)
+                await asyncio.to_thread(self._publish, path, result)
+            return result
+        finally:
+            await asyncio.to_thread(self._release, lock_file)
+
+    def _path(self, key):
+        name = hashlib.sha1('|'.join(map(str, key)).encode('utf-8')).hexdigest()
+        return os.path.join(self.lock_dir, name)
+
+    def _acquire(self, path):
+        """Take the cross-worker lock, giving up after lock_timeout so a stuck worker cannot block us."""
+        lock_file = open(path + '.lock', 'w')
+        deadline = time.time() + self.lock_timeout
+        while True:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return lock_file
+            except BlockingIOError:
+                if time.time() >= deadline:
+                    lock_file.close()
+                    return None
+                time.sleep(0.05)
+
+    def _release(self, lock_file):
+        if lock_file is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+
+    def _shared_result(self, path, started):
+        """Return the result another worker finished while we waited for the lock, if any."""
+        try:
+            if os.path.getmtime(path + '.json') < started:
+                return None
+            with open(path + '.json') as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            return None
+        with self._lock:
+            self.shared += 1
+        return result
+
+    def _publish(self, path, result):
+        try:
+            data = json.dumps(result)
+        except TypeError:
+            return
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            f.write(data)
+        os.replace(tmp, path + '.json')
+
+    def stats(self):
+        """Return how many calls ran versus how many reused an in-flight or cross-worker result."""
+        with self._lock:
+            calls = self.leaders + self.coalesced
+            return {
+                'calls': calls,
+                'leaders': self.leaders,
+                'coalesced': self.coalesced,
+                'shared_across_workers': self.shared,
+                'coalesce_rate': round((self.coalesced + self.shared) / calls, 4) if calls else 0.0,
+                'in_flight': len(self._calls) + len(self._tasks),
+                'lock_dir': self.lock_dir
+            }
+
+
+def single_flight_from_env():
+    """Build a SingleFlight; SINGLE_FLIGHT_LOCK_DIR enables coalescing across workers."""
+    return SingleFlight(
+        lock_dir=os.getenv('SINGLE_FLIGHT_LOCK_DIR') or None,
+        lock_timeout=float(os.getenv('SINGLE_FLIGHT_LOCK_TIMEOUT', '60'))
+    )
@@ -0,0 +1,55 @@
+import logging
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class StartupReport:
+    """
+    Where a cold start spends its time before the first response.
+
+    The entry point marks the end of each import-time phase and reports
+    every finished request; the first one closes the report.
+    """
+
+    def __init__(self, started):
+        self.started = started
+        self.phases = {}
+        self.ready_at = None
+        self.first_response_at = None
+        self._last = started
+        self._lock = threading.Lock()
+
+    def mark(self, phase):
+        """End the current phase, which started where the previous one ended."""
+        now = time.perf_counter()
+        self.phases[phase] = now - self._last
+        self._last = now
+
+    def ready(self):
+        """Import finished; log the phases."""
+        self.ready_at = time.perf_counter()
+        phases = ', '.join(f'{phase} {seconds * 1000:.0f} ms' for phase, seconds in self.phases.items())
+        logger.info(f"Started in {(self.ready_at - self.started) * 1000:.0f} ms ({phases})")
+
+    def responded(self):
+        if self.first_response_at is not None:
+            return
+        with self._lock:
+            if self.first_response_at is not None:
+                return
+            self.first_response_at = time.perf_counter()
+        logger.info(f"First response {(self.first_response_at - self.started) * 1000:.0f} ms after start")
+
+    def as_dict(self):
+        def since_start(at):
+            return round((at - self.started) * 1000, 1) if at is not None else None
+
+        return {
+            'phases_ms': {phase: round(seconds * 1000, 1) for phase, seconds in self.phases.items()},
+            'ready_ms': since_start(self.ready_at),
+            'first_response_ms': since_start(self.first_response_at),
+            'modules_loaded': len(sys.modules)
+        }
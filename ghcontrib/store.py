@@ -0,0 +1,82 @@
+import os
+import sqlite3
+import threading
+from datetime import date
+
+
+class ContributionStore:
+    """Persistent username -> date -> contributionCount store with a sync watermark."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS days (
+                username TEXT NOT NULL,
+                date TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (username, date)
+            );
+            CREATE TABLE IF NOT EXISTS sync (
+                username TEXT PRIMARY KEY,
+                covered_from TEXT NOT NULL,
+                synced_through TEXT NOT NULL
+            );
+        ''')
+        self._conn.commit()
+
+    def sync_state(self, username):
+        """Return (covered_from, synced_through) dates, or None if never synced."""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT covered_from, synced_through FROM sync WHERE username = ?',
+                (username.lower(),)
+            ).fetchone()
+        if row is None:
+            return None
+        return date.fromisoformat(row[0]), date.fromisoformat(row[1])
+
+    def merge(self, username, days, start, end):
+        """
+        Merge fetched days into the store and advance the watermark.
+
+        :param username: GitHub username the days belong to
+        :param days: Iterable of ('YYYY-MM-DD', contributionCount) pairs
+        :param start: First date covered by the fetch
+        :param end: Last date covered by the fetch
+        """
+        username = username.lower()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT covered_from, synced_through FROM sync WHERE username = ?', (username,)
+            ).fetchone()
+            covered_from = start.isoformat()
+            synced_through = end.isoformat()
+            if row is not None:
+                covered_from = min(covered_from, row[0])
+                synced_through = max(synced_through, row[1])
+
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO days (username, date, count) VALUES (?, ?, ?)',
+                ((username, day, count) for day, count in days)
+            )
+            self._conn.execute(
+                'INSERT OR REPLACE INTO sync (username, covered_from, synced_through) VALUES (?, ?, ?)',
+                (username, covered_from, synced_through)
+            )
+            self._conn.commit()
+
+    def days(self, username, start, end):
+        """Return (date, count) pairs between start and end inclusive, oldest first."""
+        with self._lock:
+            return self._conn.execute(
+                'SELECT date, count FROM days WHERE username = ? AND date BETWEEN ? AND ? ORDER BY date',
+                (username.lower(), start.isoformat(), end.isoformat())
+            ).fetchall()
+
+
+def store_from_env():
+    """Build the store from CONTRIBUTION_STORE_PATH, or None when unset."""
+    path = os.getenv('CONTRIBUTION_STORE_PATH')
+    return ContributionStore(path) if path else None
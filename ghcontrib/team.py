@@ -0,0 +1,187 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from .client import get_client
+from .days import ContributionDays, parse_ordinal
+from .errors import NotFound
+from .history import (CRAWL_CONCURRENCY, RepoCursor, commit_author, crawl_concurrently, fetch_repositories,
+                      iter_commits, iter_history_pages)
+from .tracing import TRACER
+
+# One page of an organization's members
+ORGANIZATION_MEMBERS_QUERY = '''
+query($org: String!, $cursor: String) {
+    organization(login: $org) {
+        membersWithRole(first: 100, after: $cursor) {
+            pageInfo {
+                endCursor
+                hasNextPage
+            }
+            nodes {
+                login
+            }
+        }
+    }
+    rateLimit {
+        cost
+        remaining
+    }
+}
+'''
+
+# The organization's own 100 most recently updated repositories
+ORGANIZATION_REPOSITORIES_QUERY = '''
+query($org: String!) {
+    organization(login: $org) {
+        repositories(first: 100, orderBy: {field: UPDATED_AT, direction: DESC}) {
+            nodes {
+                name
+                owner {
+                    login
+                }
+            }
+        }
+    }
+    rateLimit {
+        cost
+        remaining
+    }
+}
+'''
+
+
+def fetch_organization(org, client=None):
+    """Return (member logins, repository nodes) of an organization."""
+    client = client or get_client()
+    members, cursor = [], None
+    while True:
+        response, data = client.execute(ORGANIZATION_MEMBERS_QUERY, {'org': org, 'cursor': cursor},
+                                        name='organization_members')
+        if response.status_code != 200:
+            raise Exception(f"Error: {response.status_code}")
+        organization = (data.get('data') or {}).get('organization')
+        if not organization:
+            raise NotFound(f"Organization '{org}' not found")
+        page = organization['membersWithRole']
+        members.extend(node['login'] for node in page['nodes'])
+        if not page['pageInfo']['hasNextPage']:
+            break
+        cursor = page['pageInfo']['endCursor']
+
+    response, data = client.execute(ORGANIZATION_REPOSITORIES_QUERY, {'org': org}, name='organization_repositories')
+    if response.status_code != 200:
+        raise Exception(f"Error: {response.status_code}")
+    organization = (data.get('data') or {}).get('organization')
+    if not organization:
+        raise NotFound(f"Organization '{org}' not found")
+    return members, organization['repositories']['nodes']
+
+
+def fetch_member_repositories(members, concurrency=CRAWL_CONCURRENCY, client=None):
+    """
+    Fetch every member's repository list concurrently.
+
+    :return: ({login: repository nodes}, {login: error message}) for members that could not be listed
+    """
+    client = client or get_client()
+    repositories, errors = {}, {}
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = {login: pool.submit(contextvars.copy_context().run, fetch_repositories, login, client)
+                   for login in members}
+        for login, future in futures.items():
+            try:
+                repositories[login] = future.result()
+            except Exception as e:
+                errors[login] = str(e)
+    return repositories, errors
+
+
+def union_repositories(repository_lists):
+    """Merge repository node lists, keeping the first occurrence of each owner/name."""
+    seen, union = set(), []
+    for repos in repository_lists:
+        for repo in repos:
+            key = (repo['owner']['login'].lower(), repo['name'].lower())
+            if key not in seen:
+                seen.add(key)
+                union.append(repo)
+    return union
+
+
+class TeamRepoCursor(RepoCursor):
+    """RepoCursor whose commit days are kept per member instead of for one user."""
+
+    def __init__(self, owner, name):
+        super().__init__(owner, name)
+        self.member_days = {}
+
+
+def crawl_team_repository(client, state, members, since):
+    """
+    Stream one repository's history once, crediting each commit to the member who authored it.
+
+    :param members: {lowercased login: login as given}
+    """
+    with TRACER.span('crawl', repository=state.full_name) as span:
+        for commit in iter_commits(iter_history_pages(client, state, since)):
+            login = members.get(commit_author(commit))
+            if login is None:
+                continue
+            days = state.member_days.get(login)
+            if days is None:
+                days = state.member_days[login] = ContributionDays()
+            days.add_ordinal(parse_ordinal(commit['committedDate']))
+        span.set('pages', state.pages)
+
+    return state
+
+
+def analyze_team(since, usernames=None, org=None, concurrency=CRAWL_CONCURRENCY, client=None, progress=None):
+    """
+    Count the commit days of every member of a team, crawling each repository once.
+
+    The team is a list of usernames or an organization's members; the
+    repositories crawled are the union of the members' repository lists
+    (plus the organization's own). Because every repository is read for the
+    whole team, a member is also credited with commits to teammates'
+    repositories, which a single-user crawl never visits.
+
+    :param progress: Optional callable(partial=monthly days of the whole team, **counters)
+    :return: Per-member and whole-team total days and monthly series, plus crawl counters
+    """
+    client = client or get_client()
+    repository_lists = []
+    if org:
+        usernames, org_repos = fetch_organization(org, client)
+        repository_lists.append(org_repos)
+    if not usernames:
+        raise ValueError("A team needs usernames or an organization")
+    members = {login.lower(): login for login in usernames}
+
+    member_repos, errors = fetch_member_repositories(members.values(), concurrency, client)
+    repository_lists.extend(member_repos.values())
+    repos = union_repositories(repository_lists)
+    TRACER.annotate(members=len(members), repositories=len(repos))
+
+    member_days = {login: ContributionDays() for login in members.values()}
+    team_days = ContributionDays()
+    pages = 0
+    states = [TeamRepoCursor(repo['owner']['login'], repo['name']) for repo in repos]
+    for done, state in enumerate(crawl_concurrently(states, crawl_team_repository, members, since,
+                                                    concurrency=concurrency, client=client), 1):
+        for login, days in state.member_days.items():
+            member_days[login].update(days)
+            team_days.update(days)
+        pages += state.pages
+        if progress is not None:
+            progress(partial=team_days.monthly_days(), repos_done=done, repos_total=len(repos),
+                     pages=pages, days=team_days.total_days())
+
+    return {
+        'members': {login: {'total_days': days.total_days(), 'monthly_data': days.monthly_days()}
+                    for login, days in member_days.items() if login not in errors},
+        'team': {'total_days': team_days.total_days(), 'monthly_data': team_days.monthly_days()},
+        'repositories': len(repos),
+        'pages': pages,
+        'errors': errors
+    }
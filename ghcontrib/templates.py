@@ -0,0 +1,48 @@
+import hashlib
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Checksums of the sources a compiled template directory was built from
+MANIFEST = 'manifest.json'
+
+
+def template_checksums(source_dir):
+    checksums = {}
+    for name in sorted(os.listdir(source_dir)):
+        path = os.path.join(source_dir, name)
+        if os.path.isfile(path):
+            with open(path, 'rb') as f:
+                checksums[name] = hashlib.sha1(f.read()).hexdigest()
+    return checksums
+
+
+def compile_templates(env, source_dir, target_dir):
+    """Compile every template of env to Python modules in target_dir, recording what they were built from."""
+    env.compile_templates(target_dir, zip=None, ignore_errors=False)
+    with open(os.path.join(target_dir, MANIFEST), 'w') as f:
+        json.dump(template_checksums(source_dir), f, indent=2)
+
+
+def precompiled_loader(source_dir, target_dir, fallback):
+    """
+    Return a loader for the templates compiled into target_dir, or None.
+
+    A compiled directory only counts while every source still matches its
+    checksum, so editing a template without recompiling falls back to
+    compiling it at runtime instead of serving the old page. Templates
+    missing from target_dir are left to the fallback loader.
+    """
+    from jinja2 import ChoiceLoader, ModuleLoader
+
+    try:
+        with open(os.path.join(target_dir, MANIFEST)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest != template_checksums(source_dir):
+        logger.warning(f"Compiled templates in {target_dir} are out of date, compiling at runtime")
+        return None
+    return ChoiceLoader([ModuleLoader(target_dir), fallback])
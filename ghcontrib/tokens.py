@@ -0,0 +1,169 @@
+import os
+import re
+import threading
+import time
+
+# Hourly GraphQL points of a token GitHub has not reported on yet
+DEFAULT_LIMIT = 5000
+
+
+class TokenBudget:
+    """Rate limit state of one token, as last reported by GitHub."""
+
+    def __init__(self, token):
+        self.token = token
+        self.limit = None
+        self.remaining = None
+        self.reset_at = None
+        self.in_flight = 0
+        self.requests = 0
+        self.cost = 0
+        self.failures = 0
+        self.quarantined_until = 0.0
+
+    @property
+    def name(self):
+        """Safe to log: the last four characters only."""
+        return f'...{self.token[-4:]}' if self.token else 'anonymous'
+
+    def headroom(self, now):
+        """Points this token can still spend, less the requests already in flight on it."""
+        if self.remaining is None or (self.reset_at is not None and self.reset_at <= now):
+            points = self.limit or DEFAULT_LIMIT
+        else:
+            points = self.remaining
+        return points - self.in_flight
+
+    def stats(self, now):
+        return {
+            'token': self.name,
+            'limit': self.limit,
+            'remaining': self.remaining,
+            'reset_at': self.reset_at,
+            'in_flight': self.in_flight,
+            'requests': self.requests,
+            'cost': self.cost,
+            'failures': self.failures,
+            'quarantined_for': max(0, round(self.quarantined_until - now)) or None
+        }
+
+
+class TokenPool:
+    """
+    GitHub tokens whose point budgets are spent side by side.
+
+    Each request goes to the available token with the most headroom, so
+    throughput grows with the number of tokens. A token that is rejected
+    (401/403) or hits a secondary rate limit is set aside for a while and
+    the request moves to another one.
+    """
+
+    def __init__(self, tokens, quarantine=300):
+        self.quarantine_seconds = quarantine
+        self.budgets = [TokenBudget(token) for token in dict.fromkeys(tokens)] or [TokenBudget(None)]
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.budgets)
+
+    def acquire(self):
+        """Pick the token with the most headroom and count a request in flight on it."""
+        with self._lock:
+            now = time.time()
+            available = [budget for budget in self.budgets if budget.quarantined_until <= now]
+            if available:
+                budget = max(available, key=lambda budget: budget.headroom(now))
+            else:
+                # Every token is set aside; the first one due back is the best bet
+                budget = min(self.budgets, key=lambda budget: budget.quarantined_until)
+            budget.in_flight += 1
+            return budget
+
+    def release(self, budget):
+        with self._lock:
+            budget.in_flight -= 1
+            budget.requests += 1
+
+    def available(self, now=None):
+        """Number of tokens that are not set aside."""
+        now = now or time.time()
+        with self._lock:
+            return sum(1 for budget in self.budgets if budget.quarantined_until <= now)
+
+    def spare(self, budget, reserve=0):
+        """Whether another available token has more than reserve points left."""
+        with self._lock:
+            now = time.time()
+            return any(other is not budget and other.quarantined_until <= now and other.headroom(now) > reserve
+                       for other in self.budgets)
+
+    def quarantine(self, budget, seconds=None):
+        with self._lock:
+            budget.failures += 1
+            budget.quarantined_until = time.time() + (seconds if seconds is not None else self.quarantine_seconds)
+
+    def observe(self, budget, remaining=None, limit=None, reset_at=None):
+        with self._lock:
+            if remaining is not None:
+                budget.remaining = remaining
+            if limit is not None:
+                budget.limit = limit
+            if reset_at is not None:
+                budget.reset_at = reset_at
+
+    def spend(self, budget, cost, remaining):
+        """Record the rateLimit { cost remaining } of a response."""
+        with self._lock:
+            budget.cost += cost
+            budget.remaining = remaining
+
+    def forget_reset(self, budget):
+        """The reset time has passed; the next response reports the new budget."""
+        with self._lock:
+            budget.remaining = None
+
+    def _known(self, field):
+        now = time.time()
+        return [getattr(budget, field) for budget in self.budgets
+                if budget.quarantined_until <= now and getattr(budget, field) is not None]
+
+    @property
+    def remaining(self):
+        """Points left across the available tokens, or None before GitHub has reported any."""
+        with self._lock:
+            now = time.time()
+            known = [budget.headroom(now) + budget.in_flight for budget in self.budgets
+                     if budget.quarantined_until <= now and budget.remaining is not None]
+        return sum(known) if known else None
+
+    @property
+    def limit(self):
+        with self._lock:
+            known = self._known('limit')
+        return sum(known) if known else None
+
+    @property
+    def reset_at(self):
+        """When the first token's budget refills."""
+        with self._lock:
+            known = self._known('reset_at')
+        return min(known) if known else None
+
+    def stats(self):
+        with self._lock:
+            now = time.time()
+            return [budget.stats(now) for budget in self.budgets]
+
+
+def tokens_from_env():
+    """Tokens from GITHUB_TOKENS (comma or whitespace separated), else the single GITHUB_TOKEN."""
+    tokens = re.split(r'[\s,]+', os.getenv('GITHUB_TOKENS', '').strip())
+    tokens = [token for token in tokens if token]
+    if not tokens and os.getenv('GITHUB_TOKEN'):
+        tokens = [os.getenv('GITHUB_TOKEN')]
+    return tokens
+
+
+def has_token():
+    """Whether any GitHub token is configured."""
+    return bool(tokens_from_env())
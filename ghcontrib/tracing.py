@@ -0,0 +1,262 @@
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+# Upper bounds in seconds of the latency histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+
+class Span:
+    """One timed phase of an analysis; spans started inside it become its children."""
+
+    def __init__(self, name, attributes=None, parent=None):
+        self.name = name
+        self.attributes = dict(attributes or {})
+        self.trace_id = parent.trace_id if parent is not None else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent is not None else None
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.duration = None
+        self.error = None
+        self._start = time.perf_counter()
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+    def add(self, key, amount=1):
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    def finish(self):
+        self.duration = time.perf_counter() - self._start
+        self.end_ns = self.start_ns + int(self.duration * 1e9)
+
+    def to_otel(self):
+        """The span in OpenTelemetry's OTLP/JSON shape."""
+        span = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': 1,
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns),
+            'attributes': [{'key': key, 'value': otel_value(value)} for key, value in self.attributes.items()],
+            'status': {'code': 2, 'message': self.error} if self.error else {'code': 1}
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        return span
+
+
+def otel_value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+class PhaseStats:
+    """Latency histogram plus a window of recent samples for quantiles."""
+
+    def __init__(self, window=2048):
+        self.count = 0
+        self.total = 0.0
+        self.errors = 0
+        self.buckets = [0] * len(BUCKETS)
+        self.recent = deque(maxlen=window)
+
+    def observe(self, duration, error=False):
+        self.count += 1
+        self.total += duration
+        self.errors += bool(error)
+        self.recent.append(duration)
+        for i, bound in enumerate(BUCKETS):
+            if duration <= bound:
+                self.buckets[i] += 1
+                break
+
+    def quantiles(self):
+        ordered = sorted(self.recent)
+        if not ordered:
+            return {}
+        return {q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] for q in QUANTILES}
+
+
+class Tracer:
+    """
+    Records spans for every analysis phase in this process.
+
+    Span durations feed one latency histogram per phase (the span name),
+    GraphQL spans also feed request, byte, cost and retry counters, and
+    finished traces can be appended to export_path as OTLP/JSON lines.
+    At most max_open traces wait for their root span; past that the oldest
+    is written out as it stands.
+    """
+
+    def __init__(self, buffer=1024, export_path=None, max_open=256):
+        self.export_path = export_path
+        self.max_open = max_open
+        self._lock = threading.Lock()
+        self._phases = {}
+        self._graphql = {}
+        self._open_traces = OrderedDict()
+        self._exported = deque(maxlen=256)
+        self.recent = deque(maxlen=buffer)
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """Time the block as a span named after its phase, e.g. 'graphql' or 'render'."""
+        span = Span(name, attributes, _current_span.get())
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = str(e) or type(e).__name__
+            raise
+        finally:
+            _current_span.reset(token)
+            span.finish()
+            self._record(span)
+
+    def traced(self, name, **attributes):
+        """Decorator running every call of the function inside span(name, **attributes)."""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(name, **attributes):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def current(self):
+        return _current_span.get()
+
+    def annotate(self, **attributes):
+        """Set attributes on the current span, if there is one."""
+        span = _current_span.get()
+        if span is not None:
+            span.attributes.update(attributes)
+
+    def _record(self, span):
+        with self._lock:
+            self._phases.setdefault(span.name, PhaseStats()).observe(span.duration, span.error)
+            if span.name == 'graphql':
+                counters = self._graphql.setdefault(span.attributes.get('graphql.query', 'unknown'),
+                                                    {'requests': 0, 'bytes': 0, 'cost': 0, 'retries': 0})
+                counters['requests'] += 1
+                counters['bytes'] += span.attributes.get('graphql.response_bytes', 0)
+                counters['cost'] += span.attributes.get('graphql.cost', 0)
+                counters['retries'] += span.attributes.get('graphql.retries', 0)
+            self.recent.append(span)
+
+            if not self.export_path:
+                return
+            if span.trace_id in self._exported:
+                # Outlived its trace, e.g. a background refresh started by a request
+                spans = [span]
+            else:
+                spans = self._open_traces.setdefault(span.trace_id, [])
+                spans.append(span)
+                if span.parent_id is None:
+                    del self._open_traces[span.trace_id]
+                elif len(self._open_traces) > self.max_open:
+                    # A child whose trace already left _exported would otherwise wait forever
+                    spans = self._open_traces.popitem(last=False)[1]
+                else:
+                    return
+                self._exported.append(spans[0].trace_id)
+        with open(self.export_path, 'a') as f:
+            f.write(json.dumps(otel_document(spans)) + '\n')
+
+    def phase_stats(self):
+        """Return {phase: {count, mean_ms, p50_ms, p95_ms, p99_ms}}."""
+        with self._lock:
+            result = {}
+            for name, stats in self._phases.items():
+                quantiles = stats.quantiles()
+                result[name] = dict(
+                    count=stats.count,
+                    errors=stats.errors,
+                    mean_ms=round(stats.total / stats.count * 1000, 2),
+                    **{f'p{int(q * 100)}_ms': round(value * 1000, 2) for q, value in quantiles.items()}
+                )
+            return result
+
+    def graphql_stats(self):
+        """Return {query name: {requests, bytes, cost, retries}} since the process started."""
+        with self._lock:
+            return {query: dict(counters) for query, counters in self._graphql.items()}
+
+    def prometheus(self):
+        """Render the phase histograms and GraphQL counters in the Prometheus text format."""
+        lines = [
+            '# HELP ghcontrib_phase_duration_seconds Time spent per analysis phase.',
+            '# TYPE ghcontrib_phase_duration_seconds histogram'
+        ]
+        with self._lock:
+            phases = sorted(self._phases.items())
+            for name, stats in phases:
+                cumulative = 0
+                for bound, count in zip(BUCKETS, stats.buckets):
+                    cumulative += count
+                    lines.append(f'ghcontrib_phase_duration_seconds_bucket{{phase="{name}",le="{bound}"}} {cumulative}')
+                lines.append(f'ghcontrib_phase_duration_seconds_bucket{{phase="{name}",le="+Inf"}} {stats.count}')
+                lines.append(f'ghcontrib_phase_duration_seconds_sum{{phase="{name}"}} {stats.total:.6f}')
+                lines.append(f'ghcontrib_phase_duration_seconds_count{{phase="{name}"}} {stats.count}')
+
+            lines += ['# HELP ghcontrib_phase_latency_seconds Recent per-phase latency quantiles.',
+                      '# TYPE ghcontrib_phase_latency_seconds summary']
+            for name, stats in phases:
+                for q, value in stats.quantiles().items():
+                    lines.append(f'ghcontrib_phase_latency_seconds{{phase="{name}",quantile="{q}"}} {value:.6f}')
+
+            lines += ['# HELP ghcontrib_phase_errors_total Spans that ended with an exception.',
+                      '# TYPE ghcontrib_phase_errors_total counter']
+            lines += [f'ghcontrib_phase_errors_total{{phase="{name}"}} {stats.errors}' for name, stats in phases]
+
+            for counter, help_text in (('requests', 'GraphQL requests sent'),
+                                       ('bytes', 'GraphQL response bytes received'),
+                                       ('cost', 'GraphQL rate limit points spent'),
+                                       ('retries', 'GraphQL requests retried')):
+                lines += [f'# HELP ghcontrib_graphql_{counter}_total {help_text}.',
+                          f'# TYPE ghcontrib_graphql_{counter}_total counter']
+                lines += [f'ghcontrib_graphql_{counter}_total{{query="{query}"}} {values[counter]}'
+                          for query, values in sorted(self._graphql.items())]
+        return '\n'.join(lines) + '\n'
+
+    def otel_json(self):
+        """The buffered recent spans as one OTLP/JSON document."""
+        with self._lock:
+            spans = list(self.recent)
+        return otel_document(spans)
+
+
+def otel_document(spans):
+    return {'resourceSpans': [{
+        'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': 'ghcontrib'}}]},
+        'scopeSpans': [{'scope': {'name': 'ghcontrib.tracing'}, 'spans': [span.to_otel() for span in spans]}]
+    }]}
+
+
+def tracer_from_env():
+    """Build a Tracer; TRACE_EXPORT_PATH appends each finished trace as an OTLP/JSON line."""
+    return Tracer(
+        buffer=int(os.getenv('TRACE_BUFFER', '1024')),
+        export_path=os.getenv('TRACE_EXPORT_PATH') or None
+    )
+
+
+# Process-wide tracer shared by every entry point
+TRACER = tracer_from_env()
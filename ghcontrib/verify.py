@@ -0,0 +1,318 @@
+import contextvars
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from .client import get_client
+from .days import ContributionDays
+from .errors import NotFound, graphql_error
+from .tracing import TRACER
+
+# Follow-up requests issued at the same time for one user
+PAGINATION_CONCURRENCY = int(os.getenv('PAGINATION_CONCURRENCY', '4'))
+
+# Repository histories paged by one follow-up request, one alias each
+FOLLOW_UP_BATCH = int(os.getenv('FOLLOW_UP_BATCH', '50'))
+
+# First page of every repository's commit contributions in a window
+FIRST_PAGE = '''
+            commitContributionsByRepository(maxRepositories: 100) {
+                repository {
+                    nameWithOwner
+                    createdAt
+                }
+                contributions(first: 100) {
+                    pageInfo {
+                        endCursor
+                        hasNextPage
+                    }
+                    nodes {
+                        occurredAt
+                    }
+                }
+            }'''
+
+# One page of the user's commits to one repository in one window; {i} numbers the alias
+REPOSITORY_HISTORY = '''
+    r{i}: repository(owner: $owner{i}, name: $name{i}) {{
+        defaultBranchRef {{
+            target {{
+                ... on Commit {{
+                    history(first: 100, after: $cursor{i}, since: $since{i}, until: $until{i},
+                            author: {{id: $author}}) {{
+                        pageInfo {{
+                            endCursor
+                            hasNextPage
+                        }}
+                        nodes {{
+                            authoredDate
+                        }}
+                    }}
+                }}
+            }}
+        }}
+    }}'''
+
+
+def contribution_windows(years_back, end_date=None):
+    """Split the lookback into the one-year windows contributionsCollection accepts."""
+    end_date = end_date or datetime.utcnow()
+    windows = []
+    for year in range(years_back):
+        window_end = end_date - timedelta(days=365 * year)
+        windows.append((
+            (window_end - timedelta(days=365)).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            window_end.strftime('%Y-%m-%dT%H:%M:%SZ')
+        ))
+    return windows
+
+
+def window_variables(windows):
+    variables = {}
+    for i, (start, end) in enumerate(windows):
+        variables[f'from{i}'] = start
+        variables[f'to{i}'] = end
+    return variables
+
+
+def verification_fields(window_count):
+    """User fields for verification: creation dates plus one aliased collection per window."""
+    windows = ''.join(
+        f'''
+    w{i}: contributionsCollection(from: $from{i}, to: $to{i}) {{{FIRST_PAGE}
+    }}''' for i in range(window_count)
+    )
+    return f'''
+    id
+    createdAt
+    repositories(first: 1, orderBy: {{field: CREATED_AT, direction: ASC}}) {{
+        nodes {{
+            createdAt
+        }}
+    }}{windows}
+'''
+
+
+def window_params(window_count):
+    return ', '.join(f'$from{i}: DateTime!, $to{i}: DateTime!' for i in range(window_count))
+
+
+def build_verification_query(window_count):
+    return f'''
+    query($username: String!, {window_params(window_count)}) {{
+        user(login: $username) {{{verification_fields(window_count)}
+        }}
+        rateLimit {{
+            cost
+            remaining
+        }}
+    }}
+    '''
+
+
+class RepositoryContributions:
+    """Commit contributions per repository, merged across windows and pages."""
+
+    def __init__(self):
+        self.created_at = {}
+        self.nodes = defaultdict(list)
+        self.pages = 0
+        # Node id of the user, which follow-ups filter repository histories by
+        self.author = None
+        # (window index, repository, history cursor) still to fetch; None starts at the window's end
+        self.pending = []
+
+    def add_page(self, window, entries):
+        """
+        Record one page of commitContributionsByRepository entries.
+
+        A repository with more contributions in the window is read again in
+        full through its own history, so its first page is not kept.
+        """
+        self.pages += 1
+        for entry in entries:
+            name = entry['repository']['nameWithOwner']
+            self.created_at[name] = entry['repository']['createdAt']
+            contributions = entry['contributions']
+            if contributions['pageInfo']['hasNextPage']:
+                self.pending.append((window, name, None))
+            else:
+                self.nodes[name].extend(contributions['nodes'])
+
+    def add_history(self, window, name, history):
+        """Record one page of a repository's history, as returned for a REPOSITORY_HISTORY alias."""
+        self.pages += 1
+        self.nodes[name].extend({'occurredAt': node['authoredDate']} for node in history['nodes'])
+        if history['pageInfo']['hasNextPage']:
+            self.pending.append((window, name, history['pageInfo']['endCursor']))
+
+    def add_user(self, user, window_count):
+        self.author = user['id']
+        for window in range(window_count):
+            self.add_page(window, user[f'w{window}']['commitContributionsByRepository'])
+
+    def entries(self, repository=None):
+        """Return merged entries shaped like commitContributionsByRepository."""
+        return [
+            {
+                'repository': {'nameWithOwner': name, 'createdAt': self.created_at[name]},
+                'contributions': {'nodes': nodes}
+            }
+            for name, nodes in self.nodes.items()
+            if repository is None or name.lower() == repository.lower()
+        ]
+
+
+def build_follow_up_query(count):
+    """Build a query with one aliased repository history per pending page."""
+    params = ', '.join(f'$owner{i}: String!, $name{i}: String!, $cursor{i}: String, '
+                       f'$since{i}: GitTimestamp!, $until{i}: GitTimestamp!' for i in range(count))
+    histories = ''.join(REPOSITORY_HISTORY.format(i=i) for i in range(count))
+    return f'''
+query($author: ID!, {params}) {{{histories}
+    rateLimit {{
+        cost
+        remaining
+    }}
+}}
+'''
+
+
+def fetch_follow_up(client, author, windows, pending):
+    """
+    Fetch the next history page of each (window, repository, cursor) in one request.
+
+    :return: One history connection per pending entry, or None where the
+             repository or its default branch no longer exists
+    """
+    variables = {'author': author}
+    for i, (window, name, cursor) in enumerate(pending):
+        owner, repository = name.split('/', 1)
+        variables.update({f'owner{i}': owner, f'name{i}': repository, f'cursor{i}': cursor,
+                          f'since{i}': windows[window][0], f'until{i}': windows[window][1]})
+    response, data = client.execute(build_follow_up_query(len(pending)), variables, name='verification_page')
+
+    if response.status_code != 200:
+        raise Exception(f"GitHub API error: {response.status_code}")
+    if 'errors' in data:
+        raise graphql_error(data['errors'], f"GitHub API error: {data['errors']}")
+
+    histories = []
+    for i in range(len(pending)):
+        branch = (data['data'][f'r{i}'] or {}).get('defaultBranchRef')
+        histories.append(branch['target']['history'] if branch else None)
+    return histories
+
+
+def fetch_remaining_pages(windows, contributions, client=None, concurrency=PAGINATION_CONCURRENCY,
+                          batch_size=FOLLOW_UP_BATCH, progress=None):
+    """
+    Page through every repository that still has more contributions.
+
+    GitHub cannot filter commitContributionsByRepository to one repository,
+    and its cursors are opaque, so a repository with more than one page in
+    a window is read through its own default-branch history instead,
+    filtered to the user's commits in that window. Each round sends the
+    next page of every such repository, batch_size aliased histories per
+    request, with the requests of a round running in parallel.
+    progress, if given, is called with contributions after each round.
+    """
+    client = client or get_client()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        while contributions.pending:
+            pending, contributions.pending = contributions.pending, []
+            batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+            futures = [
+                (batch, pool.submit(contextvars.copy_context().run, fetch_follow_up,
+                                    client, contributions.author, windows, batch))
+                for batch in batches
+            ]
+            for batch, future in futures:
+                for (window, name, _), history in zip(batch, future.result()):
+                    if history is not None:
+                        contributions.add_history(window, name, history)
+            if progress is not None:
+                progress(contributions)
+    return contributions
+
+
+def fetch_commit_contributions(username, years_back=3, client=None, progress=None, end_date=None):
+    """
+    Fetch every commit contribution of a user over the lookback.
+
+    One request returns the creation dates and the first page of every
+    repository in every yearly window; only repositories with more pages
+    cost follow-up requests.
+
+    :param progress: Optional callable(account start ISO date, RepositoryContributions)
+                     run after the first request and after each round of follow-ups
+    :param end_date: End of the lookback (default now, UTC)
+    :return: (account start ISO date, RepositoryContributions)
+    """
+    client = client or get_client()
+    windows = contribution_windows(years_back, end_date)
+    variables = dict(window_variables(windows), username=username)
+
+    response, data = client.execute(build_verification_query(len(windows)), variables, name='verification')
+
+    if response.status_code != 200:
+        raise Exception(f"GitHub API error: {response.status_code}")
+    if 'errors' in data:
+        raise graphql_error(data['errors'], f"GitHub API error: {data['errors']}")
+
+    user = data['data']['user']
+    if not user:
+        raise NotFound(f"User '{username}' not found")
+
+    user_created = account_start_date(user)
+    contributions = RepositoryContributions()
+    contributions.add_user(user, len(windows))
+    round_done = None
+    if progress is not None:
+        progress(user_created, contributions)
+        round_done = lambda contributions: progress(user_created, contributions)
+    fetch_remaining_pages(windows, contributions, client, progress=round_done)
+    return user_created, contributions
+
+
+def account_start_date(user):
+    """Return the later of the account creation date and the first repository's creation date."""
+    start = user['createdAt'][:10]
+    repos = user['repositories']['nodes']
+    if repos and repos[0]['createdAt']:
+        start = max(start, repos[0]['createdAt'][:10])
+    return start
+
+
+@TRACER.traced('aggregate')
+def count_commit_days(contributions, user_created):
+    """
+    Collect unique commit days from commitContributionsByRepository.
+
+    :param contributions: commitContributionsByRepository entries
+    :param user_created: ISO date before which contributions are ignored
+    :return: ContributionDays
+    """
+    commit_days = ContributionDays()
+    for repo_contributions in contributions:
+        repo_created_at = repo_contributions['repository']['createdAt']
+
+        for node in repo_contributions['contributions']['nodes']:
+            occurred_at = node['occurredAt']
+
+            # Only count commits after both user creation and repo creation;
+            # ISO 8601 UTC timestamps compare correctly as strings
+            if occurred_at[:10] >= user_created and occurred_at >= repo_created_at:
+                commit_days.add(occurred_at)
+    return commit_days
+
+
+def verification_result(commit_days, threshold, years_back, user_created):
+    return {
+        'valid': commit_days.meets(threshold),
+        'contribution_days': commit_days.total_days(),
+        'threshold': threshold,
+        'years_back': years_back,
+        'user_creation_date': user_created
+    }
@@ -1,219 +1,36 @@
-import requests
-from datetime import datetime, timedelta
+from datetime import date
 import os
+import sys
+import argparse
 from dotenv import load_dotenv
 import logging
-import time
+from ghcontrib.cache import cache_from_env
+from ghcontrib.ratelimit import SCHEDULER
+from ghcontrib.tokens import has_token
+from ghcontrib.tracing import TRACER
+from ghcontrib.analyzer import ContributionAnalyzer, ContributionsStrategy
+from ghcontrib.days import dataset_days
+from ghcontrib.verify import verification_result
+from ghcontrib.batch import run_batch, BATCH_SIZE, BATCH_CONCURRENCY
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# Disable requests library's connection pooling and caching
-requests.adapters.DEFAULT_RETRIES = 0
-requests.packages.urllib3.util.connection.HAS_IPV6 = False
-requests.packages.urllib3.disable_warnings()
-
 # Load environment variables
 load_dotenv()
 
-# GitHub API Token and Username from environment variables
-GITHUB_TOKEN = os.getenv('GITHUB_TOKEN')
+# GitHub API Token(s) and Username from environment variables
 USERNAME = os.getenv('GITHUB_USERNAME')
 
-if not GITHUB_TOKEN:
-    raise ValueError("Please set GITHUB_TOKEN environment variable")
-
-if not USERNAME:
-    raise ValueError("Please set GITHUB_USERNAME environment variable")
-
-# GraphQL API endpoint
-GRAPHQL_URL = "https://api.github.com/graphql"
-
-# Headers for the API request with cache-control directives
-HEADERS = {
-    "Authorization": f"Bearer {GITHUB_TOKEN}",
-    "Content-Type": "application/json",
-    "Cache-Control": "no-cache, no-store, must-revalidate",
-    "Pragma": "no-cache",
-    "Expires": "0"
-}
-
-def get_user_creation_date(username):
-    """Fetch the user's account creation date."""
-    start_time = time.time()
-    logger.info(f"Fetching user creation date for {username}")
-    
-    query = '''
-    query($username: String!) {
-        user(login: $username) {
-            createdAt
-            repositories(first: 1, orderBy: {field: CREATED_AT, direction: ASC}) {
-                nodes {
-                    createdAt
-                }
-            }
-        }
-    }
-    '''
-    
-    session = requests.Session()
-    session.mount('https://api.github.com', requests.adapters.HTTPAdapter(max_retries=0))
-    
-    response = session.post(
-        GRAPHQL_URL, 
-        json={"query": query, "variables": {"username": username}}, 
-        headers=HEADERS
-    )
-    
-    if response.status_code != 200:
-        raise Exception(f"GitHub API error: {response.status_code}")
-    
-    data = response.json()
-    user_creation = datetime.strptime(data['data']['user']['createdAt'], "%Y-%m-%dT%H:%M:%SZ").date()
-    
-    # If user has repositories, use the earliest repo creation date
-    repos = data['data']['user']['repositories']['nodes']
-    if repos and repos[0]['createdAt']:
-        earliest_repo = datetime.strptime(repos[0]['createdAt'], "%Y-%m-%dT%H:%M:%SZ").date()
-        result = max(user_creation, earliest_repo)
-    else:
-        result = user_creation
-    
-    logger.info(f"User creation date fetch took {time.time() - start_time:.2f} seconds")
-    return result
-
-def fetch_repositories(username):
-    """Fetch repositories the user has contributed to."""
-    start_time = time.time()
-    logger.info(f"Fetching repositories for {username}")
-    
-    repositories = []
-    has_next_page = True
-    cursor = None
-
-    session = requests.Session()
-    session.mount('https://api.github.com', requests.adapters.HTTPAdapter(max_retries=0))
-
-    while has_next_page:
-        variables = {
-            "username": username,
-            "cursor": cursor
-        }
-
-        response = session.post(
-            GRAPHQL_URL, 
-            json={"query": '''
-                query($username: String!, $cursor: String) {
-                    user(login: $username) {
-                        repositoriesContributedTo(first: 100, after: $cursor, contributionTypes: [COMMIT, PULL_REQUEST, REPOSITORY]) {
-                            pageInfo {
-                                endCursor
-                                hasNextPage
-                            }
-                            nodes {
-                                name
-                                owner {
-                                    login
-                                }
-                                createdAt
-                            }
-                        }
-                    }
-                }
-            ''', "variables": variables}, 
-            headers=HEADERS
-        )
-
-        if response.status_code != 200:
-            raise Exception(f"GitHub API error: {response.status_code}")
-
-        data = response.json()
-        if 'errors' in data:
-            raise Exception(f"GitHub API error: {data['errors']}")
-
-        repo_data = data['data']['user']['repositoriesContributedTo']
-        repositories.extend(repo_data['nodes'])
-
-        has_next_page = repo_data['pageInfo']['hasNextPage']
-        cursor = repo_data['pageInfo']['endCursor']
-
-    logger.info(f"Repository fetch for {username} took {time.time() - start_time:.2f} seconds")
-    return repositories
-
-def fetch_commit_dates(owner, repo, username, user_creation_date):
-    """Fetch commit dates for a specific repository."""
-    start_time = time.time()
-    logger.info(f"Fetching commit dates for {owner}/{repo}")
-    
-    commit_dates = set()
-    has_next_page = True
-    cursor = None
-
-    session = requests.Session()
-    session.mount('https://api.github.com', requests.adapters.HTTPAdapter(max_retries=0))
-
-    while has_next_page:
-        variables = {
-            "owner": owner,
-            "repo": repo,
-            "username": username,
-            "cursor": cursor
-        }
-
-        response = session.post(
-            GRAPHQL_URL, 
-            json={"query": '''
-                query($username: String!, $cursor: String) {
-                    user(login: $username) {
-                        contributionsCollection {
-                            commitContributionsByRepository {
-                                repository {
-                                    createdAt
-                                }
-                                contributions(first: 100, after: $cursor) {
-                                    pageInfo {
-                                        endCursor
-                                        hasNextPage
-                                    }
-                                    nodes {
-                                        occurredAt
-                                    }
-                                }
-                            }
-                        }
-                    }
-                }
-            ''', "variables": variables}, 
-            headers=HEADERS
-        )
-
-        if response.status_code != 200:
-            raise Exception(f"GitHub API error: {response.status_code}")
+if not has_token():
+    raise ValueError("Please set GITHUB_TOKEN (or GITHUB_TOKENS) environment variable")
 
-        data = response.json()
-        if 'errors' in data:
-            raise Exception(f"GitHub API error: {data['errors']}")
-
-        contributions = data['data']['user']['contributionsCollection']['commitContributionsByRepository']
-        
-        for repo_contributions in contributions:
-            repo_created_at = datetime.strptime(repo_contributions['repository']['createdAt'], "%Y-%m-%dT%H:%M:%SZ")
-            
-            for node in repo_contributions['contributions']['nodes']:
-                commit_date = datetime.strptime(node['occurredAt'], "%Y-%m-%dT%H:%M:%SZ")
-                
-                # Only count commits after both user creation and repo creation
-                if (commit_date.date() >= user_creation_date and 
-                    commit_date >= repo_created_at):
-                    commit_dates.add(commit_date.strftime("%Y-%m-%d"))
+# Verifications that prewarm.py --verify keeps fresh for watched users
+RESULT_CACHE = cache_from_env()
 
-            page_info = repo_contributions['contributions']['pageInfo']
-            has_next_page = page_info['hasNextPage']
-            cursor = page_info['endCursor']
-
-    logger.info(f"Commit dates fetch for {owner}/{repo} took {time.time() - start_time:.2f} seconds")
-    return commit_dates
+# Verifications are commit contribution analyses, cached under the same keys as the web handlers'
+ANALYZER = ContributionAnalyzer([ContributionsStrategy()], cache=RESULT_CACHE)
 
 def verify_github_contributions(username, threshold=120, years_back=3):
     """
@@ -224,91 +41,86 @@ def verify_github_contributions(username, threshold=120, years_back=3):
     :param years_back: Number of years to look back
     :return: Verification result dictionary
     """
-    start_time = time.time()
     logger.info(f"Starting contribution verification for {username}")
     
-    try:
-        # Get user creation date
-        user_creation_date = get_user_creation_date(username)
-        
-        # Use a single GraphQL query to get all contributions
-        session = requests.Session()
-        session.mount('https://api.github.com', requests.adapters.HTTPAdapter(max_retries=0))
-        
-        cutoff_date = datetime.now() - timedelta(days=years_back * 365)
-        
-        response = session.post(
-            GRAPHQL_URL,
-            json={"query": '''
-                query($username: String!, $from: DateTime!) {
-                    user(login: $username) {
-                        contributionsCollection(from: $from) {
-                            commitContributionsByRepository {
-                                repository {
-                                    createdAt
-                                }
-                                contributions(first: 100) {
-                                    nodes {
-                                        occurredAt
-                                    }
-                                }
-                            }
-                        }
-                    }
-                }
-            ''', "variables": {
-                "username": username,
-                "from": cutoff_date.strftime("%Y-%m-%dT%H:%M:%SZ")
-            }},
-            headers=HEADERS
-        )
-        
-        if response.status_code != 200:
-            raise Exception(f"GitHub API error: {response.status_code}")
-            
-        data = response.json()
-        if 'errors' in data:
-            raise Exception(f"GitHub API error: {data['errors']}")
-            
-        unique_commit_dates = set()
-        contributions = data['data']['user']['contributionsCollection']['commitContributionsByRepository']
-        
-        for repo_contributions in contributions:
-            repo_created_at = datetime.strptime(repo_contributions['repository']['createdAt'], "%Y-%m-%dT%H:%M:%SZ")
-            
-            for node in repo_contributions['contributions']['nodes']:
-                commit_date = datetime.strptime(node['occurredAt'], "%Y-%m-%dT%H:%M:%SZ")
-                
-                # Only count commits after both user creation and repo creation
-                if (commit_date.date() >= user_creation_date and 
-                    commit_date >= repo_created_at):
-                    unique_commit_dates.add(commit_date.strftime("%Y-%m-%d"))
-        
-        # Prepare verification result
-        result = {
-            'valid': len(unique_commit_dates) >= threshold,
-            'contribution_days': len(unique_commit_dates),
-            'threshold': threshold,
-            'years_back': years_back,
-            'user_creation_date': user_creation_date,
-            'dates': sorted(list(unique_commit_dates))
-        }
-        
-        logger.info(f"Contribution verification for {username} completed in {time.time() - start_time:.2f} seconds")
-        return result
+    with SCHEDULER.track(username) as usage:
+        try:
+            data, _ = ANALYZER.lookup(username, years_back, strategy='contributions')
+            if data is not None:
+                logger.info(f"Using prewarmed verification for {username}")
+            else:
+                # One request covers the creation dates and the first page of every
+                # repository in every year; only deeper repositories are paged
+                data = ANALYZER.run(username, years_back, strategy='contributions')
+            commit_days = dataset_days(data)
+            user_creation_date = date.fromisoformat(data['account_start'])
+            return dict(verification_result(commit_days, threshold, years_back, user_creation_date),
+                        dates=list(commit_days.iter_dates()),
+                        query_usage=usage.as_dict())
+
+        except Exception as e:
+            logger.error(f"Error in contribution verification: {e}")
+            return {
+                'valid': False,
+                'error': str(e),
+                'query_usage': usage.as_dict()
+            }
 
-    except Exception as e:
-        logger.error(f"Error in contribution verification: {e}")
-        return {
-            'valid': False,
-            'error': str(e)
-        }
+def log_phase_timings():
+    """Log the latency of each traced phase, replacing per-function timing lines."""
+    for phase, stats in sorted(TRACER.phase_stats().items()):
+        logger.info(f"Phase {phase}: {stats['count']} spans, p50 {stats['p50_ms']} ms, "
+                    f"p95 {stats['p95_ms']} ms, p99 {stats['p99_ms']} ms")
+
+def log_token_usage():
+    """Log how the GraphQL points were spread over the configured tokens."""
+    for token in SCHEDULER.stats()['tokens']:
+        logger.info(f"Token {token['token']}: {token['requests']} requests, {token['cost']} points, "
+                    f"{token['remaining']} remaining, {token['failures']} failures")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Verify GitHub contributions with Gitcoin Passport-like criteria.")
+    parser.add_argument('--batch', metavar='FILE',
+                        help="Verify the usernames in FILE (one per line, '-' for stdin) and print JSONL results")
+    parser.add_argument('--output', metavar='FILE', help="Write batch results to FILE instead of stdout")
+    parser.add_argument('--checkpoint', metavar='FILE',
+                        help="Record verified usernames in FILE and skip them when the batch is rerun")
+    parser.add_argument('--threshold', type=int, default=120)
+    parser.add_argument('--years-back', type=int, default=3)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--concurrency', type=int, default=BATCH_CONCURRENCY)
+    return parser.parse_args()
+
+def main_batch(args):
+    """Verify many usernames, streaming one JSON result per line."""
+    input_stream = sys.stdin if args.batch == '-' else open(args.batch)
+    output_stream = open(args.output, 'a') if args.output else sys.stdout
+    try:
+        summary = run_batch(input_stream, output_stream, args.checkpoint,
+                            threshold=args.threshold, years_back=args.years_back,
+                            batch_size=args.batch_size, concurrency=args.concurrency)
+        logger.info(f"Batch summary: {summary}")
+    finally:
+        if input_stream is not sys.stdin:
+            input_stream.close()
+        if output_stream is not sys.stdout:
+            output_stream.close()
 
 def main():
     """Main function to analyze GitHub contributions."""
+    args = parse_args()
+    if args.batch:
+        main_batch(args)
+        log_phase_timings()
+        log_token_usage()
+        return
+
+    if not USERNAME:
+        raise ValueError("Please set GITHUB_USERNAME environment variable")
+
     try:
         # Verify contributions with Gitcoin Passport-like criteria
-        result = verify_github_contributions(USERNAME, threshold=120, years_back=3)
+        result = verify_github_contributions(USERNAME, threshold=args.threshold, years_back=args.years_back)
         
         if result.get('valid'):
             print(f"Verification Passed!")
@@ -319,6 +131,10 @@ def main():
             print(f"Verification Failed.")
             print(f"Total unique contribution days: {result.get('contribution_days', 0)}")
             print(f"Error: {result.get('error', 'Did not meet contribution threshold')}")
+
+        usage = result['query_usage']
+        print(f"GraphQL usage: {usage['requests']} requests ({usage['retries']} retries), cost {usage['cost']} points")
+        log_phase_timings()
             
     except Exception as e:
         print(f"An error occurred: {e}")
@@ -0,0 +1,101 @@
+"""
+Keep a watch-list of users fresh in the stores the web handlers read.
+
+    python prewarm.py watchlist.txt [--verify] [--once]
+
+Analyses go to the result cache (RESULT_CACHE_PATH) and, when configured,
+the contribution store, so requests for watched users are answered without
+calling GitHub.
+"""
+import argparse
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api'))
+import index
+from ghcontrib.analyzer import analysis_dataset, analysis_key, analysis_window
+from ghcontrib.batch import read_usernames, verify_batch, BATCH_SIZE
+from ghcontrib.prewarm import Prewarmer, WatchState
+
+logger = logging.getLogger(__name__)
+
+# GraphQL points the prewarmer may spend per hour, on top of user-facing traffic
+PREWARM_POINTS_PER_HOUR = int(os.getenv('PREWARM_POINTS_PER_HOUR', '1000'))
+
+# Points of the shared budget left for user-facing requests; passes pause below this
+PREWARM_MIN_REMAINING = int(os.getenv('PREWARM_MIN_REMAINING', '1000'))
+
+# Users refreshed more recently than this are skipped; keep it below RESULT_CACHE_TTL
+PREWARM_MIN_AGE = int(os.getenv('PREWARM_MIN_AGE', '1800'))
+
+PREWARM_INTERVAL = int(os.getenv('PREWARM_INTERVAL', '300'))
+
+
+def load_watchlist(path):
+    with open(path) as watchlist:
+        return list(read_usernames(watchlist))
+
+
+def refresh_contributions(usernames):
+    for username in usernames:
+        index.refresh_contributions(username, index.YEARS_BACK)
+
+
+def refresh_verifications(usernames, threshold, years_back):
+    """Verify a batch of users in one request and cache each as the analysis pp-github-trouble.py runs."""
+    failed = []
+    start, end = analysis_window(years_back)
+    for result in verify_batch(usernames, threshold, years_back, include_days=True):
+        if 'error' in result:
+            failed.append(result)
+        else:
+            data = analysis_dataset(result['username'], result['days'], start, end, 'contributions',
+                                    account_start=result['user_creation_date'])
+            index.RESULT_CACHE.set(analysis_key(result['username'], years_back, 'contributions'), data)
+    if failed:
+        raise Exception(f"{len(failed)} verifications failed, e.g. {failed[0]['username']}: {failed[0]['error']}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Keep watched users' contribution stats fresh.")
+    parser.add_argument('watchlist', help="File with one username per line")
+    parser.add_argument('--verify', action='store_true',
+                        help="Also prewarm Passport-style verifications")
+    parser.add_argument('--threshold', type=int, default=120)
+    parser.add_argument('--years-back', type=int, default=3)
+    parser.add_argument('--state', default=os.getenv('WATCH_STATE_PATH', 'watch_state.db'),
+                        help="SQLite file with refresh times and request counts (default WATCH_STATE_PATH)")
+    parser.add_argument('--once', action='store_true', help="Run a single pass and exit")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if index.RESULT_CACHE.disk is None:
+        raise ValueError("Please set RESULT_CACHE_PATH so the web handlers can read prewarmed results")
+
+    def refresh(usernames):
+        refresh_contributions(usernames)
+        if args.verify:
+            refresh_verifications(usernames, args.threshold, args.years_back)
+
+    prewarmer = Prewarmer(
+        refresh,
+        WatchState(args.state),
+        points_per_hour=PREWARM_POINTS_PER_HOUR,
+        min_remaining=PREWARM_MIN_REMAINING,
+        min_age=PREWARM_MIN_AGE,
+        interval=PREWARM_INTERVAL,
+        # Verifications pack several users into one request
+        batch_size=BATCH_SIZE if args.verify else 1
+    )
+    if args.once:
+        prewarmer.run_once(load_watchlist(args.watchlist))
+    else:
+        prewarmer.run_forever(lambda: load_watchlist(args.watchlist))
+    logger.info(f"Prewarm totals: {prewarmer.stats()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'bench'))
+
+from standin import StandIn, serve
+from ghcontrib.client import GitHubClient
+from ghcontrib.ratelimit import RateLimitScheduler
+
+
+@pytest.fixture(scope='session')
+def standin():
+    """The offline GraphQL stand-in from bench/, served on a background thread."""
+    standin = StandIn(rate_limit=1000000)
+    server, url = serve(standin)
+    standin.url = url
+    yield standin
+    server.shutdown()
+
+
+@pytest.fixture
+def client(standin):
+    """A client for the stand-in with a scheduler of its own, so tests do not share budgets."""
+    return GitHubClient(token='test', http2=False, url=standin.url,
+                        scheduler=RateLimitScheduler(tokens=['test'], base_delay=0))
+
+
+@pytest.fixture
+def authored_days(standin):
+    """The commit days the stand-in holds for a user over the lookback, computed without GraphQL."""
+    from ghcontrib.verify import contribution_windows
+
+    def authored_days(username, years_back, end_date, user_created):
+        windows = contribution_windows(years_back, end_date)
+        start, end = windows[-1][0], windows[0][1]
+        account = standin.account(username)
+        return {stamp[:10] for repo in account.repos[:100] for stamp, author in repo['commits']
+                if author == account.login and start <= stamp <= end and stamp[:10] >= user_created}
+    return authored_days
@@ -0,0 +1,61 @@
+from ghcontrib.analyzer import (CalendarStrategy, ContributionAnalyzer, ContributionsStrategy, HistoryStrategy,
+                                analysis_key, analysis_window)
+from ghcontrib.cache import ResultCache
+from ghcontrib.store import ContributionStore
+
+
+def make_analyzer(client, **options):
+    return ContributionAnalyzer([CalendarStrategy(), ContributionsStrategy(), HistoryStrategy()], client=client,
+                                scheduler=client.scheduler, **options)
+
+
+def test_cheapest_strategy_for_each_precision(standin, client):
+    analyzer = make_analyzer(client)
+    assert analyzer.choose('small-choose', 3, 'contributions').name == 'calendar'
+    assert analyzer.choose('small-choose', 3, 'commits').name == 'contributions'
+    assert analyzer.choose('small-choose', 3, 'history').name == 'history'
+
+
+def test_strategies_agree_on_commit_only_accounts(standin, client):
+    analyzer = make_analyzer(client)
+    datasets = {name: analyzer.run('small-agree', 2, strategy=name) for name in analyzer.strategies}
+
+    assert {data['strategy'] for data in datasets.values()} == set(analyzer.strategies)
+    # The stand-in's accounts only ever commit, so every precision sees the same days
+    assert len({data['total_days'] for data in datasets.values()}) == 1
+    assert datasets['contributions']['account_start']
+    assert datasets['history']['repositories'] == len(standin.account('small-agree').repos)
+
+
+def test_analyze_caches_under_the_shared_key(standin, client):
+    cache = ResultCache()
+    analyzer = make_analyzer(client, cache=cache)
+    data = analyzer.analyze('Small-Cached', 3)
+
+    assert analyzer.key('small-cached', 3) == analysis_key('small-cached', 3, 'calendar') == \
+        ('small-cached', '3y', 'calendar')
+    assert cache.get(('small-cached', '3y', 'calendar')) == data
+    with client.scheduler.track() as usage:
+        assert analyzer.analyze('small-cached', 3) == data
+    assert usage.requests == 0
+
+
+def test_since_window_is_part_of_the_key(standin, client):
+    analyzer = make_analyzer(client, cache=ResultCache())
+    data = analyzer.analyze('small-since', precision='history', since='2024-01-01T00:00:00Z')
+    assert data['from'] == '2024-01-01'
+    assert analyzer.lookup('small-since', precision='history', since='2024-01-01T00:00:00Z') == (data, False)
+    assert analyzer.lookup('small-since', precision='history') == (None, False)
+
+
+def test_calendar_store_only_fetches_since_the_watermark(standin, client, tmp_path):
+    store = ContributionStore(str(tmp_path / 'store.db'))
+    analyzer = ContributionAnalyzer([CalendarStrategy(store=store)], client=client, scheduler=client.scheduler)
+    calendar = analyzer.strategies['calendar']
+    start, end = analysis_window(3)
+    assert len(calendar.plan('small-store', start, end)) == 3
+
+    first = analyzer.run('small-store', 3)
+    assert store.sync_state('small-store') is not None
+    assert len(calendar.plan('small-store', start, end)) == 1
+    assert analyzer.run('small-store', 3) == first
@@ -0,0 +1,68 @@
+import threading
+
+import pytest
+
+import app as history_app
+from ghcontrib.cache import ResultCache
+
+DATASET = {'username': 'octocat', 'from': '2022-01-07', 'to': '2025-01-06', 'total_days': 2,
+           'total_contributions': 3, 'monthly': {'2024-01': 3}, 'daily': [0] * 727 + [2, 1] + [0] * 367,
+           'strategy': 'history'}
+
+
+@pytest.fixture
+def page(monkeypatch):
+    """The test client of app.py, with the crawl for GITHUB_USERNAME already cached."""
+    monkeypatch.setenv('GITHUB_USERNAME', 'octocat')
+    monkeypatch.setattr(history_app.ANALYZER, 'lookup', lambda username, **options: (DATASET, False))
+    return history_app.app.test_client()
+
+
+def test_cached_crawl_is_rendered(page):
+    response = page.get('/')
+    assert response.status_code == 200
+    html = response.get_data(as_text=True)
+    assert 'Results for octocat' in html
+    assert 'Total days with commits in the last 3 years: 2' in html
+    assert 'contributionChart' in html
+
+
+@pytest.mark.parametrize('params', [{'threshold': 'abc'}, {'years_back': '2.5'}, {'years_back': 0},
+                                    {'threshold': -1}])
+def test_verify_job_rejects_bad_numbers(page, params):
+    response = page.post('/jobs', json=dict(params, kind='verify', username='octocat'))
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def test_verify_jobs_are_shared_only_for_the_same_options(page, monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(history_app, 'verify_job', lambda progress, username, **options: release.wait(5))
+
+    def submit(**params):
+        return page.post('/jobs', json=dict(params, kind='verify', username='OctoCat')).get_json()['id']
+
+    try:
+        first = submit(threshold=100)
+        assert submit(threshold='100', years_back=3) == first
+        assert submit(threshold=50) != first
+        assert submit(threshold=100, years_back=2) != first
+    finally:
+        release.set()
+
+
+def test_cached_team_is_answered_without_a_crawl(page, monkeypatch):
+    crawls = []
+    monkeypatch.setattr(history_app, 'RESULT_CACHE', ResultCache())
+    monkeypatch.setattr(history_app, 'analyze_team', lambda since, usernames, org, progress=None:
+                        crawls.append(usernames) or {'team': {'total_days': 1, 'monthly_data': {}}})
+
+    first = page.post('/jobs', json={'kind': 'team', 'usernames': 'a,b'}).get_json()
+    job = history_app.JOBS.get(first['id'])
+    while job['status'] != 'done':
+        job = history_app.JOBS.wait(first['id'], job['version'])
+
+    second = page.post('/jobs', json={'kind': 'team', 'usernames': 'B, A'}).get_json()
+    assert second['status'] == 'done'
+    assert history_app.JOBS.get(second['id'])['result']['team']['total_days'] == 1
+    assert crawls == [['a', 'b']]
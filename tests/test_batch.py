@@ -0,0 +1,45 @@
+from datetime import datetime
+
+import pytest
+import requests
+
+from ghcontrib.batch import verify_batch
+from ghcontrib.verify import count_commit_days, fetch_commit_contributions
+
+
+def test_batch_verifies_each_user(standin, client, authored_days):
+    end_date = datetime.utcnow()
+    results = verify_batch(['small-batch', 'huge-batch', 'ghost-batch'], threshold=100, years_back=2,
+                           client=client, include_days=True)
+
+    assert [result['username'] for result in results] == ['small-batch', 'huge-batch', 'ghost-batch']
+    for result in results[:2]:
+        expected = authored_days(result['username'], 2, end_date, result['user_creation_date'])
+        assert result['contribution_days'] == len(expected)
+        assert set(result['days'].iter_dates()) == expected
+        assert result['valid'] == (len(expected) >= 100)
+    assert results[2]['valid'] is False
+    assert 'ghost-batch' in results[2]['error']
+
+
+def test_batch_matches_single_verification(standin, client):
+    single_created, contributions = fetch_commit_contributions('typical-same', 3, client)
+    single = count_commit_days(contributions.entries(), single_created)
+    batched, = verify_batch(['typical-same'], years_back=3, client=client)
+    assert batched['contribution_days'] == single.total_days()
+    assert batched['user_creation_date'] == single_created
+
+
+class FailingClient:
+    def __init__(self, error):
+        self.error = error
+
+    def execute(self, *args, **kwargs):
+        raise self.error
+
+
+@pytest.mark.parametrize('error', [requests.ConnectionError('connection reset'), requests.Timeout()])
+def test_batch_turns_transport_errors_into_rows(error):
+    results = verify_batch(['a', 'b'], client=FailingClient(error))
+    assert [result['username'] for result in results] == ['a', 'b']
+    assert all(result['valid'] is False and result['error'] for result in results)
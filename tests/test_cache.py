@@ -0,0 +1,87 @@
+import pytest
+
+from ghcontrib import cache
+from ghcontrib.cache import ResultCache, SQLiteCache, make_key
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A settable time.time() for the cache module."""
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, 'time', lambda: now[0])
+    return now
+
+
+def test_make_key_ignores_username_case():
+    assert make_key('OctoCat', '3y', 'calendar') == ('octocat', '3y', 'calendar')
+    assert make_key('octocat', 3) == ('octocat', '3', 'day')
+
+
+def test_hit_until_ttl_then_miss(clock):
+    results = ResultCache(ttl=10)
+    results.set(('a',), 1)
+
+    clock[0] += 9
+    assert results.get(('a',)) == 1
+    clock[0] += 2
+    assert results.get(('a',)) is None
+    assert results.stats()['hits'] == 1
+    assert results.stats()['misses'] == 1
+
+
+def test_lookup_serves_stale_within_grace(clock):
+    results = ResultCache(ttl=10, grace=20)
+    results.set(('a',), 1)
+
+    assert results.lookup(('a',)) == (1, False)
+    clock[0] += 15
+    assert results.lookup(('a',)) == (1, True)
+    # get() only ever returns fresh values
+    assert results.get(('a',)) is None
+    clock[0] += 20
+    assert results.lookup(('a',)) == (None, False)
+    assert results.stats()['expirations'] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    results = ResultCache(max_entries=2)
+    results.set(('a',), 1)
+    results.set(('b',), 2)
+    results.get(('a',))
+    results.set(('c',), 3)
+
+    assert results.get(('b',)) is None
+    assert results.get(('a',)) == 1
+    assert results.get(('c',)) == 3
+    assert results.stats()['evictions'] == 1
+
+
+def test_sqlite_cache_round_trip(tmp_path):
+    disk = SQLiteCache(str(tmp_path / 'cache.db'))
+    assert disk.get(('a', '3y', 'calendar')) is None
+    disk.set(('a', '3y', 'calendar'), {'total_days': 3}, 123.0)
+    assert disk.get(('a', '3y', 'calendar')) == ({'total_days': 3}, 123.0)
+    disk.delete(('a', '3y', 'calendar'))
+    assert disk.get(('a', '3y', 'calendar')) is None
+
+
+def test_disk_tier_is_shared_between_caches(tmp_path, clock):
+    path = str(tmp_path / 'cache.db')
+    writer = ResultCache(ttl=10, disk=SQLiteCache(path))
+    reader = ResultCache(ttl=10, disk=SQLiteCache(path))
+    writer.set(('a',), {'total_days': 3})
+
+    assert reader.get(('a',)) == {'total_days': 3}
+    assert reader.stats()['disk_hits'] == 1
+    # Promoted into memory, so the next read does not touch the disk
+    assert reader.get(('a',)) == {'total_days': 3}
+    assert reader.stats()['hits'] == 1
+
+
+def test_expired_disk_entries_are_deleted(tmp_path, clock):
+    disk = SQLiteCache(str(tmp_path / 'cache.db'))
+    ResultCache(ttl=10, disk=disk).set(('a',), 1)
+    clock[0] += 11
+
+    assert ResultCache(ttl=10, disk=disk).lookup(('a',)) == (None, False)
+    assert disk.get(('a',)) is None
@@ -0,0 +1,124 @@
+from datetime import date
+
+from ghcontrib.days import ContributionDays, contribution_dataset, dataset_days, parse_ordinal
+
+
+def test_parse_ordinal_accepts_dates_and_timestamps():
+    assert parse_ordinal('2024-02-29') == date(2024, 2, 29).toordinal()
+    assert parse_ordinal('2024-02-29T23:59:59Z') == date(2024, 2, 29).toordinal()
+
+
+def test_add_counts_days_once_and_sums_contributions():
+    days = ContributionDays()
+    days.add('2024-01-02T10:00:00Z')
+    days.add('2024-01-02T18:00:00Z')
+    days.add('2024-01-05', 3)
+
+    assert days.total_days() == 2
+    assert days.total_contributions() == 5
+    assert '2024-01-02' in days
+    assert '2024-01-03' not in days
+    assert list(days.iter_dates()) == ['2024-01-02', '2024-01-05']
+
+
+def test_window_grows_in_both_directions():
+    days = ContributionDays()
+    days.add('2024-03-10')
+    days.add('2024-01-01')
+    days.add('2024-12-31')
+
+    assert len(days) == date(2024, 12, 31).toordinal() - date(2024, 1, 1).toordinal() + 1
+    assert list(days.iter_dates()) == ['2024-01-01', '2024-03-10', '2024-12-31']
+    assert days.total_days() == 3
+
+
+def test_set_overwrites_and_clears_a_day():
+    days = ContributionDays(date(2024, 1, 1), date(2024, 1, 31))
+    days.set('2024-01-10', 4)
+    days.set('2024-01-10', 2)
+    assert days.total_contributions() == 2
+    days.set('2024-01-10', 0)
+    assert days.total_days() == 0
+    assert '2024-01-10' not in days
+
+
+def test_set_run_overwrites_consecutive_days():
+    days = ContributionDays(date(2024, 1, 1), date(2024, 1, 10))
+    days.set('2024-01-03', 9)
+    days.set_run('2024-01-02', [1, 0, 2])
+
+    assert list(days.iter_dates()) == ['2024-01-02', '2024-01-04']
+    assert days.total_contributions() == 3
+
+
+def test_update_merges_and_sums():
+    first = ContributionDays()
+    first.add('2024-01-01')
+    first.add('2024-01-15')
+    second = ContributionDays()
+    second.add('2023-12-31')
+    second.add('2024-01-15', 2)
+
+    first.update(second)
+    assert list(first.iter_dates()) == ['2023-12-31', '2024-01-01', '2024-01-15']
+    assert first.total_contributions() == 5
+
+    first.update(ContributionDays())
+    assert first.total_days() == 3
+
+
+def test_slice_keeps_only_the_window():
+    days = ContributionDays()
+    for iso in ('2023-12-31', '2024-01-01', '2024-02-01', '2024-03-01'):
+        days.add(iso)
+
+    window = days.slice(date(2024, 1, 1), date(2024, 2, 15))
+    assert window.start_ordinal == date(2024, 1, 1).toordinal()
+    assert len(window) == 46
+    assert list(window.iter_dates()) == ['2024-01-01', '2024-02-01']
+    assert days.total_days() == 4
+
+
+def test_slice_of_empty_or_disjoint_days_is_an_empty_window():
+    assert ContributionDays().slice(date(2024, 1, 1), date(2024, 1, 31)).total_days() == 0
+    days = ContributionDays()
+    days.add('2020-01-01')
+    window = days.slice(date(2024, 1, 1), date(2024, 1, 31))
+    assert len(window) == 31
+    assert window.total_days() == 0
+
+
+def test_monthly_rollups_skip_empty_months():
+    days = ContributionDays(date(2024, 1, 1), date(2024, 4, 30))
+    days.add('2024-01-31', 2)
+    days.add('2024-01-01')
+    days.add('2024-03-15', 5)
+
+    assert days.monthly_days() == {'2024-01': 2, '2024-03': 1}
+    assert days.monthly_counts() == {'2024-01': 3, '2024-03': 5}
+
+
+def test_meets_threshold():
+    days = ContributionDays()
+    days.add('2024-01-01')
+    days.add('2024-01-02')
+    assert days.meets(2)
+    assert not days.meets(3)
+
+
+def test_dataset_round_trip():
+    days = ContributionDays(date(2024, 1, 1), date(2024, 2, 29))
+    days.add('2024-01-05', 2)
+    days.add('2024-02-29')
+
+    data = contribution_dataset('octocat', days)
+    assert data['from'] == '2024-01-01'
+    assert data['to'] == '2024-02-29'
+    assert data['total_days'] == 2
+    assert data['total_contributions'] == 3
+    assert data['monthly'] == {'2024-01': 2, '2024-02': 1}
+    assert len(data['daily']) == 60
+
+    rebuilt = dataset_days(data)
+    assert list(rebuilt.iter_dates()) == list(days.iter_dates())
+    assert rebuilt.monthly_days() == days.monthly_days()
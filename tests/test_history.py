@@ -0,0 +1,48 @@
+import logging
+
+import pytest
+
+from ghcontrib.analyzer import ContributionAnalyzer, HistoryStrategy
+from ghcontrib.cache import ResultCache
+from ghcontrib.history import RepoCursor, iter_history_pages
+
+
+class Response:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class FlakyClient:
+    """The stand-in's client, except that every history page of one repository answers status."""
+
+    def __init__(self, client, repository, status=502, payload=None):
+        self.client = client
+        self.repository = repository
+        self.status = status
+        self.payload = payload or {}
+
+    def execute(self, query, variables, name=None, **kwargs):
+        if name == 'history' and variables['name'] == self.repository:
+            return Response(self.status), self.payload
+        return self.client.execute(query, variables, name=name, **kwargs)
+
+
+def test_failed_history_page_fails_the_analysis_uncached(standin, client):
+    analyzer = ContributionAnalyzer([HistoryStrategy()], client=FlakyClient(client, 'repo1'), cache=ResultCache(),
+                                    scheduler=client.scheduler)
+    with pytest.raises(Exception, match='small-flaky/repo1: 502'):
+        analyzer.analyze('small-flaky', precision='history')
+    assert analyzer.lookup('small-flaky', precision='history') == (None, False)
+
+
+def test_graphql_errors_fail_the_page(standin, client):
+    flaky = FlakyClient(client, 'repo0', 200, {'data': None, 'errors': [{'message': 'Something went wrong'}]})
+    with pytest.raises(Exception, match='Something went wrong'):
+        list(iter_history_pages(flaky, RepoCursor('small-errors', 'repo0'), None))
+
+
+def test_missing_repository_is_skipped_with_a_warning(standin, client, caplog):
+    with caplog.at_level(logging.WARNING, logger='ghcontrib.history'):
+        pages = list(iter_history_pages(client, RepoCursor('small-gone', 'no-such-repo'), None))
+    assert pages == []
+    assert 'small-gone/no-such-repo' in caplog.text
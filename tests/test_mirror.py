@@ -0,0 +1,37 @@
+import os
+import subprocess
+
+from ghcontrib.mirror import scan_mirror, sync_mirror
+
+
+def git(*args, cwd=None):
+    subprocess.run(['git', *args], cwd=cwd, check=True, capture_output=True,
+                   env=dict(os.environ, GIT_AUTHOR_NAME='a', GIT_AUTHOR_EMAIL='a@example.com',
+                            GIT_COMMITTER_NAME='a', GIT_COMMITTER_EMAIL='a@example.com'))
+
+
+def commit(work, message):
+    (work / 'file').write_text(message)
+    git('add', 'file', cwd=work)
+    git('commit', '-q', '-m', message, cwd=work)
+
+
+def test_sync_mirrors_only_the_default_branch(tmp_path):
+    work = tmp_path / 'work'
+    git('init', '-q', '-b', 'trunk', str(work))
+    commit(work, 'one')
+    git('checkout', '-q', '-b', 'feature', cwd=work)
+    commit(work, 'side')
+    git('checkout', '-q', 'trunk', cwd=work)
+    git('update-ref', 'refs/pull/1/head', 'feature', cwd=work)
+    remote = f'file://{work}/.git'
+
+    path = sync_mirror(str(tmp_path / 'mirrors'), 'octo', 'repo', remote)
+    refs = subprocess.run(['git', '-C', path, 'for-each-ref', '--format=%(refname)'],
+                          capture_output=True, text=True).stdout.split()
+    assert refs == ['refs/heads/trunk']
+
+    commit(work, 'two')
+    sync_mirror(str(tmp_path / 'mirrors'), 'octo', 'repo', remote)
+    (sha, days), = scan_mirror(path).values()
+    assert sum(commits for _, commits in days) == 2
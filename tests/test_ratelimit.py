@@ -0,0 +1,167 @@
+import json
+import time
+
+import pytest
+
+from ghcontrib.ratelimit import RateLimitExceeded, RateLimitScheduler
+from ghcontrib.tokens import TokenPool, tokens_from_env
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, payload=None, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.content = json.dumps(payload if payload is not None else {'data': {}}).encode('utf-8')
+        self.text = self.content.decode('utf-8')
+
+
+class FakeGitHub:
+    """Stands in for requests.post: answers each token from its own queue of responses."""
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.calls = []
+
+    def __call__(self, url, headers=None, **kwargs):
+        token = (headers or {}).get('Authorization', '').removeprefix('Bearer ') or None
+        self.calls.append(token)
+        queue = self.responses[token]
+        return queue.pop(0) if len(queue) > 1 else queue[0]
+
+
+def ok(cost=1, remaining=4000, headers=None):
+    return FakeResponse(200, {'data': {'rateLimit': {'cost': cost, 'remaining': remaining}}}, headers)
+
+
+def test_tokens_from_env(monkeypatch):
+    monkeypatch.setenv('GITHUB_TOKENS', 'a, b\nc')
+    monkeypatch.setenv('GITHUB_TOKEN', 'single')
+    assert tokens_from_env() == ['a', 'b', 'c']
+    monkeypatch.setenv('GITHUB_TOKENS', '')
+    assert tokens_from_env() == ['single']
+
+
+def test_pool_picks_the_token_with_most_headroom():
+    pool = TokenPool(['a', 'b', 'a'])
+    assert len(pool) == 2
+    a, b = pool.budgets
+    pool.observe(a, remaining=100)
+    pool.observe(b, remaining=900)
+
+    budget = pool.acquire()
+    assert budget is b
+    # Requests in flight count against the headroom until released
+    assert budget.headroom(time.time()) == 899
+    pool.release(budget)
+    assert b.requests == 1
+
+
+def test_quarantined_tokens_are_skipped_until_due():
+    pool = TokenPool(['a', 'b'], quarantine=60)
+    a, b = pool.budgets
+    pool.quarantine(a)
+    assert pool.available() == 1
+    assert pool.acquire() is b
+    pool.quarantine(b, seconds=1)
+    # With every token set aside, the one due back first is used
+    assert pool.acquire() is b
+
+
+def test_requests_spread_over_tokens_by_reported_budget():
+    github = FakeGitHub({'a': [ok(remaining=100)], 'b': [ok(remaining=4000)]})
+    scheduler = RateLimitScheduler(tokens=['a', 'b'])
+
+    for _ in range(4):
+        scheduler.execute(github, 'url')
+    # 'a' reported the smaller budget after its first request, so 'b' takes the rest
+    assert github.calls == ['a', 'b', 'b', 'b']
+    assert scheduler.remaining == 4100
+    assert scheduler.stats()['cost'] == 4
+
+
+def test_usage_is_tracked_per_block_and_counted_toward_the_outer_one():
+    github = FakeGitHub({'a': [ok(cost=2)]})
+    scheduler = RateLimitScheduler(tokens=['a'])
+    with scheduler.track('outer') as outer:
+        scheduler.execute(github, 'url')
+        with scheduler.track('inner') as inner:
+            scheduler.execute(github, 'url')
+    assert inner.as_dict() == {'requests': 1, 'retries': 0, 'cost': 2}
+    assert outer.as_dict() == {'requests': 2, 'retries': 0, 'cost': 4}
+
+
+def test_server_errors_are_retried_with_backoff():
+    github = FakeGitHub({'a': [FakeResponse(502), FakeResponse(503), ok()]})
+    scheduler = RateLimitScheduler(tokens=['a'], base_delay=0)
+    with scheduler.track() as usage:
+        response, payload = scheduler.execute(github, 'url')
+    assert response.status_code == 200
+    assert payload['data']['rateLimit']['cost'] == 1
+    assert usage.retries == 2
+    assert usage.requests == 3
+
+
+def test_retries_stop_at_max_retries():
+    github = FakeGitHub({'a': [FakeResponse(502)]})
+    scheduler = RateLimitScheduler(tokens=['a'], base_delay=0, max_retries=2)
+    response, payload = scheduler.execute(github, 'url')
+    assert response.status_code == 502
+    assert payload is None
+    assert len(github.calls) == 3
+
+
+def test_rejected_token_is_set_aside_and_the_request_moves_on():
+    github = FakeGitHub({'a': [FakeResponse(401)], 'b': [ok()]})
+    scheduler = RateLimitScheduler(tokens=['a', 'b'])
+
+    response, _ = scheduler.execute(github, 'url')
+    assert response.status_code == 200
+    assert github.calls == ['a', 'b']
+    scheduler.execute(github, 'url')
+    assert github.calls[-1] == 'b'
+    stats = {token['token']: token for token in scheduler.stats()['tokens']}
+    assert stats['...a']['failures'] == 1
+    assert stats['...a']['quarantined_for']
+
+
+def test_secondary_rate_limit_moves_to_another_token():
+    limited = FakeResponse(403, {'message': 'You have exceeded a secondary rate limit'}, {'Retry-After': '60'})
+    github = FakeGitHub({'a': [limited], 'b': [ok()]})
+    scheduler = RateLimitScheduler(tokens=['a', 'b'])
+
+    response, _ = scheduler.execute(github, 'url')
+    assert response.status_code == 200
+    assert github.calls == ['a', 'b']
+
+
+def test_request_is_shed_when_the_budget_resets_too_late():
+    scheduler = RateLimitScheduler(tokens=['a'], reserve=50, max_wait=30)
+    budget = scheduler.tokens.budgets[0]
+    scheduler.tokens.observe(budget, remaining=10, reset_at=time.time() + 3600)
+
+    with pytest.raises(RateLimitExceeded):
+        scheduler.execute(FakeGitHub({'a': [ok()]}), 'url')
+    assert scheduler.stats()['shed'] == 1
+    assert budget.in_flight == 0
+
+
+def test_budget_below_reserve_uses_a_token_with_spare_points():
+    scheduler = RateLimitScheduler(tokens=['a', 'b'], reserve=50)
+    a, b = scheduler.tokens.budgets
+    scheduler.tokens.observe(a, remaining=10, reset_at=time.time() + 3600)
+    scheduler.tokens.observe(b, remaining=1000, reset_at=time.time() + 3600)
+    github = FakeGitHub({'a': [ok()], 'b': [ok()]})
+
+    scheduler.execute(github, 'url')
+    assert github.calls == ['b']
+
+
+def test_rate_limit_headers_update_the_budget():
+    reset_at = int(time.time()) + 3600
+    headers = {'X-RateLimit-Remaining': '42', 'X-RateLimit-Limit': '5000', 'X-RateLimit-Reset': str(reset_at)}
+    github = FakeGitHub({'a': [FakeResponse(200, {'data': {}}, headers)]})
+    scheduler = RateLimitScheduler(tokens=['a'])
+    scheduler.execute(github, 'url')
+    assert scheduler.remaining == 42
+    assert scheduler.limit == 5000
+    assert scheduler.reset_at == reset_at
@@ -0,0 +1,117 @@
+import gzip
+import os
+import sys
+
+import pytest
+
+from ghcontrib.errors import AnalysisTimeout, MissingToken, NotFound
+from ghcontrib.responses import choose_encoding, encoded_etag, etag_matches, json_body, strong_etag
+
+DATASET = {'username': 'octocat', 'from': '2024-01-01', 'to': '2024-12-31', 'total_days': 2,
+           'total_contributions': 3, 'monthly': {'2024-01': 3}, 'daily': [0, 2, 1] + [0] * 363,
+           'strategy': 'calendar'}
+
+
+def test_json_body_is_stable():
+    assert json_body({'b': 1, 'a': 2}) == json_body({'a': 2, 'b': 1})
+    assert strong_etag(json_body({'a': 1})) != strong_etag(json_body({'a': 2}))
+
+
+def test_etag_names_each_encoding():
+    etag = strong_etag(b'body')
+    assert encoded_etag(etag, None) == etag
+    assert encoded_etag(etag, 'gzip') == etag[:-1] + '-gzip"'
+
+
+@pytest.mark.parametrize('header', [
+    '"abc"',
+    '"abc-gzip"',
+    'W/"abc"',
+    'W/"abc-gzip"',
+    '"other", W/"abc"',
+    ' "abc" ',
+    '*',
+])
+def test_if_none_match_uses_weak_comparison(header):
+    assert etag_matches(header, '"abc"')
+
+
+@pytest.mark.parametrize('header', [None, '', '"other"', 'W/"other"', '"abc-deflate"', 'abc'])
+def test_if_none_match_misses(header):
+    assert not etag_matches(header, '"abc"')
+
+
+def test_choose_encoding():
+    assert choose_encoding('gzip, deflate', 10) is None
+    assert choose_encoding('gzip, deflate', 4096) == 'gzip'
+    assert choose_encoding('gzip;q=0, identity', 4096) is None
+    assert choose_encoding(None, 4096) is None
+
+
+def load_index():
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api'))
+    import index
+    return index
+
+
+@pytest.fixture
+def api(monkeypatch):
+    """The Flask app of api/index.py, answering every analysis with DATASET."""
+    index = load_index()
+    monkeypatch.setattr(index, 'get_cached_contributions', lambda username, years, precision: (None, DATASET))
+    return index.app.test_client()
+
+
+def test_api_returns_etag_and_cache_control(api):
+    response = api.get('/api/contributions/octocat')
+    assert response.status_code == 200
+    assert response.get_json() == DATASET
+    assert response.headers['ETag'] == strong_etag(json_body(DATASET))
+    assert 'max-age=' in response.headers['Cache-Control']
+    assert response.headers['Vary'] == 'Accept-Encoding'
+
+
+def test_api_answers_304_to_a_matching_etag(api):
+    etag = api.get('/api/contributions/octocat').headers['ETag']
+
+    response = api.get('/api/contributions/octocat', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+
+    # A CDN may weaken the tag after compressing the body
+    response = api.get('/api/contributions/octocat', headers={'If-None-Match': f'W/{etag}'})
+    assert response.status_code == 304
+
+    response = api.get('/api/contributions/octocat', headers={'If-None-Match': '"stale"'})
+    assert response.status_code == 200
+
+
+def test_api_compresses_and_tags_the_encoding(api):
+    response = api.get('/api/contributions/octocat', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['ETag'].endswith('-gzip"')
+    assert gzip.decompress(response.data) == json_body(DATASET)
+
+    response = api.get('/api/contributions/octocat',
+                       headers={'Accept-Encoding': 'gzip', 'If-None-Match': response.headers['ETag']})
+    assert response.status_code == 304
+
+
+def test_api_rejects_bad_parameters(api):
+    assert api.get('/api/contributions/octocat?years=11').status_code == 400
+    assert api.get('/api/contributions/octocat?precision=bogus').status_code == 400
+
+
+@pytest.mark.parametrize('error, status', [
+    (NotFound("User 'token-bot' not found"), 404),
+    (MissingToken("GitHub token not found in environment variables"), 500),
+    (AnalysisTimeout("GitHub API request timed out. Please try again."), 504),
+    (Exception("GitHub API error: 502"), 502),
+])
+def test_api_status_follows_the_error_type(monkeypatch, error, status):
+    index = load_index()
+    monkeypatch.setattr(index, 'get_cached_contributions', lambda username, years, precision: (error, None))
+    response = index.app.test_client().get('/api/contributions/token-bot')
+    assert response.status_code == status
+    assert response.get_json() == {'error': str(error)}
@@ -0,0 +1,17 @@
+from datetime import date
+
+from ghcontrib.store import ContributionStore
+
+
+def test_store_merges_days_and_widens_the_watermark(tmp_path):
+    store = ContributionStore(str(tmp_path / 'store.db'))
+    assert store.sync_state('octocat') is None
+
+    store.merge('OctoCat', [('2024-01-02', 1), ('2024-01-05', 2)], date(2024, 1, 1), date(2024, 1, 10))
+    store.merge('octocat', [('2024-01-05', 4), ('2024-01-12', 1)], date(2024, 1, 4), date(2024, 1, 15))
+
+    assert store.sync_state('OCTOCAT') == (date(2024, 1, 1), date(2024, 1, 15))
+    assert store.days('octocat', date(2024, 1, 1), date(2024, 1, 31)) == [
+        ('2024-01-02', 1), ('2024-01-05', 4), ('2024-01-12', 1)]
+    assert store.days('octocat', date(2024, 1, 3), date(2024, 1, 10)) == [('2024-01-05', 4)]
+    assert store.days('someone', date(2024, 1, 1), date(2024, 1, 31)) == []
@@ -0,0 +1,28 @@
+import pytest
+
+from ghcontrib.errors import NotFound
+from ghcontrib.team import fetch_organization
+
+
+class Response:
+    status_code = 200
+
+
+class OrganizationClient:
+    """Lists members of an organization, then loses it before its repositories are read."""
+
+    def execute(self, query, variables, name=None, **kwargs):
+        if name == 'organization_members':
+            return Response(), {'data': {'organization': {'membersWithRole': {
+                'pageInfo': {'endCursor': None, 'hasNextPage': False}, 'nodes': [{'login': 'octocat'}]}}}}
+        return Response(), {'data': {'organization': None}}
+
+
+def test_unknown_organization_raises(standin, client):
+    with pytest.raises(NotFound, match="Organization 'nobody' not found"):
+        fetch_organization('nobody', client)
+
+
+def test_organization_missing_from_the_repositories_query_raises():
+    with pytest.raises(NotFound, match="Organization 'gone-org' not found"):
+        fetch_organization('gone-org', OrganizationClient())
@@ -0,0 +1,87 @@
+from datetime import datetime
+
+import pytest
+
+from standin import contribution_cursor, parse_contribution_cursor
+from ghcontrib.errors import NotFound
+from ghcontrib.verify import (FOLLOW_UP_BATCH, RepositoryContributions, contribution_windows, count_commit_days,
+                              fetch_commit_contributions)
+
+
+def test_contribution_cursor_round_trip():
+    cursor = contribution_cursor('octocat/hello', 200)
+    assert 'octocat' not in cursor
+    assert parse_contribution_cursor(cursor) == ('octocat/hello', 200)
+    assert parse_contribution_cursor(None) == (None, 0)
+
+
+def test_paged_repository_is_read_again_through_its_history():
+    contributions = RepositoryContributions()
+
+    def entry(name, stamps, more):
+        return {'repository': {'nameWithOwner': name, 'createdAt': '2020-01-01T00:00:00Z'},
+                'contributions': {'pageInfo': {'endCursor': f'{name}-end', 'hasNextPage': more},
+                                  'nodes': [{'occurredAt': stamp} for stamp in stamps]}}
+
+    contributions.add_page(0, [entry('a/one', ['2024-01-01T00:00:00Z'], True),
+                               entry('a/two', ['2024-01-02T00:00:00Z'], False)])
+    assert contributions.pending == [(0, 'a/one', None)]
+    assert 'a/one' not in contributions.nodes
+
+    contributions.pending = []
+    contributions.add_history(0, 'a/one', {'pageInfo': {'endCursor': 'h1', 'hasNextPage': True},
+                                           'nodes': [{'authoredDate': '2024-01-01T00:00:00Z'}]})
+    assert contributions.pending == [(0, 'a/one', 'h1')]
+    assert contributions.nodes['a/one'] == [{'occurredAt': '2024-01-01T00:00:00Z'}]
+    assert contributions.pages == 2
+
+
+@pytest.mark.parametrize('username', ['small-pages', 'huge-pages'])
+def test_every_page_of_every_repository_is_fetched(standin, client, authored_days, username):
+    end_date = datetime.utcnow()
+    with client.scheduler.track(username) as usage:
+        user_created, contributions = fetch_commit_contributions(username, 3, client, end_date=end_date)
+    days = count_commit_days(contributions.entries(), user_created)
+
+    assert set(days.iter_dates()) == authored_days(username, 3, end_date, user_created)
+    # Every commit arrives exactly once, however many pages its repository took
+    windows = contribution_windows(3, end_date)
+    account = standin.account(username)
+    commits = sum(1 for repo in account.repos[:100] for stamp, author in repo['commits']
+                  if author == account.login and windows[-1][0] <= stamp <= windows[0][1])
+    assert sum(len(nodes) for nodes in contributions.nodes.values()) == commits
+    if username.startswith('huge'):
+        assert usage.requests > 1
+    else:
+        assert usage.requests == 1
+
+
+def test_follow_ups_page_every_repository_in_one_request_per_round(standin, client):
+    end_date = datetime.utcnow()
+    with client.scheduler.track() as usage:
+        fetch_commit_contributions('huge-rounds', 3, client, end_date=end_date)
+
+    # Histories needed by each (window, repository) with more than one page of contributions
+    account = standin.account('huge-rounds')
+    pages = []
+    for start, end in contribution_windows(3, end_date):
+        for repo in account.repos[:100]:
+            commits = sum(1 for stamp, author in repo['commits'] if author == account.login and start <= stamp <= end)
+            if commits > 100:
+                pages.append(-(-commits // 100))
+    assert pages
+    rounds = [sum(1 for count in pages if count >= page) for page in range(1, max(pages) + 1)]
+    assert usage.requests == 1 + sum(-(-pending // FOLLOW_UP_BATCH) for pending in rounds)
+
+
+def test_progress_reports_each_round(standin, client):
+    rounds = []
+    fetch_commit_contributions('huge-progress', 3, client,
+                               progress=lambda user_created, contributions: rounds.append(contributions.pages))
+    assert len(rounds) > 1
+    assert rounds == sorted(rounds)
+
+
+def test_unknown_user_raises(standin, client):
+    with pytest.raises(NotFound, match='ghost-user'):
+        fetch_commit_contributions('ghost-user', 1, client)